@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+alertDelivery.py: Checks the completion alert pipeline (see brewAlerts.py) against local stand-ins.
+
+A local HTTP server stands in for a kitchen display (answering after --delay seconds), a Python
+child process for a notification command and a temporary file for the log. A burst of --brews
+infusions finishing at once is posted as the scheduler would; reported are the time post takes on
+the posting (GUI) thread, the batches and events every stand-in received and how long delivery took.
+Then the display stalls beyond the alert timeout while bursts keep finishing, enough to overflow its
+queue at any --brews: the other sinks must still get every event in time, the display's deliveries
+time out and its queue drops the oldest events. A callback that never returns stands in for a hung
+sink: it must be given up after its timeout and must not hold up closing the dispatcher. Exits with
+status 1 if an event went missing where it must not or a sink was not cut off. Needs no display.
+
+Usage: python3 benchmarks/alertDelivery.py [--brews N] [--delay S]
+"""
+
+import argparse
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from brewAlerts import SINK_QUEUE_LIMIT, AlertDispatcher, AlertEvent, CallbackSink, CommandSink, LogSink, WebhookSink
+
+
+BURSTS = 20                             # Bursts of finishing infusions while the display is stalled
+
+
+# Kitchen display stand-in: counts the batches and events POSTed to it
+class DisplayHandler(http.server.BaseHTTPRequestHandler):
+
+    delay = 0.0
+    batches = 0
+    events = 0
+
+    def do_POST(self):
+        events = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(DisplayHandler.delay)
+        DisplayHandler.batches += 1
+        DisplayHandler.events += len(events)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *arguments):
+        pass
+
+
+# Command stand-in: appends the number of events it got on stdin to a file
+def commandStandIn(countFile):
+    script = "import sys; open(sys.argv[1], 'a').write(str(len(sys.stdin.readlines())) + '\\n')"
+    return '"{0}" -c "{1}" "{2}"'.format(sys.executable, script, countFile)
+
+
+# Batches and events the command stand-in was run with
+def commandCounts(countFile):
+    if not os.path.exists(countFile):
+        return 0, 0
+    with open(countFile) as counts:
+        lines = [int(line) for line in counts]
+    return len(lines), sum(lines)
+
+
+def logEvents(logPath):
+    if not os.path.exists(logPath):
+        return 0
+    with open(logPath) as logFile:
+        return sum(1 for line in logFile)
+
+
+# Post a burst of finished infusions; returns the microseconds per post
+def burst(alerts, brews, offset):
+    start = time.perf_counter()
+    for number in range(brews):
+        alerts.post(AlertEvent("Station {0}".format(number + 1), "Tea {0}".format(offset + number), offset + number,
+                               1, 60, time.time()))
+    return (time.perf_counter() - start) / brews * 1e6
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Check the alert pipeline against local stand-in sinks.")
+    parser.add_argument("--brews", type=int, default=200, help="infusions finishing at once")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds the display stand-in takes to answer")
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), DisplayHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    DisplayHandler.delay = args.delay
+
+    directory = tempfile.mkdtemp()
+    countFile = os.path.join(directory, "command.counts")
+    logPath = os.path.join(directory, "alerts.log")
+    timeout = 1.0
+    display = WebhookSink("http://127.0.0.1:{0}/alerts".format(server.server_address[1]), timeout)
+    hung = threading.Event()            # Set to release the hung sink at the end
+    stuck = CallbackSink(lambda events: hung.wait(), "stuck", timeout)
+    queueLimit = max(SINK_QUEUE_LIMIT, args.brews)      # The first burst fits into every queue
+    alerts = AlertDispatcher([display, CommandSink(commandStandIn(countFile), timeout), LogSink(logPath, timeout)],
+                             queueLimit=queueLimit)
+    failed = False
+
+    # All sinks answering
+    start = time.perf_counter()
+    cost = burst(alerts, args.brews, 0)
+    alerts.flush()
+    elapsed = time.perf_counter() - start
+    commandBatches, commandEvents = commandCounts(countFile)
+    print("burst of {0}: post {1:.1f} us each, delivered in {2:.0f} ms".format(args.brews, cost, elapsed * 1000))
+    print("  display: {0} events in {1} batches, command: {2} events in {3} runs, log: {4} events".format(
+        DisplayHandler.events, DisplayHandler.batches, commandEvents, commandBatches, logEvents(logPath)))
+    failed |= DisplayHandler.events != args.brews or commandEvents != args.brews or logEvents(logPath) != args.brews
+
+    # Display stalled beyond the timeout for a while of steady finishing: the other sinks go on, the
+    # display drops its oldest events. The bursts add up to several queues full.
+    DisplayHandler.delay = timeout * 1.5
+    size = queueLimit // 4
+    start = time.perf_counter()
+    costs = []
+    for number in range(BURSTS):
+        costs.append(burst(alerts, size, args.brews + size * number))
+        time.sleep(0.1)
+    total = args.brews + BURSTS * size
+    while logEvents(logPath) < total or commandCounts(countFile)[1] < total:
+        if time.perf_counter() - start > BURSTS * 0.1 + 10:
+            break
+        time.sleep(0.01)
+    others = time.perf_counter() - start
+    alerts.close(timeout=30)
+    stats = alerts.stats()
+
+    print("display stalled: post {0:.1f} us each, command and log done after {1:.0f} ms".format(
+        max(costs), others * 1000))
+    for name, counters in stats.items():
+        print("  {0}: {1}".format(name.split(":")[0], ", ".join("{0} {1}".format(counter, value)
+                                                               for counter, value in sorted(counters.items()))))
+    failed |= commandCounts(countFile)[1] != total or logEvents(logPath) != total
+    failed |= not stats[display.name]["timedOut"] or not stats[display.name]["dropped"]
+
+    # A sink that never returns: given up after its timeout, without holding up close
+    hanging = AlertDispatcher([stuck, LogSink(logPath, timeout)])
+    for number in range(3):
+        burst(hanging, 1, number)
+        time.sleep(0.1)
+    start = time.perf_counter()
+    hanging.close(timeout=30)
+    closed = time.perf_counter() - start
+    counters = hanging.stats()[stuck.name]
+    print("hung sink: closed after {0:.0f} ms, {1}".format(closed * 1000, ", ".join(
+        "{0} {1}".format(counter, value) for counter, value in sorted(counters.items()))))
+    failed |= closed > 3 * timeout + 1 or counters["timedOut"] == 0 or counters["delivered"] or counters["pending"]
+    failed |= logEvents(logPath) != total + 3
+    hung.set()
+
+    server.shutdown()
+    for path in (countFile, logPath):
+        os.unlink(path)
+    os.rmdir(directory)
+    if failed:
+        print("FAIL: events went missing or a stalled sink was not cut off")
+        sys.exit(1)
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+backgroundTick.py: Compares per-tick CPU and repaint time of the background color update.
+
+The legacy path accumulates three channel deltas per tick and calls setPalette on the whole Form
+(as adaptBackgroundColor used to); the current path looks the color up in the cached gradient table
+and sets it as the color the Form paints its background with. Every tick is followed by processing
+the pending events; update and repaint CPU time are reported separately, with the number of ticks
+that repainted the window. The background shows behind every child, so both paths repaint the whole
+window on the ticks whose color changes and the repaint costs about the same; the table saves the
+update time and ends exactly on the end color.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/backgroundTick.py [--duration S] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtGui import QColor, QPalette
+from PyQt5.QtWidgets import QApplication
+
+from teaTimer import RenderStats
+
+import teaEngine
+import teaTimer
+
+
+# Former adaptBackgroundColor: float accumulation per tick and a palette change on the whole Form.
+# Yields once per tick and finally the accumulated color.
+def legacyTicks(form, duration):
+    start, end = form.startColor, form.endColor
+    deltas = [start.red() - end.red(), start.green() - end.green(), start.blue() - end.blue()]
+    current = [float(start.red()), float(start.green()), float(start.blue())]
+    changeValue = 1.0/duration
+    palette = QPalette()
+
+    for tick in range(duration):
+        current = [channel - delta * changeValue for channel, delta in zip(current, deltas)]
+        palette.setColor(QPalette.Background, QColor(*(round(channel) for channel in current), 255))
+        form.setPalette(palette)
+        yield None
+
+    yield tuple(current)
+
+
+# Current adaptBackgroundColor: gradient table lookup and a background-only repaint. Yields once per
+# tick and finally the shown color.
+def tableTicks(form, duration):
+    infusion = teaEngine.Infusion(None, None, 1, duration, 0.0)
+
+    for secondsLeft in range(duration, 0, -1):
+        infusion.secondsLeft = secondsLeft
+        form.adaptBackgroundColor(infusion)
+        yield None
+
+    yield teaEngine.backgroundColor(infusion)
+
+
+# Time one run of a tick function; returns CPU seconds of the updates and of the repaints, the final
+# color and the number of repainted ticks
+def measure(tickFunction, app, form, duration):
+    form.setPalette(QPalette())
+    form.setBackgroundColor(form.startColor)
+    app.processEvents()
+    renderStats = RenderStats()
+    form.setRenderStats(renderStats)
+
+    updateTime = repaintTime = 0.0
+    ticks = tickFunction(form, duration)
+    for tick in range(duration):
+        start = time.process_time()
+        next(ticks)
+        middle = time.process_time()
+        app.processEvents()
+        updateTime += middle - start
+        repaintTime += time.process_time() - middle
+
+    form.setRenderStats(None)
+    return updateTime, repaintTime, next(ticks), renderStats.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=int, default=240, help="infusion duration (ticks per run)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per path")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    form = teaTimer.Form()
+    form.show()
+    app.processEvents()
+
+    endColors = {}
+    for name, tickFunction in (("legacy palette", legacyTicks), ("gradient table", tableTicks)):
+        runs = [measure(tickFunction, app, form, args.duration) for run in range(args.repeat)]
+        update = min(run[0] for run in runs) / args.duration * 1e6
+        repaint = min(run[1] for run in runs) / args.duration * 1e6
+        endColors[name] = runs[-1][2][:3]
+        print("{0:>15}: {1:7.1f} us update + {2:7.1f} us repaint CPU per tick, {3} of {4} ticks repainted".format(
+            name, update, repaint, runs[-1][3], args.duration))
+
+    # Accumulated floats drift away from ENDCOLOR, the table ends exactly on it
+    print("end color: legacy {0}, table {1}, ENDCOLOR {2}".format(
+        endColors["legacy palette"],
+        endColors["gradient table"], teaEngine.ENDCOLOR[:3]))
+
+if __name__ == '__main__':
+    # The window keeps its catalog, history and journal in a scratch directory, not the user's files
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+            setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+        main()
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+boardContention.py: Hammers the shared-memory status board with one writer and many readers.
+
+The writer updates the stations of a temporary board round robin as fast as it can (or at --rate
+updates per second); every entry it writes is self-consistent (cycle, duration, deadline and name
+derive from one counter). Reader processes read the whole board in a loop and check every entry, so
+a torn read (an entry mixing two writes) would be counted. Reports updates per second of the writer
+alone and under contention, full-board reads per second of each reader and the torn reads (always
+0 thanks to the seqlock). Needs no display.
+
+Usage: python3 benchmarks/boardContention.py [--readers N] [--stations N] [--seconds S] [--rate R]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from brewBoard import BoardEntry, BoardReader, StatusBoard
+from teaEngine import BREWING
+
+
+# Entry number `count` of a station, derived from the count alone
+def makeEntry(key, count):
+    cycle = count % 65536
+    return BoardEntry(key, BREWING, count, "Tea {0}".format(cycle), cycle, float(cycle), 2.0 * cycle, 3.0 * cycle)
+
+
+# Update the stations round robin for a number of seconds; returns the number of updates
+def write(board, keys, seconds, rate):
+    count = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while True:
+        now = time.perf_counter()
+        if now >= end:
+            return count
+        if rate and count >= (now - start) * rate:
+            time.sleep(0.0005)
+            continue
+        board.update(makeEntry(keys[count % len(keys)], count))
+        count += 1
+
+
+# Read the whole board until told to stop; reports (reads, entries, torn entries)
+def read(path, started, stopped, results):
+    reads = entries = torn = 0
+    with BoardReader(path) as board:
+        started.wait()
+        while not stopped.is_set():
+            for entry in board.read():
+                entries += 1
+                if (entry.tea % 65536 != entry.cycle or entry.duration != entry.cycle
+                        or entry.deadline != 2.0 * entry.cycle or entry.updated != 3.0 * entry.cycle
+                        or entry.name != "Tea {0}".format(entry.cycle)):
+                    torn += 1
+            reads += 1
+    results.put((reads, entries, torn))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Measure status board throughput under reader contention.")
+    parser.add_argument("--readers", type=int, default=4, help="number of reader processes")
+    parser.add_argument("--stations", type=int, default=64, help="number of stations on the board")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each phase")
+    parser.add_argument("--rate", type=float, default=0, help="writer updates per second (0: as fast as possible)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "contention.board")
+    board = StatusBoard(path, slots=args.stations)
+    keys = ["Station {0}".format(number + 1) for number in range(args.stations)]
+    for number, key in enumerate(keys):
+        board.update(makeEntry(key, number))
+
+    updates = write(board, keys, args.seconds, args.rate)
+    print("writer alone: {0:.0f} updates/s".format(updates / args.seconds))
+
+    started, stopped, results = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Queue()
+    readers = [multiprocessing.Process(target=read, args=(path, started, stopped, results))
+               for number in range(args.readers)]
+    for reader in readers:
+        reader.start()
+    started.set()
+
+    updates = write(board, keys, args.seconds, args.rate)
+    stopped.set()
+    counts = [results.get() for reader in readers]
+    for reader in readers:
+        reader.join()
+
+    print("writer with {0} readers: {1:.0f} updates/s".format(args.readers, updates / args.seconds))
+    for number, (reads, entries, torn) in enumerate(counts, 1):
+        print("reader {0}: {1:.0f} board reads/s ({2:.0f} entries/s, {3:.1f} us per read of {4} stations), "
+              "{5} torn".format(number, reads / args.seconds, entries / args.seconds,
+                                args.seconds / max(reads, 1) * 1e6, args.stations, torn))
+
+    board.close()
+    os.unlink(path)
+    os.rmdir(directory)
+    if any(torn for reads, entries, torn in counts):
+        print("FAIL: torn reads")
+        sys.exit(1)
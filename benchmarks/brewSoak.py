@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewSoak.py: Runs many brew cycles through the Form and checks that its live objects stay flat.
+
+Every cycle clicks a tea button, starts the infusion without waiting for the prep window, finishes
+it on the spot (the scheduler runs on a virtual clock that skips to the deadline) and resets. Signal connections, QObject count
+and fader overlays reported by Form.debugStats are compared between a warmed-up state and the end
+of the run; the script exits with status 1 if any of them grew.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/brewSoak.py [--cycles N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtWidgets import QApplication
+
+import teaTimer
+
+
+# Monotonic clock of the window's scheduler that only advances when told to
+class VirtualClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+# Run one complete brew cycle on the form
+def brewCycle(app, form):
+    form.teaOneButton.click()
+    form.prepTimer.stop()
+    form.infusion()
+    form.scheduler.clock.now += form.station.infusionTime()
+    form.scheduler.dispatch()
+    form.reset()
+    app.processEvents()
+
+
+# Flatten debugStats into name/count pairs
+def flatStats(form):
+    stats = form.debugStats()
+    flat = dict(("connections " + name, count) for name, count in stats["connections"].items())
+    flat["qobjects"] = stats["qobjects"]
+    flat["faders"] = stats["faders"]
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=10000, help="number of brew cycles")
+    parser.add_argument("--warmup", type=int, default=10, help="cycles before the baseline is taken")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    form = teaTimer.Form()
+    form.scheduler.clock = VirtualClock()
+    form.teaMap[form.teaOneButton] = teaTimer.Tea("Soak Tea", [1, 1, 1])
+    form.show()
+
+    for cycle in range(args.warmup):
+        brewCycle(app, form)
+    baseline = flatStats(form)
+
+    start = time.perf_counter()
+    for cycle in range(args.cycles):
+        brewCycle(app, form)
+    elapsed = time.perf_counter() - start
+
+    final = flatStats(form)
+    grown = [name for name in baseline if final[name] > baseline[name]]
+
+    print("{0} brew cycles in {1:.1f} s".format(args.cycles, elapsed))
+    for name in sorted(baseline):
+        print("  {0:<45} {1:>6} -> {2:>6}".format(name, baseline[name], final[name]))
+
+    if grown:
+        print("FAIL: grew during the soak: " + ", ".join(grown))
+        sys.exit(1)
+    print("OK: all counts stayed flat")
+
+
+if __name__ == '__main__':
+    # The window keeps its catalog, history and journal in a scratch directory, not the user's files
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+            setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+        main()
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+catalogLookup.py: Times the tea catalog with a large number of teas.
+
+A temporary catalog is filled with generated teas (a few categories, three to eight infusion steps
+each, handed over as a generator); then prefix searches, pages deep into the catalog and lookups by
+id are timed. Peak memory and the database size are reported as well. Exits with status 1 if a
+generator of teas was not stored completely, by extend or by insert. Needs no display.
+
+Usage: python3 benchmarks/catalogLookup.py [--teas N] [--lookups N]
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from teaCatalog import TeaCatalog
+from teaEngine import Tea
+
+
+CATEGORIES = ("Green", "Black", "Oolong", "White", "Pu-erh", "Herbal")
+WORDS = ("Premium", "Sencha", "Bancha", "Gyokuro", "Assam", "Darjeeling", "Tie Guan Yin", "Silver",
+         "Needle", "Jasmine", "Mountain", "Spring", "Autumn", "Reserve", "Rooibos", "Mint")
+
+
+# Generate distinct teas with a plausible spread of names and steps
+def generateTeas(count, randomizer):
+    for number in range(count):
+        name = "{0}\n{1} {2}".format(randomizer.choice(WORDS), randomizer.choice(WORDS), number)
+        steps = [randomizer.randrange(10, 300) for step in range(randomizer.randrange(3, 9))]
+        yield Tea(name, steps, randomizer.choice(CATEGORIES))
+
+
+# Run an operation a number of times and return the mean time in microseconds
+def timeOperation(operation, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        operation(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time the tea catalog with many teas.")
+    parser.add_argument("--teas", type=int, default=100000, help="number of teas in the catalog")
+    parser.add_argument("--lookups", type=int, default=1000, help="number of timed operations of each kind")
+    args = parser.parse_args()
+
+    randomizer = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "teas.db")
+        catalog = TeaCatalog(path)
+
+        start = time.perf_counter()
+        catalog.extend(generateTeas(args.teas, randomizer))
+        print("insert: {0} teas in {1:.2f} s".format(catalog.count(), time.perf_counter() - start))
+
+        prefixes = [randomizer.choice(WORDS)[:randomizer.randrange(1, 5)] for lookup in range(args.lookups)]
+        positions = [randomizer.randrange(args.teas) for lookup in range(args.lookups)]
+        ids = [position + 1 for position in positions]
+
+        print("search (prefix, 50 results): {0:8.1f} us".format(timeOperation(catalog.search, prefixes)))
+        print("page (2 teas at a random position): {0:8.1f} us".format(
+            timeOperation(lambda position: catalog.page(position, 2), positions)))
+        print("get (by id): {0:8.1f} us".format(timeOperation(catalog.get, ids)))
+        print("count: {0:8.1f} us".format(timeOperation(lambda argument: catalog.count(), ids[:100])))
+
+        stored = catalog.count()
+        catalog.insert(generateTeas(10, randomizer))
+        inserted = catalog.count() - stored
+
+        catalog.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print("database size: {0:.1f} MB, peak memory: {1:.1f} MB".format(
+            size / 2**20, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+    if stored != args.teas or inserted != 10:
+        print("FAIL: generated teas went missing ({0} of {1} extended, {2} of 10 inserted)".format(
+            stored, args.teas, inserted))
+        sys.exit(1)
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+catalogTransfer.py: Times streaming import and export of large tea files (see teaTransfer.py).
+
+A CSV and a JSON Lines file of generated teas (with about one row in a hundred invalid: empty
+names, only zero steps, unreadable steps) are written to a temporary directory, imported into a
+fresh catalog each and exported again. Reports rows per second, rejected rows and the peak memory
+of the process, which stays flat however large the files are. Needs no display.
+
+Usage: python3 benchmarks/catalogTransfer.py [--rows N]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import teaTransfer
+from teaCatalog import TeaCatalog
+
+
+CATEGORIES = ("Green", "Black", "Oolong", "White", "Pu-erh", "Herbal")
+WORDS = ("Premium", "Sencha", "Bancha", "Gyokuro", "Assam", "Darjeeling", "Tie Guan Yin", "Silver",
+         "Needle", "Jasmine", "Mountain", "Spring", "Autumn", "Reserve", "Rooibos", "Mint")
+
+
+# Generate rows of (name, category, steps); every hundredth row on average is invalid
+def generateRows(count, randomizer):
+    for number in range(count):
+        name = "{0} {1} {2}".format(randomizer.choice(WORDS), randomizer.choice(WORDS), number)
+        steps = [randomizer.randrange(10, 300) for step in range(randomizer.randrange(3, 9))]
+
+        flaw = randomizer.randrange(300)
+        if flaw == 0:
+            name = " "
+        elif flaw == 1:
+            steps = [0] * len(steps)
+        elif flaw == 2:
+            steps = ["{0}s".format(step) for step in steps]
+        yield name, randomizer.choice(CATEGORIES), steps
+
+
+# Peak resident memory of this process in MB
+def peakMemory():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time streaming import and export of tea files.")
+    parser.add_argument("--rows", type=int, default=1000000, help="number of rows per file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csvPath = os.path.join(directory, "teas.csv")
+        with open(csvPath, "w", newline="") as csvFile:
+            writer = csv.writer(csvFile)
+            writer.writerow(teaTransfer.FIELDS)
+            for name, category, steps in generateRows(args.rows, random.Random(0)):
+                writer.writerow((name, category, " ".join(str(step) for step in steps)))
+
+        jsonPath = os.path.join(directory, "teas.jsonl")
+        with open(jsonPath, "w") as jsonFile:
+            for name, category, steps in generateRows(args.rows, random.Random(0)):
+                jsonFile.write(json.dumps({"name": name, "category": category, "infusion_times": steps}) + "\n")
+
+        print("{0} rows per file, peak memory after generating: {1:.0f} MB".format(args.rows, peakMemory()))
+
+        for path in (csvPath, jsonPath):
+            extension = os.path.splitext(path)[1]
+            catalog = TeaCatalog(os.path.join(directory, "teas{0}.db".format(extension)))
+
+            start = time.perf_counter()
+            imported, rejected = teaTransfer.importTeas(catalog, path, onError=lambda line, message: None)
+            elapsed = time.perf_counter() - start
+            print("import {0}: {1} teas, {2} rejected in {3:.2f} s ({4:.0f} rows/s), peak memory {5:.0f} MB".format(
+                extension, imported, rejected, elapsed, args.rows / elapsed, peakMemory()))
+
+            start = time.perf_counter()
+            exported = teaTransfer.exportTeas(catalog, os.path.join(directory, "export" + extension))
+            elapsed = time.perf_counter() - start
+            print("export {0}: {1} teas in {2:.2f} s ({3:.0f} rows/s), peak memory {4:.0f} MB".format(
+                extension, exported, elapsed, exported / elapsed, peakMemory()))
+            catalog.close()
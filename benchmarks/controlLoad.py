@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+controlLoad.py: Load test of the control API with many concurrent subscribers.
+
+The control server runs in a child process on a scheduler without a window (with a temporary tea
+catalog). This process acts as the order system: it opens thousands of /subscribe streams (each
+following one of the counting-down stations, a few following all stations), starts those infusions
+and then fires status/start/reset requests on other stations over concurrent keep-alive connections
+while the countdown updates are streamed. Reported are request latency percentiles and
+throughput, and the number and lag of the updates the subscribers received.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/controlLoad.py [--subscribers N] [--requests N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# Child process: serve the control API until stdin is closed
+def serve():
+    from PyQt5.QtCore import QSocketNotifier
+    from PyQt5.QtWidgets import QApplication
+
+    from brewScheduler import InfusionScheduler
+    from controlServer import ControlServer
+    from teaCatalog import TeaCatalog
+    from teaEngine import Tea
+
+    app = QApplication(sys.argv[:1])
+    directory = tempfile.mkdtemp()
+    catalog = TeaCatalog(os.path.join(directory, "teas.db"))
+    catalog.extend([Tea("Premium Sencha", [3, 15, 60]), Tea("Premium Bancha", [120, 180, 240])])
+
+    scheduler = InfusionScheduler()
+    server = ControlServer(scheduler, catalog)
+    print(server.start(), flush=True)
+
+    notifier = QSocketNotifier(sys.stdin.fileno(), QSocketNotifier.Read)
+    notifier.activated.connect(app.quit)
+    app.exec_()
+    server.stop()
+
+
+# Send one request over an open connection and return the decoded response body
+async def request(reader, writer, method, path, data=None):
+    body = json.dumps(data).encode() if data is not None else b""
+    writer.write("{0} {1} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {2}\r\n\r\n".format(
+        method, path, len(body)).encode() + body)
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+    return json.loads(await reader.readexactly(length))
+
+
+# Read countdown updates of one subscription (of one key or, for None, all keys), collecting their lag
+async def subscriber(port, key, lags, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    target = "/subscribe" if key is None else "/subscribe?key=" + key
+    writer.write("GET {0} HTTP/1.1\r\nHost: localhost\r\n\r\n".format(target).encode())
+    await reader.readuntil(b"\r\n\r\n")
+    ready.append(True)
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            lags.append(time.monotonic() - json.loads(line)["at"])
+    except (asyncio.CancelledError, ConnectionError):
+        writer.close()
+
+
+# Fire requests over one keep-alive connection, collecting their latency
+async def worker(port, number, count, stations, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for index in range(count):
+        key = "load{0}".format((number * count + index) % stations)
+        kind = ("status", "start", "reset")[index % 3]
+
+        start = time.perf_counter()
+        if kind == "status":
+            await request(reader, writer, "GET", "/status?key=" + key)
+        elif kind == "start":
+            await request(reader, writer, "POST", "/start", {"key": key, "tea": 1 + index % 2, "duration": 5})
+        else:
+            await request(reader, writer, "POST", "/reset", {"key": key})
+        latencies[kind].append(time.perf_counter() - start)
+    writer.close()
+
+
+# Percentiles of a list of seconds in milliseconds
+def describe(values):
+    values = sorted(values)
+    pick = lambda fraction: values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+    return "p50 {0:6.2f} ms, p99 {1:6.2f} ms, max {2:6.2f} ms".format(pick(0.5), pick(0.99), values[-1] * 1000)
+
+
+async def run(port, args):
+    lags = []
+    ready = []
+    subscribers = []
+    for index in range(args.subscribers):
+        key = None if index < args.firehose else "tick{0}".format(index % args.ticking)
+        subscribers.append(asyncio.ensure_future(subscriber(port, key, lags, ready)))
+        if index % 200 == 199:
+            await asyncio.sleep(0.05)
+    while len(ready) < args.subscribers:
+        await asyncio.sleep(0.05)
+
+    # Infusions that keep ticking during the test
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await request(reader, writer, "POST", "/batch",
+                  [{"command": "start", "key": "tick{0}".format(key), "tea": 1, "duration": 3600}
+                   for key in range(args.ticking)])
+    writer.close()
+
+    latencies = {"status": [], "start": [], "reset": []}
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(port, number, args.requests // args.connections, args.stations, latencies)
+                           for number in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(2)
+
+    for task in subscribers:
+        task.cancel()
+    await asyncio.gather(*subscribers, return_exceptions=True)
+    return latencies, elapsed, lags
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Load test of the control API.")
+    parser.add_argument("--subscribers", type=int, default=3000, help="concurrent /subscribe streams")
+    parser.add_argument("--requests", type=int, default=30000, help="total status/start/reset requests")
+    parser.add_argument("--connections", type=int, default=50, help="concurrent request connections")
+    parser.add_argument("--stations", type=int, default=200, help="stations the requests are spread over")
+    parser.add_argument("--ticking", type=int, default=20, help="infusions counting down during the test")
+    parser.add_argument("--firehose", type=int, default=10, help="subscribers of all stations")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+        sys.exit()
+
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve"], stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    try:
+        port = int(child.stdout.readline())
+        latencies, elapsed, lags = asyncio.run(run(port, args))
+    finally:
+        child.stdin.close()
+        child.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print("{0} requests over {1} connections with {2} subscribers: {3:.0f} requests/s".format(
+        total, args.connections, args.subscribers, total / elapsed))
+    for kind, values in sorted(latencies.items()):
+        print("  {0:7} {1}".format(kind, describe(values)))
+    print("updates received: {0} ({1:.0f} per subscriber), lag {2}".format(
+        len(lags), len(lags) / args.subscribers, describe(lags)))
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+countdownDrift.py: Measures how far infusions finish from their real deadline on a loaded event loop.
+
+A load timer keeps the Qt event loop busy with blocking handlers of random length while a series of
+short infusions run on the deadline-based countdown of teaTimer.Form. With --legacy the former
+1 Hz decrement (one tick per QTimer timeout) is measured under the same load for comparison.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/countdownDrift.py [--runs N] [--seconds S]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+import teaTimer
+
+
+# Keep the event loop busy by blocking for a random number of milliseconds on every load tick
+def startLoad(maxBlockMs):
+    def block():
+        end = time.monotonic() + random.uniform(0, maxBlockMs) / 1000.0
+        while time.monotonic() < end:
+            pass
+
+    loadTimer = QTimer()
+    loadTimer.timeout.connect(block)
+    loadTimer.start(5)
+    return loadTimer
+
+
+# Run one infusion on the deadline-based countdown and return its end-time error in seconds
+def measureDeadline(app, form, seconds):
+    result = {}
+
+    def finish():
+        result["error"] = time.monotonic() - deadline
+        app.exit()
+
+    form.finish = finish
+    form.station.selectTea(teaTimer.Tea("Benchmark Tea", [seconds]*3))
+    form.infusion()
+    deadline = form.scheduler.get(teaTimer.Form.INFUSION_KEY).deadline
+    app.exec_()
+    return result["error"]
+
+
+# Run one infusion on the former 1 Hz decrement and return its end-time error in seconds
+def measureLegacy(app, form, seconds):
+    state = {"value": seconds, "deadline": time.monotonic() + seconds}
+
+    def tick():
+        if state["value"] != 0:
+            state["value"] -= 1
+        else:
+            state["error"] = time.monotonic() - state["deadline"]
+            legacyTimer.stop()
+            app.exit()
+
+    legacyTimer = QTimer()
+    legacyTimer.timeout.connect(tick)
+    legacyTimer.start(1000)
+    tick()
+    app.exec_()
+    return state["error"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="number of infusions to measure")
+    parser.add_argument("--seconds", type=int, default=3, help="duration of each infusion")
+    parser.add_argument("--load", type=float, default=40.0, help="maximum blocking time per load tick in ms")
+    parser.add_argument("--legacy", action="store_true", help="measure the former 1 Hz decrement instead")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)    # Fader overlays close while the form is not shown
+    form = teaTimer.Form()
+    loadTimer = startLoad(args.load)
+
+    errors = []
+    for run in range(args.runs):
+        if args.legacy:
+            errors.append(measureLegacy(app, form, args.seconds))
+        else:
+            errors.append(measureDeadline(app, form, args.seconds))
+
+    loadTimer.stop()
+    errorsMs = [error * 1000 for error in errors]
+    print("mode: {0}, runs: {1}, duration: {2} s, load: up to {3} ms per 5 ms".format(
+        "legacy" if args.legacy else "deadline", args.runs, args.seconds, args.load))
+    print("end-time error (ms): mean {0:.1f}, median {1:.1f}, max {2:.1f}".format(
+        statistics.mean(errorsMs), statistics.median(errorsMs), max(errorsMs)))
+
+
+if __name__ == '__main__':
+    # The window keeps its catalog, history and journal in a scratch directory, not the user's files
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+            setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+        main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+cyclePlanner.py: Times tea clicks on teas with many (partly zero) infusion steps.
+
+Every click advances a station to the next cycle with a duration. The planned lookup (the tea's
+precomputed next-cycle table, see teaEngine.planCycles) is compared with scanning the steps for
+the next non-zero one, as the former TODO in Station.setInfusionCycle suggested. Planning the
+tables themselves (once per loaded or saved tea) is timed as well. Needs no display.
+
+Usage: python3 benchmarks/cyclePlanner.py [--steps N] [--clicks N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from teaEngine import Station, Tea
+
+
+# Former approach: scan forward (wrapping around) for the next step longer than 0 seconds
+def scanningCycle(station):
+    times = station.currentTea.infusion_times
+    cycle = station.infusionCycle
+    for step in range(len(times)):
+        cycle = cycle % len(times) + 1
+        if times[cycle-1] > 0:
+            break
+    station.infusionCycle = cycle
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time cycle advance on teas with many steps.")
+    parser.add_argument("--steps", type=int, default=1000, help="infusion steps per tea (most of them 0)")
+    parser.add_argument("--clicks", type=int, default=200000, help="number of timed clicks")
+    args = parser.parse_args()
+
+    randomizer = random.Random(0)
+    teas = []
+    for number in range(100):
+        times = [0] * args.steps
+        for step in randomizer.sample(range(args.steps), 3):
+            times[step] = randomizer.randrange(10, 300)
+        teas.append(Tea("Tea {0}".format(number), times))
+
+    start = time.perf_counter()
+    for tea in teas:
+        tea.setInfusionTimes(tea.infusion_times)
+    print("planning: {0:.1f} us per tea of {1} steps".format((time.perf_counter() - start) / len(teas) * 1e6, args.steps))
+
+    for label, advance in (("planned", Station.setInfusionCycle), ("scanning", scanningCycle)):
+        station = Station()
+        cycles = 0
+        start = time.perf_counter()
+        for click in range(args.clicks):
+            station.setActiveTea(teas[click // 1000 % len(teas)])
+            advance(station)
+            cycles += station.infusionCycle
+        elapsed = time.perf_counter() - start
+        print("{0}: {1:.2f} us per click (checksum {2})".format(label, elapsed / args.clicks * 1e6, cycles))
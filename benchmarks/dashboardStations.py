@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+dashboardStations.py: Compares one process per station with one dashboard of many stations.
+
+Each measurement runs in a fresh process with every station counting down a long infusion: first a
+single timer window (as one of N separate apps would run), then a dashboard of N panels. Reported
+are peak memory and CPU time over a few seconds; the separate apps are extrapolated from the single
+window (N times its numbers).
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/dashboardStations.py [--stations N] [--seconds S]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Child process: brew on every station for the given time and print memory and CPU usage
+def measure(mode, stations, seconds):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    import teaTimer
+    from teaEngine import Tea
+
+    app = QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    teaTimer.loadFonts()
+    tea = Tea("Benchmark\nTea", [3600, 3600, 3600])
+
+    if mode == "form":
+        directory = tempfile.mkdtemp()
+        for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+            setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+        screen = teaTimer.Form()
+        screen.show()
+        screen.startInfusion(tea)
+    else:
+        from brewDashboard import Dashboard
+        screen = Dashboard(stations, [tea, tea])
+        screen.show()
+        for panel in screen.panels.values():
+            panel.prepareInfusion(tea)
+
+    # Measure after start-up and the prep window
+    def start():
+        measure.cpu = time.process_time()
+        QTimer.singleShot(int(seconds * 1000), app.exit)
+    QTimer.singleShot(2000, start)
+    app.exec_()
+
+    print(json.dumps({"cpu": time.process_time() - measure.cpu,
+                      "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Compare separate timer processes with one dashboard.")
+    parser.add_argument("--stations", type=int, default=50, help="number of brewing stations")
+    parser.add_argument("--seconds", type=float, default=10, help="measured seconds of brewing")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child, args.stations, args.seconds)
+        sys.exit()
+
+    results = {}
+    for mode in ("form", "dashboard"):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode,
+                                 "--stations", str(args.stations), "--seconds", str(args.seconds)],
+                                check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True).stdout
+        results[mode] = json.loads(output)
+
+    single = results["form"]
+    dashboard = results["dashboard"]
+    print("{0} separate apps (1 window x {0}): {1:7.1f} MB, CPU {2:5.2f} s over {3:.0f} s".format(
+        args.stations, single["rss"] * args.stations, single["cpu"] * args.stations, args.seconds))
+    print("dashboard of {0} panels:             {1:7.1f} MB, CPU {2:5.2f} s over {3:.0f} s".format(
+        args.stations, dashboard["rss"], dashboard["cpu"], args.seconds))
+    print("dashboard = {0:.1f} apps of memory, {1:.1f} apps of CPU".format(
+        dashboard["rss"] / single["rss"], dashboard["cpu"] / max(single["cpu"], 1e-9)))
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+engineSessions.py: Measures how many simulated brewing sessions the headless engine runs per second.
+
+Every session selects a tea, starts the infusion on the deadline queue and is stepped through all of
+its whole-second ticks until it finishes. No Qt module is imported, so this runs without a display
+server or QApplication (e.g. in CI).
+
+Usage: python3 benchmarks/engineSessions.py [--sessions N] [--concurrent C]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import teaEngine
+
+
+# Run the given number of sessions, keeping `concurrent` of them brewing at the same time
+def simulate(sessions, concurrent, teas):
+    queue = teaEngine.InfusionQueue()
+    idleStations = list(range(concurrent))
+    now = 0.0
+    started = 0
+    finished = 0
+    ticks = 0
+
+    while finished < sessions:
+        while started < sessions and idleStations:
+            key = idleStations.pop()
+            queue.station(key).selectTea(teas[started % len(teas)])
+            queue.start(key, now)
+            started += 1
+
+        now = queue.nextWakeup()
+        ticked, done = queue.due(now)
+        for infusion in ticked:
+            teaEngine.displayTime(infusion.secondsLeft)
+            teaEngine.backgroundColor(infusion)
+        ticks += len(ticked)
+        finished += len(done)
+        idleStations.extend(infusion.key for infusion in done)
+
+    return ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000, help="number of sessions to simulate")
+    parser.add_argument("--concurrent", type=int, default=200, help="number of sessions brewing at once")
+    args = parser.parse_args()
+
+    teas = [teaEngine.Tea("Premium\nSencha", [3, 15, 60]),
+            teaEngine.Tea("Premium\nBancha", [120, 180, 240])]
+
+    start = time.perf_counter()
+    ticks = simulate(args.sessions, args.concurrent, teas)
+    elapsed = time.perf_counter() - start
+
+    print("sessions: {0}, concurrent: {1}, ticks: {2}".format(args.sessions, args.concurrent, ticks))
+    print("elapsed: {0:.3f} s, {1:.0f} sessions/s, {2:.0f} ticks/s".format(
+        elapsed, args.sessions / elapsed, ticks / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+fineCountdown.py: Compares the whole-second countdown with the sub-second display modes.
+
+The same infusion is brewed in a visible window showing whole seconds, tenths and hundredths (see
+Form.SUBSECOND_DIGITS). During the countdown the CPU time, the frames (paint passes of the window)
+per second, their mean paint time and the area of the timer label repainted per frame are
+recorded. With --full-repaint the timer label repaints as a whole on every change instead of only
+the cells of changed digits, for comparison.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/fineCountdown.py [--seconds S] [--full-repaint]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+import teaEngine
+import teaTimer
+from teaEngine import Tea
+
+
+# Event filter summing the repainted area of one widget
+class PaintArea(QObject):
+
+    def __init__(self):
+        super().__init__()
+        self.area = 0
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            self.area += event.rect().width() * event.rect().height()
+        return False
+
+
+# Former label update: repaint the whole label on every change
+def fullSetText(self, text):
+    if text != self.clockText:
+        self.clockText = text
+        self.update()
+
+
+# Brew one infusion with the given display digits and report on its countdown
+def measure(app, digits, seconds):
+    teaTimer.Form.SUBSECOND_DIGITS = digits
+    form = teaTimer.Form()
+    form.show()
+    form.teaMap[form.teaOneButton] = Tea("Benchmark\nTea", [seconds] * 3)
+
+    area = PaintArea()
+    form.timerLabel.installEventFilter(area)
+    stats = teaTimer.RenderStats()
+    results = {}
+
+    # From after the timer pulse until shortly before the deadline
+    countdownStart = 0.5 + teaEngine.PREP_WINDOW + 1.5
+    def start():
+        area.area = 0
+        form.setRenderStats(stats)
+        results["cpu"] = time.process_time()
+    def stop():
+        results["cpu"] = time.process_time() - results["cpu"]
+        results["report"] = stats.report()
+        form.setRenderStats(None)
+
+    QTimer.singleShot(500, form.teaOneButton.click)
+    QTimer.singleShot(int(countdownStart * 1000), start)
+    QTimer.singleShot(int((countdownStart + seconds - 2) * 1000), stop)
+    QTimer.singleShot(int((countdownStart + seconds) * 1000), app.exit)
+    app.exec_()
+    form.reset()
+    form.hide()
+
+    measured = seconds - 2
+    report = results["report"]
+    label = {0: "seconds", 1: "tenths", 2: "hundredths"}[digits]
+    print("{0:<11} CPU {1:5.1f} ms/s, {2:5.1f} frames/s, paint {3:.2f} ms mean, "
+          "label area {4:6.0f} px per frame".format(label, results["cpu"] / measured * 1000, report["frames"] / measured, report["meanPaintMs"],
+        area.area / max(report["frames"], 1)))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Compare the whole-second and sub-second countdown displays.")
+    parser.add_argument("--seconds", type=int, default=8, help="duration of the brewed infusion")
+    parser.add_argument("--full-repaint", action="store_true", help="repaint the whole timer label on every change")
+    args = parser.parse_args()
+
+    if args.full_repaint:
+        teaTimer.ClockLabel.setText = fullSetText
+
+    directory = tempfile.mkdtemp()
+    for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+        setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+
+    app = QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    teaTimer.loadFonts()
+
+    for digits in (0, 1, 2):
+        measure(app, digits, args.seconds)
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+historyAggregation.py: Times statistics over a large brew history.
+
+A temporary history file is filled with generated infusion records; then per-tea counts, average
+overrun and busiest hours are computed through the memory-mapped NumPy reader of brewHistory and,
+for comparison, by unpacking every record in Python. The append rate of BrewHistory is measured as
+well. Needs no display.
+
+Usage: python3 benchmarks/historyAggregation.py [--records N]
+"""
+
+import argparse
+import collections
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy
+
+import brewHistory
+
+
+# Write generated records straight to a new history file
+def generateHistory(path, count, seed=0):
+    randomizer = numpy.random.default_rng(seed)
+    records = numpy.zeros(count, numpy.dtype(brewHistory.RECORD_FIELDS))
+    records["time"] = 1.7e9 + numpy.sort(randomizer.uniform(0, 365 * 86400, count))
+    records["tea"] = randomizer.integers(1, 500, count)
+    records["cycle"] = randomizer.integers(1, 4, count)
+    records["outcome"] = numpy.where(randomizer.random(count) < 0.9, brewHistory.COMPLETED, brewHistory.RESET)
+    records["planned"] = randomizer.integers(3, 300, count)
+    records["actual"] = records["planned"] + randomizer.exponential(20, count)
+
+    with open(path, "wb") as historyFile:
+        historyFile.write(brewHistory.HEADER.pack(brewHistory.MAGIC, brewHistory.SCHEMA_VERSION,
+                                                  brewHistory.RECORD.size))
+        records.tofile(historyFile)
+
+
+# The same statistics computed record by record in Python
+def aggregateInPython(path, utcOffset):
+    counts = collections.defaultdict(lambda: [0, 0])
+    hours = [0] * 24
+    overrun = 0.0
+    completed = 0
+
+    with open(path, "rb") as historyFile:
+        data = historyFile.read()[brewHistory.HEADER.size:]
+
+    for at, tea, cycle, outcome, planned, actual in brewHistory.RECORD.iter_unpack(data):
+        counts[tea][outcome == brewHistory.RESET] += 1
+        hours[int((at + utcOffset) // 3600 % 24)] += 1
+        if outcome == brewHistory.COMPLETED:
+            overrun += actual - planned
+            completed += 1
+
+    return counts, overrun / completed, hours
+
+
+# Statistics through the memory-mapped reader
+def aggregateMapped(path, utcOffset):
+    records = brewHistory.readHistory(path)
+    return (brewHistory.teaCounts(records), brewHistory.averageOverrun(records),
+            brewHistory.busiestHours(records, utcOffset))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time statistics over a large brew history.")
+    parser.add_argument("--records", type=int, default=5000000, help="number of generated records")
+    parser.add_argument("--appends", type=int, default=100000, help="number of timed BrewHistory appends")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.dat")
+
+        history = brewHistory.BrewHistory(os.path.join(directory, "appended.dat"))
+        start = time.perf_counter()
+        for number in range(args.appends):
+            history.append(number % 500, 1, brewHistory.COMPLETED, 60, 61.5)
+        history.close()
+        print("append: {0:.1f} us per record".format((time.perf_counter() - start) / args.appends * 1e6))
+
+        generateHistory(path, args.records)
+        print("history: {0} records, {1:.1f} MB".format(args.records, os.path.getsize(path) / 2**20))
+
+        rssBefore = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        counts, overrun, hours = aggregateMapped(path, 0)
+        mapped = time.perf_counter() - start
+        print("memory-mapped NumPy: {0:8.1f} ms (overrun {1:.2f} s, {2} teas)".format(mapped * 1000, overrun, len(counts)))
+
+        start = time.perf_counter()
+        pythonCounts, pythonOverrun, pythonHours = aggregateInPython(path, 0)
+        unpacked = time.perf_counter() - start
+        print("Python unpacking:    {0:8.1f} ms (overrun {1:.2f} s, {2} teas)".format(
+            unpacked * 1000, pythonOverrun, len(pythonCounts)))
+
+        assert list(hours) == pythonHours
+        assert all(tuple(pythonCounts[tea]) == count for tea, count in counts.items())
+        print("speedup: {0:.0f}x".format(unpacked / mapped))
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+idleWakeups.py: Compares timer wakeups, paints and CPU time of a hidden window with and without
+the low-power idle mode.
+
+Two states are measured for a few seconds each: a running countdown and a finished brew whose leaves
+pulse waits for a reset. The "before" run disables Form.LOW_POWER_IDLE, which reproduces the former
+behaviour of drawing regardless of visibility; the "after" run uses the idle mode.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/idleWakeups.py [--seconds S]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+import teaTimer
+
+
+# Application-wide event filter counting timer and paint events
+class EventCounter(QObject):
+
+    def __init__(self):
+        super().__init__()
+        self.timers = 0
+        self.paints = 0
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Timer:
+            self.timers += 1
+        elif event.type() in (QEvent.Paint, QEvent.UpdateRequest):
+            self.paints += 1
+        return False
+
+
+# Keep the event loop running for the given number of seconds and return the counted activity
+def observe(app, counter, seconds):
+    counter.timers = counter.paints = 0
+    cpuStart = time.process_time()
+    QTimer.singleShot(int(seconds * 1000), app.exit)
+    app.exec_()
+    return counter.timers - 1, counter.paints, time.process_time() - cpuStart
+
+
+# Put the form into a running countdown or a finished brew, hide it and measure
+def measureState(app, counter, form, state, seconds):
+    form.show()
+    form.teaOneButton.click()
+    form.prepTimer.stop()
+    form.infusion()
+    if state == "finished":
+        form.scheduler.cancel(teaTimer.Form.INFUSION_KEY)
+        form.finish()
+    app.processEvents()
+
+    form.hide()
+    result = observe(app, counter, seconds)
+    form.show()
+    form.reset()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="observation time per state")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    counter = EventCounter()
+    app.installEventFilter(counter)
+
+    form = teaTimer.Form()
+    form.teaMap[form.teaOneButton] = teaTimer.Tea("Idle Tea", [600, 600, 600])
+
+    for lowPower in (False, True):
+        teaTimer.Form.LOW_POWER_IDLE = lowPower
+        for state in ("brewing", "finished"):
+            timers, paints, cpu = measureState(app, counter, form, state, args.seconds)
+            print("{0:>6} {1:>9}: {2:6.1f} timer wakeups/s, {3:6.1f} paints/s, {4:6.1f} ms CPU/s".format(
+                "after" if lowPower else "before", state,
+                timers / args.seconds, paints / args.seconds, cpu * 1000 / args.seconds))
+
+
+if __name__ == '__main__':
+    # The window keeps its catalog, history and journal in a scratch directory, not the user's files
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+            setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+        main()
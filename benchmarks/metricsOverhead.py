@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+metricsOverhead.py: Times the cost of the profiling instrumentation (see brewMetrics.py).
+
+A handler doing as little as a countdown tick is called plainly, instrumented with profiling off
+(the default) and instrumented with profiling on. Rendering the metrics of a busy session (every
+handler and timer measured) is timed as well. Needs no display.
+
+Usage: python3 benchmarks/metricsOverhead.py [--calls N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtCore import QCoreApplication
+
+import teaEngine
+from brewMetrics import HANDLER, LATENESS, METRICS, timed
+
+
+# Stand-in for a countdown handler: format the remaining time of a tick
+def handler(secondsLeft):
+    return teaEngine.displayTime(secondsLeft)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time the overhead of the profiling instrumentation.")
+    parser.add_argument("--calls", type=int, default=1000000, help="number of timed handler calls")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv[:1])        # The lag probe timer needs an application
+
+    instrumented = timed("benchmark")(handler)
+    for label, function, enabled in (("plain", handler, False), ("profiling off", instrumented, False),
+                                     ("profiling on", instrumented, True)):
+        METRICS.setEnabled(enabled)
+        start = time.perf_counter()
+        for call in range(args.calls):
+            function(call % 3600)
+        elapsed = time.perf_counter() - start
+        print("{0}: {1:.3f} us per call".format(label, elapsed / args.calls * 1e6))
+
+    # A busy session: 20 handlers and 10 timers with 10000 measurements each
+    METRICS.reset()
+    for number in range(10000):
+        for name in range(20):
+            METRICS.observe(HANDLER, "handler{0}".format(name), number * 1e-6)
+        for name in range(10):
+            METRICS.observe(LATENESS, "timer{0}".format(name), number * 1e-5)
+
+    renders = 1000
+    start = time.perf_counter()
+    for render in range(renders):
+        text = METRICS.render()
+    elapsed = time.perf_counter() - start
+    print("render: {0:.0f} us for {1} bytes".format(elapsed / renders * 1e6, len(text)))
+    METRICS.setEnabled(False)
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+renderFrames.py: Reports frames per tick and paint time of the timer window during a brew.
+
+A short infusion is brewed in a visible window with Form.setRenderStats enabled: the steady
+countdown (after the timer pulse, before the finish) shows the frames each tick costs, the whole
+brew (click, stack fades, pulses, finish and reset) the total number of paint passes. With --legacy
+the fader steps are painted synchronously (repaint) as before, for comparison.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/renderFrames.py [--seconds S] [--legacy]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+import teaTimer
+from teaEngine import Tea
+
+
+# Application-wide event filter counting paint events of all widgets
+class PaintCounter(QObject):
+
+    def __init__(self):
+        super().__init__()
+        self.paints = 0
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            self.paints += 1
+        return False
+
+
+# Former fade step: paint the overlay right away
+def repaintingAnimate(self, value):
+    self.pixmap_opacity = 1.0 - value
+    self.repaint()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Report frames per tick and paint time of a brew.")
+    parser.add_argument("--seconds", type=int, default=8, help="duration of the brewed infusion")
+    parser.add_argument("--legacy", action="store_true", help="paint fader steps synchronously as before")
+    args = parser.parse_args()
+
+    if args.legacy:
+        teaTimer.FaderWidget.animate = repaintingAnimate
+
+    directory = tempfile.mkdtemp()
+    for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+        setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+
+    app = QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    form = teaTimer.Form()
+    form.show()
+    form.teaMap[form.teaOneButton] = Tea("Benchmark\nTea", [args.seconds] * 3)
+
+    counter = PaintCounter()
+    app.installEventFilter(counter)
+    whole = teaTimer.RenderStats()
+    steady = teaTimer.RenderStats()
+    results = {}
+
+    # Steady countdown: from after the timer pulse until shortly before the deadline
+    countdownStart = 0.5 + teaTimer.teaEngine.PREP_WINDOW
+    def startSteady():
+        form.setRenderStats(steady)
+    def stopSteady():
+        results["steady"] = steady.report()
+        form.setRenderStats(whole)
+
+    form.setRenderStats(whole)
+    cpuStart = time.process_time()
+    QTimer.singleShot(500, form.teaOneButton.click)
+    QTimer.singleShot(int((countdownStart + 1.5) * 1000), startSteady)
+    QTimer.singleShot(int((countdownStart + args.seconds - 0.5) * 1000), stopSteady)
+    QTimer.singleShot(int((countdownStart + args.seconds + 3) * 1000), form.resetButton.click)
+    QTimer.singleShot(int((countdownStart + args.seconds + 4) * 1000), app.exit)
+    app.exec_()
+    cpu = time.process_time() - cpuStart
+
+    report = results["steady"]
+    print("steady countdown: {0} ticks, {1:.2f} frames per tick, paint {2:.2f} ms mean, {3:.2f} ms max".format(
+        report["ticks"], report["framesPerTick"], report["meanPaintMs"], report["maxPaintMs"]))
+    report = whole.report()
+    print("whole brew: {0} frames outside the steady countdown, {1} widget paints in total, "
+          "paint {2:.2f} ms mean, CPU {3:.2f} s".format(report["frames"], counter.paints, report["meanPaintMs"], cpu))
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+startup.py: Measures the cold start of the timer window.
+
+Every run starts a fresh interpreter that imports teaTimer, creates the application and the window
+the way the main loop does and quits on the window's first paint. Reported are the median import
+time of teaTimer, the time from the start of the import to the first paint, and the wall time of
+the whole process (interpreter start and teardown included). Use --json to record the numbers,
+e.g. to compare them across releases.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/startup.py [--runs N] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Start the timer in this process, with its data files in a directory, and print the import and
+# first paint times in milliseconds
+def measureChild(directory):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+    start = time.perf_counter()
+    import teaTimer
+    imported = time.perf_counter()
+
+    from PyQt5.QtCore import QEvent, QObject, Qt
+    from PyQt5.QtWidgets import QApplication
+
+    # Quit on the first paint of the window
+    class PaintWatcher(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint:
+                self.painted = time.perf_counter()
+                QApplication.instance().exit()
+            return False
+
+    for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+        setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+
+    app = QApplication(sys.argv[:1])
+    teaTimer.loadFonts()
+
+    screen = teaTimer.Form()
+    watcher = PaintWatcher()
+    screen.installEventFilter(watcher)
+    screen.setWindowFlags(Qt.FramelessWindowHint)
+    screen.show()
+    app.exec_()
+
+    print(json.dumps({"import": (imported - start) * 1000, "firstPaint": (watcher.painted - start) * 1000}))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Measure the cold start of the timer window.")
+    parser.add_argument("--runs", type=int, default=10, help="number of fresh processes to start")
+    parser.add_argument("--json", action="store_true", help="print the medians as JSON")
+    parser.add_argument("--child", metavar="DIRECTORY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measureChild(args.child)
+        sys.exit()
+
+    # The children share a scratch directory for the window's data files, not the user's ones; the
+    # first run seeds the catalog there like a first start
+    results = {"import": [], "firstPaint": [], "process": []}
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(args.runs):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", directory], check=True,
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    universal_newlines=True).stdout
+            results["process"].append((time.perf_counter() - start) * 1000)
+            for name, value in json.loads(output).items():
+                results[name].append(value)
+
+    medians = {name: round(statistics.median(values), 1) for name, values in results.items()}
+    if args.json:
+        print(json.dumps(medians, sort_keys=True))
+    else:
+        print("median of {0} runs: import {1[import]:.1f} ms, first paint {1[firstPaint]:.1f} ms, "
+              "process {1[process]:.1f} ms".format(args.runs, medians))
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+timerText.py: Compares the cost of showing a new time on the timer label and of formatting tea names.
+
+The timer window is shown and the label is given a new "mm:ss" text per tick, followed by the paint
+pass (and layout pass, if any) the event loop runs for it. By default the label blits its cached
+glyphs (ClockLabel); with --legacy it lays its text out as a plain QLabel again and displayTime
+formats every string anew. The name part times the display forms of a tea per click.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/timerText.py [--ticks N] [--legacy]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import textwrap
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtWidgets import QApplication
+
+import teaEngine
+import teaTimer
+from teaEngine import Tea
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time timer label updates and tea name formatting.")
+    parser.add_argument("--ticks", type=int, default=3000, help="number of label updates")
+    parser.add_argument("--legacy", action="store_true", help="plain QLabel text and unmemoized strings as before")
+    args = parser.parse_args()
+
+    if args.legacy:
+        del teaTimer.ClockLabel.setText, teaTimer.ClockLabel.text, teaTimer.ClockLabel.paintEvent
+        teaEngine.displayTime = teaEngine.displayTime.__wrapped__
+
+    directory = tempfile.mkdtemp()
+    for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+        setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+
+    app = QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    form = teaTimer.Form()
+    form.show()
+    form.switchMiddleToTimer()
+    app.processEvents()
+
+    # Label updates: a countdown of args.ticks seconds, each followed by the event loop's passes
+    start = time.perf_counter()
+    for secondsLeft in range(args.ticks, 0, -1):
+        form.timerLabel.setText(teaEngine.displayTime(secondsLeft % 3600))
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    print("timer label: {0:.1f} us per tick ({1} ticks)".format(elapsed / args.ticks * 1e6, args.ticks))
+
+    # Name forms: the info label and button text of a tea, per click
+    tea = Tea("Premium\nGyokuro Deluxe", [60])
+    clicks = 100000
+    start = time.perf_counter()
+    if args.legacy:
+        for click in range(clicks):
+            tea.name.replace("\n", " ")
+            "\n".join(textwrap.wrap(tea.name, 12))
+    else:
+        for click in range(clicks):
+            tea.displayName
+            tea.buttonName
+    elapsed = time.perf_counter() - start
+    print("tea names: {0:.2f} us per click".format(elapsed / clicks * 1e6))
@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+uiSuite.py: Times the hot paths of the timer window and fails on regressions against a baseline.
+
+Cases (median milliseconds over --runs runs, after --warmup runs):
+  form           construction of a Form up to its first paint (and its deletion, untimed)
+  brew           a tea click (prepareInfusion), infusion, one countdown tick per second of the
+                 tea (each with its frame), finish and reset; the seconds pass on a virtual clock
+  stack.*        every page transition of the two ExtendedStackedWidgets, with a stale snapshot
+                 of the page faded out (as after a countdown tick) and the first fade step
+  menuSave       opening the tea menu, editing a cycle time and saving (catalog write included)
+
+The growth of the resident memory over all timed runs is reported as memoryGrowthKB. Results are
+compared with the baseline file (if there is one) and the script exits with status 1 if a case got
+slower by more than --threshold (and by more than NOISE_MS) or memory grew by more than
+--memory-allowance KB beyond the baseline. --save records the results as the new baseline; it
+belongs to the machine it was recorded on, so it is not checked in.
+
+Usage: QT_QPA_PLATFORM=offscreen python3 benchmarks/uiSuite.py [--save] [--threshold 0.25]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)      # teaTimer loads its resources relative to the working directory
+
+from PyQt5.QtCore import QT_VERSION_STR, QCoreApplication, QEvent
+from PyQt5.QtWidgets import QApplication
+
+import teaTimer
+from brewSimulation import VirtualClock
+from teaEngine import Tea
+
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "uiBaseline.json")
+NOISE_MS = 0.05                         # Slowdowns below this are never reported as regressions
+
+# Page transitions of (stack attribute, from index, to index, name)
+TRANSITIONS = (("middleStack", 0, 1, "stack.middle.leaves>timer"),
+               ("middleStack", 1, 0, "stack.middle.timer>leaves"),
+               ("bottomStack", 0, 1, "stack.bottom.teas>reset"),
+               ("bottomStack", 1, 0, "stack.bottom.reset>teas"),
+               ("bottomStack", 0, 2, "stack.bottom.teas>menu"),
+               ("bottomStack", 2, 0, "stack.bottom.menu>teas"))
+
+
+# Resident memory of this process in KB (the peak where /proc is not available)
+def residentMemory():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Milliseconds a call takes
+def timeCall(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+# Finish the fade of a stack right away, so transitions do not overlap
+def settleStack(stack):
+    stack.faderWidget.timeline.stop()
+    stack.faderWidget.hide()
+
+
+# Construct a window up to its first paint
+def constructForm(app):
+    form = teaTimer.Form()
+    form.show()
+    app.processEvents()
+    return form
+
+
+def deleteForm(form):
+    form.closeHistory()
+    form.closeJournal()
+    form.catalog.close()
+    form.hide()
+    form.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+# Brew one infusion of the first tea button from click to reset
+def brewCycle(app, form, clock):
+    form.teaOneButton.click()
+    form.prepTimer.stop()
+    form.infusion()
+    app.processEvents()
+
+    while form.scheduler.get(form.INFUSION_KEY) is not None:
+        clock.now += 1.0
+        form.scheduler.dispatch()
+        app.processEvents()
+
+    form.reset()
+    for stack in (form.middleStack, form.bottomStack):
+        settleStack(stack)
+    app.processEvents()
+
+
+# Switch a stack from one page to another, the outgoing page having changed
+def transition(app, form, stackName, source, target):
+    stack = getattr(form, stackName)
+    stack.setCurrentIndex(source)
+    settleStack(stack)
+    app.processEvents()
+    stack.invalidateSnapshot(stack.widget(source))
+
+    elapsed = timeCall(lambda: (stack.setCurrentIndex(target), app.processEvents()))
+    settleStack(stack)
+    return elapsed
+
+
+# Open the tea menu, change the first cycle of the first tea and save it to the catalog
+def saveTeaMenu(app, form, seconds):
+    form.teaMenu()
+    form.t1CycleOne.setSeconds(seconds)
+    form.teaMenu()
+    form.flushTeas()
+    settleStack(form.bottomStack)
+    app.processEvents()
+
+
+# Run all cases; returns the median milliseconds of every case and the memory growth
+def runSuite(app, runs, warmup, ticks):
+    form = constructForm(app)
+    clock = form.scheduler.clock = VirtualClock(1000.0)
+    form.teaMap[form.teaOneButton] = Tea("Benchmark\nTea", [ticks] * 3)
+    form.buildTeaMenu()
+
+    samples = {}
+    memory = None
+    for run in range(warmup + runs):
+        if run == warmup:
+            gc.collect()
+            memory = residentMemory()
+            samples = {}
+
+        start = time.perf_counter()
+        deleteForm(constructForm(app))
+        samples.setdefault("form", []).append((time.perf_counter() - start) * 1000)
+
+        samples.setdefault("brew", []).append(timeCall(brewCycle, app, form, clock))
+
+        for stackName, source, target, name in TRANSITIONS:
+            samples.setdefault(name, []).append(transition(app, form, stackName, source, target))
+
+        samples.setdefault("menuSave", []).append(timeCall(saveTeaMenu, app, form, 10 + run % 2))
+
+    gc.collect()
+    results = dict((name, round(statistics.median(values), 3)) for name, values in samples.items())
+    results["memoryGrowthKB"] = residentMemory() - memory
+    deleteForm(form)
+    return results
+
+
+# Compare results with a baseline; returns the names of the regressed cases
+def regressions(results, baseline, threshold, memoryAllowance):
+    regressed = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            print("  {0:<28} {1:>10.3f}   (not in baseline)".format(name, value))
+            continue
+
+        if name == "memoryGrowthKB":
+            failed = value > old + memoryAllowance
+        else:
+            failed = value > old * (1 + threshold) and value - old > NOISE_MS
+        change = (value - old) / old * 100 if old else 0.0
+        print("  {0:<28} {1:>10.3f} {2:>10.3f} {3:>+8.1f} %{4}".format(
+            name, old, value, change, "   REGRESSION" if failed else ""))
+        if failed:
+            regressed.append(name)
+    return regressed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time the UI hot paths and compare them with a baseline.")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs of every case")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed runs before")
+    parser.add_argument("--ticks", type=int, default=30, help="countdown ticks per brew")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25: 25 %%)")
+    parser.add_argument("--memory-allowance", type=int, default=2048, help="allowed extra memory growth in KB")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    teaTimer.loadFonts()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("CATALOG_FILE", "HISTORY_FILE", "JOURNAL_FILE"):
+            setattr(teaTimer.Form, name, os.path.join(directory, name.lower()))
+        results = runSuite(app, args.runs, args.warmup, args.ticks)
+
+    if args.save:
+        with open(args.baseline, "w") as baselineFile:
+            json.dump({"python": platform.python_version(), "qt": QT_VERSION_STR, "machine": platform.machine(),
+                       "recorded": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results},
+                      baselineFile, indent=2, sort_keys=True)
+        for name, value in sorted(results.items()):
+            print("  {0:<28} {1:>10.3f}".format(name, value))
+        print("baseline saved to {0}".format(args.baseline))
+        sys.exit()
+
+    if not os.path.exists(args.baseline):
+        for name, value in sorted(results.items()):
+            print("  {0:<28} {1:>10.3f}".format(name, value))
+        print("no baseline at {0} (record one with --save)".format(args.baseline))
+        sys.exit()
+
+    with open(args.baseline) as baselineFile:
+        baseline = json.load(baselineFile)
+    print("  {0:<28} {1:>10} {2:>10} {3:>10}".format("case (ms)", "baseline", "now", "change"))
+    regressed = regressions(results, baseline["results"], args.threshold, args.memory_allowance)
+
+    if regressed:
+        print("FAIL: regressed beyond {0:.0%}: {1}".format(args.threshold, ", ".join(regressed)))
+        sys.exit(1)
+    print("OK: no regression beyond {0:.0%}".format(args.threshold))
@@ -0,0 +1,308 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewAlerts.py: Delivers completion alerts to sounds, desktop notifications and kitchen displays.
+
+When an infusion finishes, the timer only queues an AlertEvent (see AlertDispatcher.attach); a small
+pool of worker threads delivers it to every configured sink, so a slow webhook or a hanging
+notification command never delays a countdown. Every sink has its own bounded queue and at most one
+delivery running: events finishing while a delivery runs (or within BATCH_WINDOW of the first one)
+are delivered together as one batch, a stalled sink holds one worker at most, and when its queue is
+full the oldest events are dropped and counted instead of holding up the timer. The dispatcher
+bounds each delivery by the sink's timeout: the sink runs on a thread of its own, and a delivery
+that has not returned in time is given up and counted as timed out (see AlertDispatcher.deliver).
+
+Sinks (the --alert option of teaTimer.py may be given several times):
+
+    command:CMD     Runs CMD once per batch ({text} is replaced by the alert text) and writes the
+                    events to its stdin as JSON lines, e.g. command:notify-send "Tea" "{text}" for
+                    a desktop notification or command:paplay done.oga for a sound
+    webhook:URL     POSTs the batch as a JSON array to URL, e.g. of a kitchen display
+    log:PATH        Appends the events as JSON lines to PATH
+
+Usage: python3 teaTimer.py --alert webhook:http://127.0.0.1:9000/alerts [--alert-timeout 2]
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import collections
+import concurrent.futures
+import json
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+ALERT_WORKERS = 4                       # Worker threads delivering alerts (at most one per sink)
+ALERT_TIMEOUT = 2.0                     # Seconds a delivery to one sink may take
+BATCH_WINDOW = 0.02                     # Seconds a first event waits for others finishing with it
+MAX_BATCH = 50                          # Events delivered to a sink at once
+SINK_QUEUE_LIMIT = 200                  # Events waiting for a sink before the oldest are dropped
+
+COUNTERS = ("delivered", "batches", "failed", "timedOut", "dropped")
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# One finished infusion. finished is a wall clock time (time.time()), tea the catalog id (or None).
+class AlertEvent(collections.namedtuple("AlertEvent", "key name tea cycle duration finished")):
+    __slots__ = ()
+
+    def text(self):
+        return "{0} (cycle {1}) is ready".format(self.name, self.cycle)
+
+    def asDict(self):
+        return self._asdict()
+
+
+# Receiver of alerts. deliver is called on a thread of its own with a list of AlertEvents, never
+# concurrently for the same sink; it raises on failure. The dispatcher stops waiting for it after
+# the sink's timeout, sinks may stop earlier (e.g. a command is killed).
+class AlertSink(object):
+
+    def __init__(self, name, timeout=ALERT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+
+    def deliver(self, events):
+        raise NotImplementedError
+
+
+# Runs a command per batch, e.g. for a sound or a desktop notification
+class CommandSink(AlertSink):
+
+    def __init__(self, command, timeout=ALERT_TIMEOUT):
+        super().__init__("command:" + command, timeout)
+        self.arguments = shlex.split(command)
+
+    def deliver(self, events):
+        text = batchText(events)
+        subprocess.run([argument.replace("{text}", text) for argument in self.arguments],
+                       input=jsonLines(events), stdout=subprocess.DEVNULL, timeout=self.timeout, check=True)
+
+
+# POSTs every batch as a JSON array, e.g. to a kitchen display on the local network
+class WebhookSink(AlertSink):
+
+    def __init__(self, url, timeout=ALERT_TIMEOUT):
+        super().__init__("webhook:" + url, timeout)
+        self.url = url
+
+    def deliver(self, events):
+        payload = json.dumps([event.asDict() for event in events], separators=(",", ":")).encode("utf-8")
+        request = urllib.request.Request(self.url, payload, {"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+# Appends the events to a file as JSON lines
+class LogSink(AlertSink):
+
+    def __init__(self, path, timeout=ALERT_TIMEOUT):
+        super().__init__("log:" + path, timeout)
+        self.path = path
+
+    def deliver(self, events):
+        with open(self.path, "ab") as logFile:
+            logFile.write(jsonLines(events))
+
+
+# Hands every batch to a function, e.g. a stand-in recording what a sink would have received
+class CallbackSink(AlertSink):
+
+    def __init__(self, function, name="callback", timeout=ALERT_TIMEOUT):
+        super().__init__(name, timeout)
+        self.function = function
+
+    def deliver(self, events):
+        self.function(events)
+
+
+# Queues alerts and delivers them to the sinks on a thread pool. post never blocks.
+class AlertDispatcher(object):
+
+    def __init__(self, sinks, workers=ALERT_WORKERS, batchWindow=BATCH_WINDOW, maxBatch=MAX_BATCH,
+                 queueLimit=SINK_QUEUE_LIMIT):
+        self.sinks = list(sinks)
+        self.batchWindow = batchWindow
+        self.maxBatch = maxBatch
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max(1, min(workers, len(self.sinks))),
+                                                              thread_name_prefix="brewAlerts")
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)      # Notified whenever a sink becomes idle
+        self.pending = dict((sink, collections.deque(maxlen=queueLimit)) for sink in self.sinks)
+        self.busy = set()               # Sinks with a delivery scheduled or running
+        self.runners = {}               # Thread of the last delivery by sink, still alive if it was given up
+        self.counters = dict((sink.name, dict.fromkeys(COUNTERS, 0)) for sink in self.sinks)
+        self.closed = False             # No more events are taken
+        self.stopped = False            # No more deliveries are started
+
+    # Alert on every infusion of a scheduler that finishes
+    def attach(self, scheduler):
+        scheduler.finished.connect(lambda infusion: self.post(makeEvent(infusion)))
+
+    # Queue an event for every sink, dropping the oldest event of a full queue
+    def post(self, event):
+        with self.lock:
+            if self.closed:
+                return
+            for sink in self.sinks:
+                queue = self.pending[sink]
+                if len(queue) == queue.maxlen:
+                    self.counters[sink.name]["dropped"] += 1
+                queue.append(event)
+                if sink not in self.busy:
+                    self.busy.add(sink)
+                    self.executor.submit(self.drain, sink, self.batchWindow)
+
+    # Worker: deliver the next batch of a sink, after waiting for further events of a burst. A sink
+    # with more events queued is resubmitted, so busy sinks take turns on the workers.
+    def drain(self, sink, wait=0):
+        if wait:
+            time.sleep(wait)
+
+        with self.lock:
+            queue = self.pending[sink]
+            batch = [queue.popleft() for event in range(min(len(queue), self.maxBatch))]
+
+        if batch:
+            self.deliver(sink, batch)
+
+        with self.lock:
+            if self.pending[sink] and not self.stopped:
+                self.executor.submit(self.drain, sink)
+            else:
+                self.busy.discard(sink)
+                self.idle.notify_all()
+
+    # Deliver one batch to a sink and count the outcome
+    def deliver(self, sink, batch):
+        counters = self.counters[sink.name]
+        try:
+            self.run(sink, batch)
+        except Exception as error:
+            outcome = "timedOut" if isTimeout(error) else "failed"
+            print("Alert to {0} {1}: {2}".format(sink.name, "timed out" if outcome == "timedOut" else "failed",
+                                                 error), file=sys.stderr)
+        else:
+            outcome = "delivered"
+        with self.lock:
+            counters[outcome] += len(batch) if outcome == "delivered" else 1
+            counters["batches"] += 1
+
+    # Run the delivery of a batch on a daemon thread and wait for it up to the sink's timeout; raises
+    # TimeoutError then. A delivery given up keeps its thread (which cannot be stopped) but no worker,
+    # and the next one of the sink waits for it within its own timeout, so a sink never runs twice
+    # at once and a hanging sink neither holds a worker nor keeps the interpreter from exiting.
+    def run(self, sink, batch):
+        deadline = time.monotonic() + sink.timeout
+        runner = self.runners.get(sink)
+        if runner is not None:
+            runner.join(sink.timeout)
+            if runner.is_alive():
+                raise TimeoutError("the previous delivery is still running after {0} s".format(sink.timeout))
+
+        future = concurrent.futures.Future()
+        runner = threading.Thread(target=runDelivery, args=(sink, batch, future), name="brewAlerts-delivery",
+                                  daemon=True)
+        self.runners[sink] = runner
+        runner.start()
+        try:
+            future.result(max(0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            raise TimeoutError("no answer within {0} s".format(sink.timeout))
+
+    # Counters of every sink (events delivered and dropped, batches, failed and timed out
+    # deliveries) and the events still waiting
+    def stats(self):
+        with self.lock:
+            return dict((sink.name, dict(self.counters[sink.name], pending=len(self.pending[sink])))
+                        for sink in self.sinks)
+
+    # Wait until every queued event has been delivered (or given up); False on a timeout
+    def flush(self, timeout=None):
+        with self.idle:
+            return self.idle.wait_for(lambda: not self.busy, timeout)
+
+    # Stop taking events and give the queued ones up to a timeout to go out
+    def close(self, timeout=ALERT_TIMEOUT):
+        with self.lock:
+            self.closed = True
+        delivered = self.flush(timeout)
+        with self.lock:
+            self.stopped = True
+        self.executor.shutdown(wait=False)
+        return delivered
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Alert event of a finished Infusion
+def makeEvent(infusion):
+    tea = infusion.tea
+    return AlertEvent(str(infusion.key), tea.displayName if tea is not None else "",
+                      tea.teaId if tea is not None else None, infusion.cycle, infusion.duration, time.time())
+
+
+# Thread of a delivery: hand a batch to a sink and its outcome to a future
+def runDelivery(sink, events, future):
+    try:
+        sink.deliver(events)
+    except BaseException as error:
+        future.set_exception(error)
+    else:
+        future.set_result(None)
+
+
+# Sink of a command line specification (see the module docstring); raises ValueError
+def parseSink(spec, timeout=ALERT_TIMEOUT):
+    kind, separator, target = spec.partition(":")
+    sinks = {"command": CommandSink, "webhook": WebhookSink, "log": LogSink}
+    if not separator or not target or kind not in sinks:
+        raise ValueError("invalid alert sink {0!r} (use command:CMD, webhook:URL or log:PATH)".format(spec))
+    return sinks[kind](target, timeout)
+
+
+# Text announcing a batch, e.g. for a notification
+def batchText(events):
+    if len(events) == 1:
+        return events[0].text()
+    return "{0} teas are ready: {1}".format(len(events), ", ".join(event.name for event in events))
+
+
+def jsonLines(events):
+    return "".join(json.dumps(event.asDict(), separators=(",", ":")) + "\n" for event in events).encode("utf-8")
+
+
+# Whether a delivery failed by running out of time
+def isTimeout(error):
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason
+    return isinstance(error, (subprocess.TimeoutExpired, socket.timeout, TimeoutError))
@@ -0,0 +1,346 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewBoard.py: Shared-memory status board of all brewing stations for local readers.
+
+The timer publishes every station (key, state, tea, cycle, duration and deadline) into a file of
+fixed layout that readers map into memory, e.g. wall displays or a point of sale polling many times
+a second. Readers never talk to the timer, so they add no load to its event loop, and the timer
+only writes when a station changes state: the countdown itself follows from the deadline, which is
+a wall clock time (time.time()).
+
+Layout (little endian): a header of HEADER_SIZE bytes (magic, layout version, number of slots, slot
+size, process id of the writer or 0 once it closed, generation counting every write), followed by
+the slots of SLOT_SIZE bytes. Every slot starts with a sequence number the writer makes odd while it
+writes the slot and even again afterwards (a seqlock): a reader that sees an odd or changed number
+retries, so it never uses a torn entry. Slots of free keys have the state code 0.
+
+The module needs neither Qt nor a running timer and serves as the reader library:
+
+    with BoardReader() as board:
+        for entry in board.read():
+            print(entry.key, entry.state, entry.name, entry.secondsLeft())
+
+Usage: python3 teaTimer.py --status-board       (default file: see defaultPath)
+       python3 brewBoard.py [--watch]           (prints the board)
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import collections
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+# Project modules
+from teaEngine import BREWING, DEADLINE_TOLERANCE, FINISHED, IDLE, PREPARING
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+MAGIC = b"TEABOARD"
+LAYOUT_VERSION = 1
+BOARD_FILE = "teatimer.board"
+DEFAULT_SLOTS = 256                     # Stations a board holds
+
+HEADER = struct.Struct("<8sIIIxxxxqQ")  # magic, version, slots, slot size, writer pid, generation
+HEADER_SIZE = 64
+GENERATION_OFFSET = HEADER.size - 8
+
+COUNTER = struct.Struct("<Q")           # Sequence number of a slot, generation of the board
+ENTRY = struct.Struct("<BxHqddd32s48s")  # state code, cycle, tea id, duration, deadline, updated, key, name
+SLOT_SIZE = 128
+KEY_SIZE = 32
+NAME_SIZE = 48
+
+STATES = (None, IDLE, PREPARING, BREWING, FINISHED)     # State of every state code (0: free slot)
+STATE_CODES = dict((state, code) for code, state in enumerate(STATES))
+
+READ_SPINS = 100                        # Retries of a slot being written before yielding the CPU
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# One station as read from the board. tea is the catalog id (None for teas outside the catalog),
+# deadline and updated are wall clock times (time.time()).
+class BoardEntry(collections.namedtuple("BoardEntry", "key state tea name cycle duration deadline updated")):
+    __slots__ = ()
+
+    # Seconds shown on the timer (see teaEngine.InfusionQueue.wake); 0 unless brewing
+    def secondsLeft(self, now=None):
+        if self.state != BREWING:
+            return 0
+
+        remaining = self.deadline - (time.time() if now is None else now)
+        return math.ceil(remaining - DEADLINE_TOLERANCE) if remaining > DEADLINE_TOLERANCE else 0
+
+
+# Writing side of a board, kept by the timer process. It creates (or takes over) the board file.
+class StatusBoard(object):
+
+    def __init__(self, path=None, slots=DEFAULT_SLOTS):
+        self.path = path or defaultPath()
+        self.slotCount = slots
+        self.slots = {}                 # Slot index by key
+        self.entries = {}               # Last written BoardEntry by key
+        self.generation = 0
+        self.overflows = 0              # Updates dropped because every slot was taken
+
+        size = HEADER_SIZE + slots * SLOT_SIZE
+        handle = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(handle, size)
+            self.map = mmap.mmap(handle, size)
+        finally:
+            os.close(handle)
+
+        # Readers check the magic, so it is written last
+        self.map[:] = bytes(size)
+        HEADER.pack_into(self.map, 0, b"\0" * len(MAGIC), LAYOUT_VERSION, slots, SLOT_SIZE, os.getpid(), 0)
+        self.map[:len(MAGIC)] = MAGIC
+
+    # Publish the state of a scheduler's stations whenever one changes (see InfusionScheduler.changed)
+    def attach(self, scheduler):
+        for key in scheduler.queue.stations:
+            self.publish(scheduler, key)
+        scheduler.changed.connect(lambda key: self.publish(scheduler, key))
+
+    # Publish one station of a scheduler. A finished infusion keeps its duration and deadline.
+    def publish(self, scheduler, key):
+        station = scheduler.station(key)
+        infusion = scheduler.get(key)
+        tea = station.currentTea
+        previous = self.entries.get(key)
+
+        if infusion is not None:
+            duration = infusion.duration
+            deadline = time.time() + infusion.deadline - scheduler.clock()
+        elif station.state == FINISHED and previous is not None:
+            duration, deadline = previous.duration, previous.deadline
+        else:
+            duration = deadline = 0.0
+
+        return self.update(BoardEntry(str(key), station.state, tea.teaId if tea is not None else None,
+                                      tea.displayName if tea is not None else "", station.infusionCycle,
+                                      duration, deadline, time.time()))
+
+    # Write one entry into the slot of its key. When every slot is taken, the slot of an idle
+    # station is reused; without one the update is dropped (returns False).
+    def update(self, entry):
+        slot = self.slots.get(entry.key)
+        if slot is None:
+            slot = self.allocate()
+            if slot is None:
+                self.overflows += 1
+                return False
+            self.slots[entry.key] = slot
+        self.entries[entry.key] = entry
+
+        tea = -1 if entry.tea is None else entry.tea
+        self.writeSlot(slot, ENTRY.pack(STATE_CODES[entry.state], entry.cycle, tea, entry.duration, entry.deadline,
+                                        entry.updated, encodeText(entry.key, KEY_SIZE),
+                                        encodeText(entry.name, NAME_SIZE)))
+        return True
+
+    # Free the slot of a key (e.g. of a station that no longer exists)
+    def remove(self, key):
+        slot = self.slots.pop(key, None)
+        self.entries.pop(key, None)
+        if slot is not None:
+            self.writeSlot(slot, bytes(ENTRY.size))
+
+    # Return a free slot index, taking one over from an idle station if necessary (or None)
+    def allocate(self):
+        if len(self.slots) < self.slotCount:
+            taken = set(self.slots.values())
+            return next(slot for slot in range(self.slotCount) if slot not in taken)
+
+        for key, entry in self.entries.items():
+            if entry.state == IDLE:
+                slot = self.slots.pop(key)
+                del self.entries[key]
+                return slot
+        return None
+
+    # Replace the entry of a slot under its sequence number (odd while it is written)
+    def writeSlot(self, slot, data):
+        offset = HEADER_SIZE + slot * SLOT_SIZE
+        sequence = COUNTER.unpack_from(self.map, offset)[0]
+        COUNTER.pack_into(self.map, offset, sequence + 1)
+        self.map[offset + COUNTER.size:offset + COUNTER.size + len(data)] = data
+        COUNTER.pack_into(self.map, offset, sequence + 2)
+
+        self.generation += 1
+        COUNTER.pack_into(self.map, GENERATION_OFFSET, self.generation)
+
+    # Mark the board as no longer written (the entries stay readable) and unmap it
+    def close(self):
+        if self.map.closed:
+            return
+        HEADER.pack_into(self.map, 0, MAGIC, LAYOUT_VERSION, self.slotCount, SLOT_SIZE, 0, self.generation)
+        self.map.close()
+
+
+# Reading side of a board; any number of processes may read at once
+class BoardReader(object):
+
+    def __init__(self, path=None):
+        self.path = path or defaultPath()
+        self.map = None
+        self.open()
+
+    # Map the board file and check its layout (raises ValueError for a file that is no board)
+    def open(self):
+        with open(self.path, "rb") as boardFile:
+            self.map = mmap.mmap(boardFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.map) < HEADER_SIZE:
+            self.map.close()
+            raise ValueError("{0} is no status board".format(self.path))
+        magic, version, slots, slotSize, pid, generation = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION or slotSize != SLOT_SIZE \
+                or len(self.map) < HEADER_SIZE + slots * SLOT_SIZE:
+            self.map.close()
+            raise ValueError("{0} is no status board of layout version {1}".format(self.path, LAYOUT_VERSION))
+
+        self.slotCount = slots
+
+    # Number of writes so far; readers polling at a high rate may skip reading while it is unchanged
+    def generation(self):
+        return COUNTER.unpack_from(self.map, GENERATION_OFFSET)[0]
+
+    # Whether a timer process is (still) writing the board
+    def writerAlive(self):
+        pid = HEADER.unpack_from(self.map, 0)[4]
+        if pid == 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    # Return the BoardEntry of every station on the board
+    def read(self):
+        entries = []
+        for slot in range(self.slotCount):
+            entry = self.readSlot(slot)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    # Return the BoardEntry of one station (or None)
+    def get(self, key):
+        for entry in self.read():
+            if entry.key == key:
+                return entry
+        return None
+
+    # Read one slot consistently (None for a free one): retry while the writer is in the middle of
+    # writing it, yielding the CPU to the writer after READ_SPINS attempts
+    def readSlot(self, slot):
+        offset = HEADER_SIZE + slot * SLOT_SIZE
+        spins = 0
+        while True:
+            sequence = COUNTER.unpack_from(self.map, offset)[0]
+            if not sequence & 1:
+                fields = ENTRY.unpack_from(self.map, offset + COUNTER.size)
+                if COUNTER.unpack_from(self.map, offset)[0] == sequence:
+                    break
+
+            spins += 1
+            if spins % READ_SPINS == 0:
+                time.sleep(0)
+
+        state, cycle, tea, duration, deadline, updated, key, name = fields
+        if state == 0:
+            return None
+        return BoardEntry(decodeText(key), STATES[state], None if tea < 0 else tea, decodeText(name), cycle,
+                          duration, deadline, updated)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Board file of this user: in shared memory (/dev/shm) where available, else the temp directory
+def defaultPath():
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "{0}-{1}".format(os.getuid() if hasattr(os, "getuid") else 0, BOARD_FILE))
+
+
+# UTF-8 text cut to a field size (at a character boundary), padded with zero bytes by struct
+def encodeText(text, size):
+    data = text.encode("utf-8")
+    if len(data) > size:
+        data = data[:size].decode("utf-8", "ignore").encode("utf-8")
+    return data
+
+
+def decodeText(data):
+    return data.rstrip(b"\0").decode("utf-8", "replace")
+
+
+"""
+MAIN LOOP
+===============================================================
+"""
+
+if __name__ == '__main__':
+
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Print the status board of a running tea timer.")
+    parser.add_argument("path", nargs="?", help="board file (default: {0})".format(defaultPath()))
+    parser.add_argument("--watch", action="store_true", help="print the board again every second")
+    args = parser.parse_args()
+
+    try:
+        board = BoardReader(args.path)
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+
+    with board:
+        while True:
+            if not board.writerAlive():
+                print("(no timer is writing this board)")
+            for entry in board.read():
+                print("{0:<20} {1:<10} {2:<30} cycle {3:<3} {4:>5} s left".format(
+                    entry.key, entry.state, entry.name, entry.cycle, entry.secondsLeft()))
+            if not args.watch:
+                break
+            print()
+            time.sleep(1)
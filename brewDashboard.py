@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewDashboard.py: One window with a grid of timer panels, one per brewing station.
+
+Every panel is a small version of the timer window built from the same labels, stack widgets and
+animations: tea buttons, prep window, countdown with background gradient, leaves pulse and reset.
+The panels share everything that can be shared: one style sheet template (see brewThemes.py), one
+leaves pixmap, the fonts, the tea list and the gradient tables. Countdowns of all stations run on a
+single InfusionScheduler and all prep windows on a second one, so 50 stations cost two timers; the
+label animations are driven by Qt's unified animation timer anyway. Panels keep no brew history
+or journal, those belong to the timer window.
+
+Usage: python3 teaTimer.py --stations 12
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import functools
+import math
+
+# External modules
+from PyQt5.QtCore import QAbstractAnimation, QEasingCurve, Qt
+from PyQt5.QtGui import QColor, QPainter, QPixmap
+from PyQt5.QtWidgets import QGridLayout, QHBoxLayout, QStyle, QStyleOption, QVBoxLayout, QWidget
+
+# Project modules
+import teaEngine
+from brewMetrics import AnimationTiming, timed
+from brewScheduler import InfusionScheduler
+from brewThemes import THEMES
+from teaTimer import (ClockLabel, ExtendedButton, ExtendedLabel, ExtendedStackedWidget, Form,
+                      STYLE_FILE, backgroundColors)
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+DASHBOARD_STYLE_FILE = "dashboard.qss"
+LEAVES_FILE = "resources/imgs/leaves.png"
+LEAVES_HEIGHT = 72                      # Pixel height of the leaves image on a panel
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Timer of one station, shown as a panel of the dashboard
+class TimerPanel(QWidget):
+
+    def __init__(self, key, dashboard):
+        super().__init__()
+
+        self.key = key
+        self.dashboard = dashboard
+        self.station = dashboard.scheduler.station(key)
+        self.currentBackgroundColor = dashboard.startColor
+
+        # UI elements
+        # -------------------------------------------------------------------
+        self.titleLabel = ExtendedLabel(key, "titleLabel")
+        self.timerLabel = ClockLabel("00:00", "timerLabel")
+        self.infoLabel = ExtendedLabel("Select your tea", "infoLabel")
+        self.leavesLabel = ExtendedLabel("", "leavesLabel")
+        self.leavesLabel.setPixmap(leavesPixmap())
+
+        self.teaButtonsBox = QHBoxLayout()
+        self.teaButtonsBox.setSpacing(2)
+        self.teaButtonsBox.setContentsMargins(0, 0, 0, 0)
+        for tea, objectName in zip(dashboard.teas, ("teaOneButton", "teaTwoButton")):
+            button = ExtendedButton(tea.buttonName, objectName)
+            button.clicked.connect(functools.partial(self.prepareInfusion, tea))
+            self.teaButtonsBox.addWidget(button)
+
+        self.teaButtons = QWidget()
+        self.teaButtons.setLayout(self.teaButtonsBox)
+
+        self.resetButton = ExtendedButton("Reset", "resetButton")
+        self.resetButton.clicked.connect(self.reset)
+
+        # Layouts
+        # -------------------------------------------------------------------
+        self.middleStack = ExtendedStackedWidget()
+        self.middleStack.addWidget(self.leavesLabel)
+        self.middleStack.addWidget(self.timerLabel)
+
+        self.bottomStack = ExtendedStackedWidget()
+        self.bottomStack.addWidget(self.teaButtons)
+        self.bottomStack.addWidget(self.resetButton)
+
+        box = QVBoxLayout()
+        box.setSpacing(0)
+        box.setContentsMargins(2, 2, 2, 2)
+        box.addWidget(self.titleLabel, 0, Qt.AlignHCenter)
+        box.addWidget(self.middleStack, 1, Qt.AlignHCenter)
+        box.addWidget(self.infoLabel, 0, Qt.AlignHCenter)
+        box.addWidget(self.bottomStack)
+        self.setLayout(box)
+
+        self.setupAnimations()
+
+    # Configure both label animations once (see Form.setupAnimations)
+    def setupAnimations(self):
+        self.leavesLabel.Anim.setDuration(int(teaEngine.LEAVES_PULSE_DURATION*1000))
+        self.leavesLabel.Anim.setEasingCurve(QEasingCurve.InCubic)
+        self.leavesLabel.Anim.setStartValue(1.0)
+        self.leavesLabel.Anim.setKeyValueAt(0.5, 0.3)
+        self.leavesLabel.Anim.setEndValue(1.0)
+
+        self.timerLabel.Anim.setDuration(int(teaEngine.TIMER_PULSE_DURATION*1000))
+        self.timerLabel.Anim.setEasingCurve(QEasingCurve.InQuart)
+        self.timerLabel.Anim.setStartValue(1.0)
+        self.timerLabel.Anim.setKeyValueAt(0.5, 0.3)
+        self.timerLabel.Anim.setEndValue(1.0)
+        self.timerLabel.Anim.setLoopCount(teaEngine.TIMER_PULSE_LOOPS)
+        AnimationTiming(self.timerLabel.Anim, "timerPulse")
+
+    # Program Logic
+    # -------------------------------------------------------------------
+    # Register a tea click and (re-)open the prep window of this station
+    def prepareInfusion(self, tea):
+        if not tea.nextCycles:
+            self.infoLabel.setText("No time set for this tea")
+            return
+
+        self.dashboard.scheduler.select(self.key, tea)
+        self.dashboard.prepScheduler.start(self.key, duration=teaEngine.PREP_WINDOW)
+
+        self.timerLabel.setText(teaEngine.displayTime(self.station.infusionTime()))
+        self.middleStack.invalidateSnapshot(self.timerLabel)
+        self.infoLabel.setText(tea.displayName + " - Cycle " + str(self.station.infusionCycle))
+        self.middleStack.setCurrentIndex(1)
+
+        self.timerLabel.Anim.stop()
+        self.timerLabel.Anim.start(QAbstractAnimation.KeepWhenStopped)
+
+    # Start the countdown once the prep window has passed
+    def infusion(self):
+        self.bottomStack.setCurrentIndex(1)
+        self.dashboard.scheduler.start(self.key)
+
+    # Show the remaining time and background color of the countdown
+    @timed("panel.countdown")
+    def countdown(self, infusion):
+        self.timerLabel.setText(teaEngine.displayTime(infusion.secondsLeft))
+        self.middleStack.invalidateSnapshot(self.timerLabel)
+        theme = self.dashboard.theme
+        self.setBackgroundColor(backgroundColors(infusion.duration, theme.start, theme.end)[infusion.secondsLeft])
+
+    # Pulse the leaves until the tea is collected
+    def finish(self):
+        self.middleStack.setCurrentIndex(0)
+        self.infoLabel.setText("Get your tea on!")
+        self.leavesLabel.Anim.setLoopCount(-1)
+        self.leavesLabel.Anim.start(QAbstractAnimation.KeepWhenStopped)
+
+        if not self.dashboard.rendering:
+            self.leavesLabel.Anim.pause()
+
+    # Return to the initial state
+    def reset(self):
+        self.dashboard.prepScheduler.cancel(self.key)
+        self.dashboard.scheduler.reset(self.key)
+
+        self.leavesLabel.Anim.stop()
+        self.leavesLabel.fadeEffect.setOpacity(1.0)
+        self.setBackgroundColor(self.dashboard.startColor)
+        self.middleStack.setCurrentIndex(0)
+        self.infoLabel.setText("No tea selected")
+        self.bottomStack.setCurrentIndex(0)
+
+    # Change the panel background (only this panel is repainted)
+    def setBackgroundColor(self, color):
+        if color == self.currentBackgroundColor:
+            return
+
+        self.currentBackgroundColor = color
+        self.update()
+
+    # Fill the background color of the countdown, then draw the border of the style sheet (in the
+    # color of the theme, see dashboard.qss)
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.currentBackgroundColor)
+
+        option = QStyleOption()
+        option.initFrom(self)
+        self.style().drawPrimitive(QStyle.PE_Widget, option, painter, self)
+
+
+# Window showing a grid of timer panels driven by shared schedulers
+class Dashboard(QWidget):
+
+    def __init__(self, stations, teas, parent=None):
+        super().__init__(parent)
+
+        self.teas = teas                    # Teas offered on every panel
+        self.rendering = True               # Track whether countdowns and animations are drawn
+        self.theme = THEMES.theme           # Gradient endpoints of the panels (see applyTheme)
+        self.startColor = QColor(*self.theme.start)
+
+        # One scheduler for the countdowns of all stations, one (without ticks) for prep windows
+        self.scheduler = InfusionScheduler(self)
+        self.scheduler.setObjectName("countdown")      # Names its lateness in the metrics
+        self.scheduler.ticked.connect(self.countdown)
+        self.scheduler.finished.connect(self.infusionFinished)
+
+        self.prepScheduler = InfusionScheduler(self, ticking=False)
+        self.prepScheduler.setObjectName("prepTimer")
+        self.prepScheduler.finished.connect(self.prepFinished)
+
+        self.panels = {}                    # TimerPanel of every station key
+        grid = QGridLayout()
+        grid.setSpacing(4)
+        grid.setContentsMargins(4, 4, 4, 4)
+
+        columns = math.ceil(math.sqrt(stations))
+        for number in range(stations):
+            key = "Station {0}".format(number + 1)
+            self.panels[key] = TimerPanel(key, self)
+            grid.addWidget(self.panels[key], number // columns, number % columns)
+
+        self.setLayout(grid)
+        self.setObjectName("dashboard")
+        THEMES.apply(self, STYLE_FILE, DASHBOARD_STYLE_FILE)
+
+    # Take over the gradient of a new theme on every panel (see Form.applyTheme)
+    def applyTheme(self, theme):
+        self.theme = theme
+        self.startColor = QColor(*theme.start)
+        for panel in self.panels.values():
+            panel.middleStack.invalidateSnapshots()
+            panel.bottomStack.invalidateSnapshots()
+            infusion = self.scheduler.get(panel.key)
+            if infusion is not None:
+                panel.countdown(infusion)
+            elif panel.station.state == teaEngine.FINISHED:
+                panel.setBackgroundColor(QColor(*theme.end))
+            else:
+                panel.setBackgroundColor(self.startColor)
+
+    # Hand scheduler signals to the panel of their station
+    def countdown(self, infusion):
+        if self.rendering:
+            self.panels[infusion.key].countdown(infusion)
+
+    def infusionFinished(self, infusion):
+        self.panels[infusion.key].finish()
+
+    def prepFinished(self, infusion):
+        self.panels[infusion.key].infusion()
+
+    # Pause countdown repaints and animations of all panels while the dashboard is not visible
+    def showEvent(self, QShowEvent):
+        self.setRendering(True)
+
+    def hideEvent(self, QHideEvent):
+        self.setRendering(False)
+
+    def setRendering(self, rendering):
+        if not Form.LOW_POWER_IDLE or rendering == self.rendering:
+            return
+
+        self.rendering = rendering
+        for key, panel in self.panels.items():
+            self.scheduler.setTicking(key, rendering)
+
+            for animation in (panel.leavesLabel.Anim, panel.timerLabel.Anim):
+                if rendering and animation.state() == QAbstractAnimation.Paused:
+                    animation.resume()
+                elif not rendering and animation.state() == QAbstractAnimation.Running:
+                    animation.pause()
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Leaves image scaled for the panels, loaded once and shared by all of them
+@functools.lru_cache(maxsize=None)
+def leavesPixmap():
+    return QPixmap(LEAVES_FILE).scaledToHeight(LEAVES_HEIGHT, Qt.SmoothTransformation)
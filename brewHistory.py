@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewHistory.py: Append-only log of brewed infusions and statistics over it.
+
+Every infusion that ends (collected after its alert or reset while brewing) is appended as one
+fixed-width binary record: wall-clock time, tea id, cycle, outcome and planned vs. actual duration.
+The reader maps the file into memory as a NumPy structured array, so statistics over millions of
+records are computed vectorized, without creating a Python object per record. NumPy is only needed
+for reading; the timer itself only appends.
+
+Usage: python3 brewHistory.py [history.dat]
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import os
+import struct
+import time
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+MAGIC = b"TEAH"
+SCHEMA_VERSION = 1
+HEADER = struct.Struct("<4sHH8x")       # Magic, schema version, record size (padded to 16 bytes)
+RECORD = struct.Struct("<dIHBxff")      # Time, tea id, cycle, outcome, planned and actual seconds
+
+# Outcomes of an infusion
+COMPLETED = 1                           # Countdown finished, tea collected with the reset button
+RESET = 2                               # Reset (or quit) while the countdown was still running
+
+# NumPy layout of a record, matching RECORD
+RECORD_FIELDS = [("time", "<f8"), ("tea", "<u4"), ("cycle", "<u2"), ("outcome", "u1"), ("pad", "u1"),
+                 ("planned", "<f4"), ("actual", "<f4")]
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Appends infusion records to the history file, opened on first use
+class BrewHistory(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    # Append one infusion record
+    def append(self, teaId, cycle, outcome, planned, actual, at=None):
+        if self.file is None:
+            self.file = openForAppend(self.path)
+
+        self.file.write(RECORD.pack(time.time() if at is None else at, teaId or 0, cycle, outcome,
+                                    planned, actual))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Open a history file for appending, writing the header of a new file. A record torn by a crash
+# is cut off, so later records stay aligned.
+def openForAppend(path):
+    historyFile = open(path, "ab")
+
+    size = historyFile.seek(0, os.SEEK_END)
+    if size < HEADER.size:
+        historyFile.truncate(0)
+        historyFile.write(HEADER.pack(MAGIC, SCHEMA_VERSION, RECORD.size))
+    elif (size - HEADER.size) % RECORD.size:
+        historyFile.truncate(size - (size - HEADER.size) % RECORD.size)
+
+    return historyFile
+
+
+# Map the records of a history file into memory (read-only). Returns a NumPy structured array with
+# the fields of RECORD_FIELDS; an incomplete last record is ignored.
+def readHistory(path):
+    import numpy
+
+    dtype = numpy.dtype(RECORD_FIELDS)
+
+    with open(path, "rb") as historyFile:
+        header = historyFile.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return numpy.zeros(0, dtype)
+
+    magic, version, recordSize = HEADER.unpack(header)
+    if magic != MAGIC or version != SCHEMA_VERSION or recordSize != dtype.itemsize:
+        raise ValueError("unsupported history file {0}".format(path))
+
+    count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    if count == 0:
+        return numpy.zeros(0, dtype)
+    return numpy.memmap(path, dtype, "r", HEADER.size, (count,))
+
+
+# Number of completed and reset infusions per tea id, as {teaId: (completed, reset)}. Counted in
+# one pass with a bincount over tea id and outcome (tea ids are small row ids of the catalog).
+def teaCounts(records):
+    import numpy
+
+    keys = records["tea"].astype(numpy.int64) * 2 + (records["outcome"] == RESET)
+    counts = numpy.bincount(keys, minlength=keys.max(initial=0) // 2 * 2 + 2).reshape(-1, 2)
+
+    return {int(tea): (int(counts[tea, 0]), int(counts[tea, 1])) for tea in numpy.flatnonzero(counts.any(1))}
+
+
+# Mean number of seconds completed infusions steeped beyond their planned duration (until the
+# tea was collected); None without completed infusions
+def averageOverrun(records):
+    import numpy
+
+    completed = records["outcome"] == COMPLETED
+    count = numpy.count_nonzero(completed)
+    if count == 0:
+        return None
+    return float(numpy.where(completed, records["actual"] - records["planned"], 0).sum(dtype="f8") / count)
+
+
+# Number of infusions that ended in each hour of the day (local time, using the current UTC offset)
+def busiestHours(records, utcOffset=None):
+    import numpy
+
+    if utcOffset is None:
+        utcOffset = time.localtime().tm_gmtoff
+
+    hours = (records["time"].astype(numpy.int64) + int(utcOffset)) // 3600 % 24
+    return numpy.bincount(hours, minlength=24)
+
+
+"""
+MAIN LOOP
+===============================================================
+"""
+
+if __name__ == '__main__':
+
+    import sys
+
+    records = readHistory(sys.argv[1] if len(sys.argv) > 1 else "history.dat")
+    print("infusions: {0}".format(len(records)))
+
+    for teaId, (completed, reset) in sorted(teaCounts(records).items()):
+        print("  tea {0}: {1} completed, {2} reset".format(teaId, completed, reset))
+
+    overrun = averageOverrun(records)
+    if overrun is not None:
+        print("average overrun: {0:.1f} s".format(overrun))
+
+    hours = busiestHours(records)
+    print("busiest hours: " + ", ".join("{0:02}:00 ({1})".format(hour, hours[hour])
+                                         for hour in hours.argsort()[::-1][:3] if hours[hour]))
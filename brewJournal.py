@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewJournal.py: Remembers the running infusion so it can be resumed after a restart.
+
+When an infusion starts, its tea, cycle, duration and wall-clock deadline are journaled; the entry
+is cleared again when the infusion finishes or is reset. Writes happen on a background thread (with
+the crash-safe atomicWrite of teaStorage), so starting a countdown only costs a queue put. A burst
+of changes is coalesced into one write of the latest state.
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import json
+import os
+import queue
+import sys
+import threading
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Journal of the running infusion of one window
+class BrewJournal(object):
+
+    CLEAR = {}                          # Queued state that removes the journal file
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = queue.Queue()
+        self.worker = None
+
+    # Return the journaled infusion as a dict of tea, cycle, duration and deadline (seconds since
+    # the epoch), or None if there is none (or it is damaged)
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+
+        from teaStorage import StorageError, unpackRecord
+        try:
+            with open(self.path, "rb") as journalFile:
+                entry = json.loads(unpackRecord(journalFile.read()).decode("utf-8"))
+            return {"tea": int(entry["tea"]), "cycle": int(entry["cycle"]),
+                    "duration": int(entry["duration"]), "deadline": float(entry["deadline"])}
+        except (OSError, StorageError, ValueError, KeyError, TypeError) as error:
+            print("Ignoring damaged journal {0}: {1}".format(self.path, error), file=sys.stderr)
+            return None
+
+    # Journal a started infusion
+    def record(self, teaId, cycle, duration, deadline):
+        self.put({"tea": teaId, "cycle": cycle, "duration": duration, "deadline": deadline})
+
+    # Forget the journaled infusion
+    def clear(self):
+        self.put(BrewJournal.CLEAR)
+
+    # Wait until every queued change is on disk
+    def flush(self):
+        self.pending.join()
+
+    # Queue a state for the background writer, starting it on first use
+    def put(self, entry):
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.write, name="brewJournal", daemon=True)
+            self.worker.start()
+        self.pending.put(entry)
+
+    # Background writer: write the latest of all queued states
+    def write(self):
+        from teaStorage import atomicWrite, packRecord
+
+        while True:
+            entries = [self.pending.get()]
+            while not self.pending.empty():
+                entries.append(self.pending.get())
+
+            entry = entries[-1]
+            try:
+                if entry is BrewJournal.CLEAR:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                else:
+                    payload = json.dumps(entry, sort_keys=True, separators=(",", ":")).encode("utf-8")
+                    atomicWrite(self.path, packRecord(payload))
+            except OSError as error:
+                print("Could not write journal {0}: {1}".format(self.path, error), file=sys.stderr)
+            finally:
+                for entry in entries:
+                    self.pending.task_done()
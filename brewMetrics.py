@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewMetrics.py: Opt-in measurements of handler durations, timer lateness and event loop lag.
+
+Every measurement goes into a histogram of fixed, logarithmically spaced buckets (50 us to 13 s),
+so recording one is a bisect and a few additions and memory stays the same however long the timer
+runs. Profiling is off by default: an instrumented handler then only checks one flag, and the lag
+probe timer does not run. It can be switched on and off while the timer runs, through the control
+API (POST /profiling), SIGUSR1 or --profile at startup.
+
+The metrics are rendered in the Prometheus text format, served by the control API (GET /metrics)
+or written to a file every few seconds (--metrics-file).
+
+Usage: python3 teaTimer.py --metrics-file metrics.txt & kill -USR1 $!
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import bisect
+import functools
+import signal
+import socket
+import time
+
+# External modules
+from PyQt5.QtCore import QAbstractAnimation, QObject, QSocketNotifier, QTimer, Qt, pyqtSignal
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+BUCKETS = tuple(0.00005 * 2**exponent for exponent in range(19))    # Upper bounds in seconds
+BOUND_TEXTS = tuple("{0:.6g}".format(bound) for bound in BUCKETS) + ("+Inf",)
+LAG_INTERVAL = 0.1                      # Seconds between two event loop lag probes
+FILE_INTERVAL = 5.0                     # Seconds between two writes of a metrics file
+
+# Metric families
+HANDLER = "teatimer_handler_seconds"
+LATENESS = "teatimer_timer_lateness_seconds"
+LAG = "teatimer_event_loop_lag_seconds"
+
+# Label name and description of every family
+FAMILIES = {
+    HANDLER: ("handler", "Time spent in an event handler."),
+    LATENESS: ("timer", "Delay between the planned and the actual firing of a timer or end of an animation."),
+    LAG: (None, "Delay of a timer due every {0} s, i.e. time the event loop was busy.".format(LAG_INTERVAL)),
+}
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Distribution of measured seconds in fixed buckets
+class Histogram(object):
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)      # The last bucket is +Inf
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    # Copy of (bucket counts, sum, max), e.g. to render it while the Qt thread keeps observing
+    def snapshot(self):
+        return list(self.counts), self.sum, self.max
+
+
+# Histograms of all measurements and the profiling switch. Measurements are taken in the Qt thread;
+# rendering only reads and may run in any thread (the control API renders in its own).
+class Metrics(QObject):
+
+    # Signals
+    # -------------------------------------------------------------------
+    toggled = pyqtSignal(bool)          # Emitted when profiling is switched on or off
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.enabled = False
+        self.histograms = {}            # Histogram of every (family, label)
+
+        self.lagTimer = None            # Created on first use, once there is an event loop
+        self.lagDeadline = 0.0
+
+    # Switch profiling on or off (in the Qt thread)
+    def setEnabled(self, enabled):
+        enabled = bool(enabled)
+        if enabled == self.enabled:
+            return
+
+        self.enabled = enabled
+        if self.lagTimer is None:
+            self.lagTimer = QTimer(self)
+            self.lagTimer.setSingleShot(True)
+            self.lagTimer.setTimerType(Qt.PreciseTimer)
+            self.lagTimer.timeout.connect(self.probeLag)
+
+        if enabled:
+            self.armLagProbe(time.monotonic())
+        else:
+            self.lagTimer.stop()
+        self.toggled.emit(enabled)
+
+    # Record one measurement in seconds (ignored while profiling is off)
+    def observe(self, family, label, value):
+        if not self.enabled:
+            return
+
+        histogram = self.histograms.get((family, label))
+        if histogram is None:
+            histogram = self.histograms[(family, label)] = Histogram()
+        histogram.observe(value)
+
+    # Forget all measurements
+    def reset(self):
+        self.histograms.clear()
+
+    # Metrics in the Prometheus text format
+    def render(self):
+        lines = ["# HELP teatimer_profiling_enabled Whether measurements are being taken.",
+                 "# TYPE teatimer_profiling_enabled gauge",
+                 "teatimer_profiling_enabled {0}".format(int(self.enabled))]
+        histograms = sorted(list(self.histograms.items()), key=lambda item: (item[0][0], item[0][1] or ""))
+
+        for family, (labelName, description) in FAMILIES.items():
+            series = [(label, histogram.snapshot()) for (name, label), histogram in histograms if name == family]
+            if not series:
+                continue
+
+            lines += ["# HELP {0} {1}".format(family, description), "# TYPE {0} histogram".format(family)]
+            for label, (counts, total, maximum) in series:
+                selector = '{0}="{1}"'.format(labelName, label) if labelName else ""
+                count = 0
+                for bound, bucket in zip(BOUND_TEXTS, counts):
+                    count += bucket
+                    lines.append('{0}_bucket{{{1}le="{2}"}} {3}'.format(family, selector + "," if selector else "",
+                                                                       bound, count))
+                lines.append("{0}_sum{1} {2:.9g}".format(family, braced(selector), total))
+                lines.append("{0}_count{1} {2}".format(family, braced(selector), count))
+
+            # Maxima, e.g. the single worst tick behind a late finish
+            maxFamily = family.replace("_seconds", "_max_seconds")
+            lines += ["# HELP {0} Largest value of {1}.".format(maxFamily, family),
+                      "# TYPE {0} gauge".format(maxFamily)]
+            for label, (counts, total, maximum) in series:
+                selector = '{0}="{1}"'.format(labelName, label) if labelName else ""
+                lines.append("{0}{1} {2:.9g}".format(maxFamily, braced(selector), maximum))
+
+        return "\n".join(lines) + "\n"
+
+    # Measure how late the lag probe fires: as long as the event loop is busy, it cannot
+    def probeLag(self):
+        now = time.monotonic()
+        self.observe(LAG, None, now - self.lagDeadline)
+        self.armLagProbe(now)
+
+    def armLagProbe(self, now):
+        self.lagDeadline = now + LAG_INTERVAL
+        self.lagTimer.start(int(LAG_INTERVAL*1000))
+
+
+METRICS = Metrics()                     # Metrics of this process
+
+
+# Measures how much later than planned an animation (QAbstractAnimation or QTimeLine) ends. Only
+# runs to the end are measured; a pause or stop in between discards the run.
+class AnimationTiming(QObject):
+
+    def __init__(self, animation, name):
+        super().__init__(animation)
+
+        self.name = name
+        self.started = None
+        self.state = QAbstractAnimation.Stopped
+
+        animation.stateChanged.connect(self.stateChanged)
+        animation.finished.connect(self.finished)
+
+    # QTimeLine states have the same values as QAbstractAnimation states, but its signal does not
+    # pass the previous one
+    def stateChanged(self, state, *previous):
+        if state == QAbstractAnimation.Running and self.state == QAbstractAnimation.Stopped:
+            self.started = time.monotonic()
+        elif state == QAbstractAnimation.Paused:
+            self.started = None
+        self.state = state
+
+    def finished(self):
+        animation = self.parent()
+        duration = animation.totalDuration() if isinstance(animation, QAbstractAnimation) else animation.duration()
+
+        if self.started is not None and duration >= 0:
+            METRICS.observe(LATENESS, self.name, time.monotonic() - self.started - duration/1000)
+        self.started = None
+
+
+# Writes the metrics to a file every FILE_INTERVAL seconds while profiling is on, and once more
+# when it is switched off
+class MetricsFile(QObject):
+
+    def __init__(self, path, interval=FILE_INTERVAL, parent=None):
+        super().__init__(parent)
+
+        self.path = path
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(interval*1000))
+        self.timer.timeout.connect(self.write)
+
+        METRICS.toggled.connect(self.toggle)
+        self.toggle(METRICS.enabled)
+
+    def toggle(self, enabled):
+        if enabled:
+            self.timer.start()
+        else:
+            self.timer.stop()
+        self.write()
+
+    # Replace the file, so readers never see a partly written one
+    def write(self):
+        import teaStorage                   # Lazy import, see teaTimer.py
+        teaStorage.atomicWrite(self.path, METRICS.render().encode("utf-8"), sync=False)
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# A label selector in braces (nothing for none)
+def braced(selector):
+    return "{" + selector + "}" if selector else ""
+
+
+# Decorator recording the duration of a handler under the given name. Use it only on handlers
+# whose signature matches their signal (PyQt retries slots with fewer arguments on a TypeError).
+def timed(name):
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return handler(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                METRICS.observe(HANDLER, name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# Toggle profiling on a POSIX signal (SIGUSR1 by default). The signal wakes the Qt event loop
+# through a socket, so the Python handler runs right away even while the loop is idle. Returns
+# False where the signal does not exist (e.g. on Windows).
+def installToggleSignal(parent, signalName="SIGUSR1"):
+    signalNumber = getattr(signal, signalName, None)
+    if signalNumber is None:
+        return False
+
+    reader, writer = socket.socketpair()
+    reader.setblocking(False)
+    writer.setblocking(False)
+    signal.set_wakeup_fd(writer.fileno())
+
+    notifier = QSocketNotifier(reader.fileno(), QSocketNotifier.Read, parent)
+    notifier.activated.connect(lambda: reader.recv(64))
+    notifier.sockets = (reader, writer)     # Keep both ends open as long as the notifier lives
+
+    signal.signal(signalNumber, lambda number, frame: METRICS.setEnabled(not METRICS.enabled))
+    return True
+
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewScheduler.py: Keeps any number of independent infusions running on a single timer.
+
+Every infusion stores an absolute monotonic deadline. The deadline queue of teaEngine keeps the next
+wakeup of every running infusion in a min-heap; this scheduler re-arms one precise single-shot QTimer
+for the nearest of them, so hundreds of pots cost one timer instead of one QTimer per brew.
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import math
+import time
+
+# External modules
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+# Project modules
+from brewMetrics import LATENESS, METRICS, timed
+from teaEngine import InfusionQueue
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Single-timer scheduler for many concurrent infusions
+class InfusionScheduler(QObject):
+
+    # Signals
+    # -------------------------------------------------------------------
+    ticked = pyqtSignal(object)         # Emitted with an Infusion whose displayed second changed
+    finished = pyqtSignal(object)       # Emitted with an Infusion whose deadline has passed
+    changed = pyqtSignal(object)        # Emitted with the key of a station whose state changed (not on ticks)
+
+    # Without ticking, infusions only wake up on their deadline (e.g. for plain delays)
+    def __init__(self, parent=None, clock=time.monotonic, ticking=True):
+        super().__init__(parent)
+
+        self.clock = clock
+        self.queue = InfusionQueue(ticking)
+        self.wakeup = None              # Clock time the timer is armed for
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.dispatch)
+
+    # Public API
+    # -------------------------------------------------------------------
+    # Return the Station (tea and cycle state) of a key
+    def station(self, key):
+        return self.queue.station(key)
+
+    # Register a click on a tea button of a key's station (see Station.selectTea)
+    def select(self, key, tea):
+        self.queue.station(key).selectTea(tea)
+        self.changed.emit(key)
+
+    # Start (or restart) the infusion of a key. A given tea is selected on the key's station as if
+    # its button was clicked; a given cycle overrides the station's cycle. Without an explicit
+    # duration the tea's infusion time of the cycle is used. A given deadline (on the scheduler's
+    # clock) continues an infusion that started earlier, e.g. before a restart.
+    def start(self, key, tea=None, cycle=None, duration=None, deadline=None):
+        station = self.queue.station(key)
+        if tea is not None:
+            station.selectTea(tea)
+        if cycle is not None:
+            station.infusionCycle = cycle
+
+        infusion, done = self.queue.start(key, self.clock(), duration, deadline)
+
+        if done:
+            self.finished.emit(infusion)
+        else:
+            self.ticked.emit(infusion)
+        self.changed.emit(key)
+
+        self.arm()
+        return infusion
+
+    # Stop the running infusion of a key but keep its tea and cycle.
+    def cancel(self, key):
+        infusion = self.queue.cancel(key)
+        self.changed.emit(key)
+        self.arm()
+        return infusion
+
+    # Stop the running infusion of a key and return its station to the initial state.
+    def reset(self, key):
+        infusion = self.queue.reset(key)
+        self.changed.emit(key)
+        self.arm()
+        return infusion
+
+    # Switch the per-second ticks of a key on or off (e.g. while its window is hidden). Switching
+    # them back on emits a tick at once, so the display catches up.
+    def setTicking(self, key, ticking):
+        infusion = self.queue.setTicking(key, ticking, self.clock())
+
+        if infusion is not None:
+            self.ticked.emit(infusion)
+
+        self.arm()
+
+    # Return the running infusion of a key (or None)
+    def get(self, key):
+        return self.queue.get(key)
+
+    # Number of running infusions
+    def __len__(self):
+        return len(self.queue)
+
+    # Scheduling
+    # -------------------------------------------------------------------
+    # Emit the signals of every infusion that is due and re-arm the timer. While profiling, the
+    # delay of the wakeup is recorded under the object name of the scheduler (see brewMetrics.py).
+    @timed("scheduler.dispatch")
+    def dispatch(self):
+        now = self.clock()
+        if self.wakeup is not None:
+            METRICS.observe(LATENESS, self.objectName() or "scheduler", now - self.wakeup)
+
+        ticked, finished = self.queue.due(now)
+
+        for infusion in ticked:
+            if self.queue.get(infusion.key) is infusion:   # Not cancelled by an earlier handler
+                self.ticked.emit(infusion)
+        for infusion in finished:
+            self.finished.emit(infusion)
+            self.changed.emit(infusion.key)
+
+        self.arm()
+
+    # Re-arm the single timer for the nearest live wakeup
+    def arm(self):
+        wakeup = self.wakeup = self.queue.nextWakeup()
+
+        if wakeup is None:
+            self.timer.stop()
+        else:
+            self.timer.start(max(0, math.ceil((wakeup - self.clock()) * 1000)))
@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewSimulation.py: Replays brew schedules on a virtual clock, far faster than real time.
+
+The simulation drives the same Station and InfusionQueue objects as the timer window, so tea clicks,
+the prep window, cycle advance, finish and reset follow the live rules. The timer and leaves pulse
+animations are stepped on the virtual clock as well. A schedule is a CSV file of
+"seconds,station,action[,tea]" rows where action is "click" or "reset" and tea is an index into the
+tea list (1 or 2 for the stored teas).
+
+Usage: python3 brewSimulation.py schedule.csv
+       python3 brewSimulation.py --generate 1000000 --stations 40
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import collections
+import csv
+import heapq
+import itertools
+import math
+import random
+
+# Project modules
+import teaEngine
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Injectable clock whose time only moves when it is told to. Callable like time.monotonic, so it
+# can also be handed to brewScheduler.InfusionScheduler.
+class VirtualClock(object):
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    # Move the clock forward (never backwards) to the given time
+    def advanceTo(self, time):
+        if time > self.now:
+            self.now = time
+
+
+# Event-driven replay of tea clicks and resets on any number of stations
+class Simulation(object):
+
+    def __init__(self, teas, clock=None, ticking=False, onTransition=None):
+        self.teas = teas
+        self.clock = clock if clock is not None else VirtualClock()
+        self.queue = teaEngine.InfusionQueue(ticking)
+        self.onTransition = onTransition        # Called with (time, key, old state, new state)
+
+        self.timers = []                        # Entries of (time, sequence, kind, key, token)
+        self.sequence = itertools.count()
+        self.prepTokens = {}                    # Token of the pending prep window of every key
+        self.finishedAt = {}                    # Start of the leaves pulse of every finished key
+
+        self.transitions = collections.Counter()
+        self.timerPulses = 0                    # Completed timer label animations
+        self.leavesPulses = 0                   # Completed leaves label animation loops
+        self.peakBrewing = 0                    # Highest number of concurrent countdowns
+        self.ignored = 0                        # Actions on buttons that were not visible
+
+    # Actions
+    # -------------------------------------------------------------------
+    # Click the button of a tea on a station (only possible while the tea buttons are shown)
+    def click(self, key, tea):
+        station = self.queue.station(key)
+        if station.state not in (teaEngine.IDLE, teaEngine.PREPARING):
+            self.ignored += 1
+            return False
+
+        oldState = station.state
+        station.selectTea(tea)
+        self.record(key, oldState, station.state)
+
+        # Re-arm the prep window; the timer label pulse restarts with it
+        token = next(self.sequence)
+        self.prepTokens[key] = token
+        now = self.clock()
+        self.schedule(now + teaEngine.PREP_WINDOW, "prep", key, token)
+        self.schedule(now + teaEngine.TIMER_PULSE_DURATION * teaEngine.TIMER_PULSE_LOOPS, "pulse", key, token)
+        return True
+
+    # Click the reset button of a station (only possible while it is shown)
+    def reset(self, key):
+        station = self.queue.station(key)
+        if station.state not in (teaEngine.BREWING, teaEngine.FINISHED):
+            self.ignored += 1
+            return False
+
+        oldState = station.state
+        if oldState == teaEngine.FINISHED:
+            pulseTime = self.clock() - self.finishedAt.pop(key)
+            self.leavesPulses += teaEngine.leavesPulses(pulseTime)
+
+        self.queue.reset(key)
+        self.record(key, oldState, station.state)
+        return True
+
+    # Timeline
+    # -------------------------------------------------------------------
+    # Queue an internal timer (prep window or animation end)
+    def schedule(self, time, kind, key, token):
+        heapq.heappush(self.timers, (time, next(self.sequence), kind, key, token))
+
+    # Process every timer and infusion wakeup up to the given time, in time order
+    def advanceTo(self, until):
+        while True:
+            timerTime = self.timers[0][0] if self.timers else math.inf
+            wakeup = self.queue.nextWakeup()
+            if wakeup is None:
+                wakeup = math.inf
+
+            time = min(timerTime, wakeup)
+            if time > until or time == math.inf:
+                break
+
+            self.clock.advanceTo(time)
+            if timerTime <= wakeup:
+                self.fire(*heapq.heappop(self.timers)[2:])
+            else:
+                self.wake(time)
+
+        if until != math.inf:
+            self.clock.advanceTo(until)
+
+    # Handle an internal timer
+    def fire(self, kind, key, token):
+        if self.prepTokens.get(key) != token:
+            return      # Superseded by a later click
+
+        if kind == "pulse":
+            self.timerPulses += 1
+        elif kind == "prep":
+            del self.prepTokens[key]
+            infusion, done = self.queue.start(key, self.clock())
+            self.record(key, teaEngine.PREPARING, teaEngine.BREWING)
+            self.peakBrewing = max(self.peakBrewing, len(self.queue))
+            if done:
+                self.finish(key)
+
+    # Handle due infusion wakeups
+    def wake(self, time):
+        ticked, finished = self.queue.due(time)
+        for infusion in finished:
+            self.finish(infusion.key)
+
+    # Record a finished countdown; the leaves pulse starts now
+    def finish(self, key):
+        self.finishedAt[key] = self.clock()
+        self.record(key, teaEngine.BREWING, teaEngine.FINISHED)
+
+    # Count a state transition and report it to the observer
+    def record(self, key, oldState, newState):
+        self.transitions[(oldState, newState)] += 1
+        if self.onTransition is not None:
+            self.onTransition(self.clock(), key, oldState, newState)
+
+    # Replay a schedule of (seconds, station, action, tea index) events sorted by time
+    def run(self, events):
+        count = 0
+        for at, key, action, teaIndex in events:
+            self.advanceTo(at)
+            if action == "click":
+                self.click(key, self.teas[teaIndex])
+            else:
+                self.reset(key)
+            count += 1
+
+        self.advanceTo(math.inf)
+        return count
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Read a schedule CSV file lazily, row by row. Raises ValueError with the line number on a row
+# without a valid time, with an action other than click or reset, or a click without the index of
+# one of teaCount teas (1 or higher, 0 is the dummy tea).
+def readSchedule(path, teaCount):
+    with open(path, newline="") as scheduleFile:
+        reader = csv.reader(scheduleFile)
+        for row in reader:
+            if not row or row[0].startswith("#"):
+                continue
+            try:
+                if len(row) < 3:
+                    raise ValueError("expected seconds,station,action[,tea]")
+                at = float(row[0])
+                teaIndex = int(row[3]) if len(row) > 3 and row[3] else 0
+                if row[2] not in ("click", "reset"):
+                    raise ValueError("unknown action {0!r} (use click or reset)".format(row[2]))
+                if row[2] == "click" and not 1 <= teaIndex < teaCount:
+                    raise ValueError("a click needs the index of a tea (1 to {0})".format(teaCount - 1))
+            except ValueError as error:
+                raise ValueError("{0} line {1}: {2}".format(path, reader.line_num, error))
+            yield at, row[1], row[2], teaIndex
+
+
+# Generate a plausible shift: every station brews a tea (sometimes clicking for a later cycle),
+# resets after the alert and waits a while before the next brew. Events are yielded in time order.
+def generateSchedule(eventCount, stations, teas, seed=0):
+    randomizer = random.Random(seed)
+    pending = []
+
+    def plan(key, time):
+        teaIndex = randomizer.randrange(1, len(teas))
+        clicks = randomizer.choice((1, 1, 2, 3))
+        for click in range(clicks):
+            heapq.heappush(pending, (time + click * 0.4, key, "click", teaIndex))
+
+        duration = max(teas[teaIndex].infusion_times)
+        resetTime = time + teaEngine.PREP_WINDOW + clicks * 0.4 + duration + randomizer.uniform(1, 30)
+        heapq.heappush(pending, (resetTime, key, "reset", 0))
+
+    for key in range(stations):
+        plan(str(key), randomizer.uniform(0, 60))
+
+    for count in range(eventCount):
+        event = heapq.heappop(pending)
+        if event[2] == "reset":
+            plan(event[1], event[0] + randomizer.uniform(5, 300))
+        yield event
+
+
+"""
+MAIN LOOP
+===============================================================
+"""
+
+if __name__ == '__main__':
+
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Replay brew schedules on a virtual clock.")
+    parser.add_argument("schedule", nargs="?", help="CSV file of seconds,station,action[,tea] rows")
+    parser.add_argument("--generate", type=int, metavar="N", help="replay N generated events instead")
+    parser.add_argument("--stations", type=int, default=20, help="stations of a generated schedule")
+    parser.add_argument("--trace", action="store_true", help="print every state transition")
+    args = parser.parse_args()
+
+    teas = [teaEngine.Tea("Dummy Tea", [0, 0, 0]),
+            teaEngine.Tea("Premium\nSencha", [3, 15, 60]),
+            teaEngine.Tea("Premium\nBancha", [120, 180, 240])]
+
+    if args.generate:
+        events = generateSchedule(args.generate, args.stations, teas)
+    elif args.schedule:
+        events = readSchedule(args.schedule, len(teas))
+    else:
+        parser.error("either a schedule file or --generate is required")
+
+    onTransition = None
+    if args.trace:
+        onTransition = lambda at, key, old, new: print("{0:10.3f} {1:>8} {2} -> {3}".format(at, key, old, new))
+
+    simulation = Simulation(teas, onTransition=onTransition)
+    start = time.perf_counter()
+    try:
+        count = simulation.run(events)
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+
+    print("events: {0} in {1:.2f} s ({2:.0f} events/s), virtual time: {3:.0f} s".format(
+        count, elapsed, count / elapsed, simulation.clock()))
+    for (oldState, newState), total in sorted(simulation.transitions.items()):
+        print("  {0} -> {1}: {2}".format(oldState, newState, total))
+    print("timer pulses: {0}, leaves pulses: {1}, peak brewing: {2}, ignored actions: {3}".format(
+        simulation.timerPulses, simulation.leavesPulses, simulation.peakBrewing, simulation.ignored))
@@ -0,0 +1,380 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+brewThemes.py: Named color themes, switched and hot-reloaded without restyling the whole window.
+
+The style sheets (style.qss, dashboard.qss) are templates: colors are written as theme variables,
+e.g. "color: @text-color;". A theme is a file themes/<name>.theme defining these variables
+("@text-color: #617610;"), among them the endpoints of the background gradient of a countdown
+(@start-color, @end-color); variables a theme leaves out keep their value of DEFAULT_VARIABLES.
+
+A template is compiled once (and again only after its file changed): its declarations without
+variables form the base sheet, set once on the window; every rule with variables is assigned to the
+widgets its selectors name (by class and object name) and compiled once per theme. These widgets
+carry the compiled rules that apply to them as their own style sheets (see hostRules), so a theme
+switch sets a new style sheet, and thereby re-polishes, only the widgets whose rules changed instead
+of the whole widget tree. Theme and template files are watched and reloaded when they change on disk.
+
+Usage: python3 teaTimer.py --theme dusk       (the T key switches to the next theme)
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import collections
+import functools
+import os
+import re
+import sys
+
+# External modules
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QWidget
+
+# Project modules
+import teaEngine
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+THEME_DIR = "themes"
+THEME_SUFFIX = ".theme"
+DEFAULT_THEME = "meadow"
+RELOAD_DELAY = 100                      # Milliseconds of quiet on disk before changed files are reloaded
+
+# Variables of the original look, the fallback of every theme
+DEFAULT_VARIABLES = {
+    "start-color": "#{0:02X}{1:02X}{2:02X}".format(*teaEngine.STARTCOLOR),
+    "end-color": "#{0:02X}{1:02X}{2:02X}".format(*teaEngine.ENDCOLOR),
+    "text-color": "#617610",
+    "button-color": "#617610",
+    "button-text-color": "#F5FFCE",
+    "button-hover-color": "#49590C",
+    "button-pressed-color": "#384509",
+    "button-pressed-text-color": "#FFFFFF",
+    "menu-color": "#C3D766",
+    "input-text-color": "#F5FFCE",
+    "input-hover-text-color": "#617610",
+}
+
+COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+VARIABLE = re.compile(r"@([A-Za-z][\w-]*)")
+DEFINITION = re.compile(r"@([A-Za-z][\w-]*)\s*:\s*([^;]+);")
+COMPOUND = re.compile(r"^\.?([A-Za-z_]\w*|\*)?(?:#([\w-]+))?")
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Raised for a theme or template that cannot be used
+class ThemeError(ValueError):
+    pass
+
+
+# One theme: its variables (including the defaults it leaves out) and the gradient endpoints as rgba
+class Theme(collections.namedtuple("Theme", "name variables start end")):
+    __slots__ = ()
+
+
+# Rule of a template with theme variables. targets are the (class name, object name) pairs of the
+# widgets its selectors end in (None for any); combinators and states are left to Qt.
+class ThemedRule(collections.namedtuple("ThemedRule", "selectors body targets")):
+    __slots__ = ()
+
+    # Whether the rule may apply to a widget
+    def matches(self, widget):
+        return any((className is None or widget.inherits(className))
+                   and (objectName is None or widget.objectName() == objectName)
+                   for className, objectName in self.targets)
+
+    def compile(self, variables):
+        try:
+            return "{0} {{ {1} }}".format(self.selectors, VARIABLE.sub(lambda match: variables[match.group(1)],
+                                                                        self.body))
+        except KeyError as error:
+            raise ThemeError("unknown theme variable @{0} in {1}".format(error.args[0], self.selectors))
+
+
+# Parsed style sheet template: the base sheet and the rules with theme variables. The declarations
+# of a rule that use variables are split off into a themed rule, the others stay in the base sheet.
+class StyleTemplate(object):
+
+    def __init__(self, text):
+        base = []
+        self.rules = []
+        for selectors, body in RULE.findall(COMMENT.sub("", text)):
+            selectors = " ".join(selectors.split())
+            declarations = [" ".join(declaration.split()) + ";" for declaration in body.split(";")
+                            if declaration.strip()]
+            themed = [declaration for declaration in declarations if VARIABLE.search(declaration)]
+            plain = [declaration for declaration in declarations if not VARIABLE.search(declaration)]
+            if themed:
+                self.rules.append(ThemedRule(selectors, " ".join(themed), parseTargets(selectors)))
+            if plain or not themed:
+                base.append("{0} {{ {1} }}".format(selectors, " ".join(plain)))
+        self.base = " ".join(base)
+        self.compiled = {}              # (variables, compiled rules) by theme name
+
+    # Text of every rule compiled for a theme (once per theme, and again after it was reloaded)
+    def compile(self, theme):
+        variables, rules = self.compiled.get(theme.name, (None, None))
+        if variables != theme.variables:
+            rules = tuple(rule.compile(theme.variables) for rule in self.rules)
+            self.compiled[theme.name] = (theme.variables, rules)
+        return rules
+
+
+# Themed window (or dashboard): its template and the widgets with rules of it, as (widget, rule indices)
+ThemedRoot = collections.namedtuple("ThemedRoot", "paths template targets")
+
+
+# Keeps the themes and the current one, and restyles the themed windows when either changes
+class ThemeEngine(QObject):
+
+    # Signals
+    # -------------------------------------------------------------------
+    changed = pyqtSignal(object)        # Emitted with the Theme after a switch or a reload changed it
+
+    def __init__(self, directory=THEME_DIR, parent=None):
+        super().__init__(parent)
+
+        self.directory = directory
+        self.themes = loadThemes(directory)
+        self.theme = self.themes[DEFAULT_THEME]
+        self.roots = {}                 # ThemedRoot by window
+
+        self.watcher = None             # Created with the first themed window
+        self.reloadTimer = QTimer(self)
+        self.reloadTimer.setSingleShot(True)
+        self.reloadTimer.timeout.connect(self.reload)
+
+    # Style a window (and its children) from templates; widgets it gets later are styled on refresh
+    def apply(self, root, *paths):
+        self.roots[root] = ThemedRoot(paths, None, ())
+        root.destroyed.connect(functools.partial(self.roots.pop, root, None))
+        self.watch()
+        return self.restyle(root)
+
+    # Style the widgets a themed window got since it was styled (e.g. a lazily built menu)
+    def refresh(self, root):
+        self.roots[root] = self.roots[root]._replace(template=None)
+        return self.restyle(root)
+
+    # Switch to a theme by name; returns the number of re-polished widgets
+    def setTheme(self, name):
+        theme = self.themes.get(name)
+        if theme is None:
+            raise ThemeError("unknown theme {0!r} (themes: {1})".format(name, ", ".join(sorted(self.themes))))
+        if theme is self.theme:
+            return 0
+
+        self.theme = theme
+        polished = sum(self.restyle(root) for root in list(self.roots))
+        self.announce()
+        return polished
+
+    # Switch to the theme following the current one in alphabetical order
+    def cycleTheme(self):
+        names = sorted(self.themes)
+        return self.setTheme(names[(names.index(self.theme.name) + 1) % len(names)])
+
+    # Give every widget of a window hosting theme rules the rules of the current theme. Only widgets
+    # whose compiled rules differ from their style sheet get a new one (and are re-polished with
+    # their children). The window itself carries the base sheet, so changes to it restyle the whole
+    # window.
+    def restyle(self, root):
+        paths, template, targets = self.roots[root]
+        current = loadTemplate(paths)
+        if current is not template:
+            targets = hostRules(root, current.rules)
+            self.roots[root] = ThemedRoot(paths, current, targets)
+
+        rules = current.compile(self.theme)
+        polished = 0
+        for widget, indices in targets:
+            sheet = " ".join(rules[index] for index in indices)
+            if widget is root:
+                sheet = (current.base + " " + sheet).strip()
+            if widget.styleSheet() != sheet:
+                widget.setStyleSheet(sheet)
+                polished += 1 + len(widget.findChildren(QWidget))
+        return polished
+
+    # Watch the theme directory, the theme files and the templates of all themed windows. Editors
+    # often replace a file instead of writing it, which drops it from the watcher; so the files are
+    # added again after every reload.
+    def watch(self):
+        if self.watcher is None:
+            self.watcher = QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.scheduleReload)
+            self.watcher.directoryChanged.connect(self.scheduleReload)
+
+        paths = {self.directory} if os.path.isdir(self.directory) else set()
+        paths.update(os.path.join(self.directory, name) for name in themeFiles(self.directory))
+        for root in self.roots.values():
+            paths.update(root.paths)
+        watched = set(self.watcher.files() + self.watcher.directories())
+        missing = [path for path in paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    # Reload once a burst of file changes is over
+    def scheduleReload(self, path):
+        self.reloadTimer.start(RELOAD_DELAY)
+
+    # Reload the themes and restyle every themed window. A theme that no longer loads keeps its
+    # previous version; the current theme stays selected unless its file was removed.
+    def reload(self):
+        themes = loadThemes(self.directory, self.themes)
+        previous, self.themes = self.theme, themes
+        self.theme = themes.get(previous.name, themes[DEFAULT_THEME])
+
+        for root in list(self.roots):
+            try:
+                self.restyle(root)
+            except (OSError, ThemeError) as error:
+                print("Could not restyle with theme {0}: {1}".format(self.theme.name, error), file=sys.stderr)
+        self.watch()
+
+        if self.theme != previous:
+            self.announce()
+
+    # Hand the current theme to the themed windows that take it over (e.g. the gradient endpoints of
+    # Form.applyTheme) and to the listeners of changed. Windows are called directly instead of being
+    # connected, so nothing keeps a connection of a deleted window.
+    def announce(self):
+        for root in list(self.roots):
+            if hasattr(root, "applyTheme"):
+                root.applyTheme(self.theme)
+        self.changed.emit(self.theme)
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# (class name, object name) pairs a selector list ends in, e.g. "TimerPanel QLabel#infoLabel:hover"
+# gives ("QLabel", "infoLabel")
+def parseTargets(selectors):
+    targets = []
+    for selector in selectors.split(","):
+        compound = selector.replace(">", " ").split()[-1]
+        className, objectName = COMPOUND.match(compound).groups()
+        targets.append((None if className in (None, "*") else className, objectName))
+    return tuple(targets)
+
+
+# Widgets of a window that host theme rules, as (widget, rule indices), the window first. Setting a
+# style sheet re-polishes the children of a widget as well, so the rules of a widget go to its
+# topmost ancestor below the window that has rules itself (e.g. a menu container): every widget is
+# re-polished at most once per switch.
+def hostRules(root, rules):
+    matched = {}
+    for widget in root.findChildren(QWidget):
+        indices = [index for index, rule in enumerate(rules) if rule.matches(widget)]
+        if indices:
+            matched[widget] = indices
+
+    hosted = {root: set(index for index, rule in enumerate(rules) if rule.matches(root))}
+    for widget, indices in matched.items():
+        host, parent = widget, widget.parentWidget()
+        while parent is not None and parent is not root:
+            if parent in matched:
+                host = parent
+            parent = parent.parentWidget()
+        hosted.setdefault(host, set()).update(indices)
+    return [(widget, tuple(sorted(indices))) for widget, indices in hosted.items()]
+
+
+# Compiled template of style sheet files, read and parsed again only after one of them changed
+def loadTemplate(paths):
+    stamps = []
+    for path in paths:
+        status = os.stat(path)
+        stamps.append((status.st_mtime_ns, status.st_size))
+    return parseTemplate(tuple(paths), tuple(stamps))
+
+
+@functools.lru_cache(maxsize=16)
+def parseTemplate(paths, stamps):
+    texts = []
+    for path in paths:
+        with open(path, "r") as styleFile:
+            texts.append(styleFile.read())
+    return StyleTemplate("\n".join(texts))
+
+
+def themeFiles(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.endswith(THEME_SUFFIX))
+
+
+# Load every theme of a directory. A theme file that cannot be loaded is reported and skipped, or
+# keeps its version of previous themes. The default theme always exists.
+def loadThemes(directory, previous=None):
+    themes = {DEFAULT_THEME: makeTheme(DEFAULT_THEME, {})}
+    for fileName in themeFiles(directory):
+        name = fileName[:-len(THEME_SUFFIX)]
+        try:
+            themes[name] = loadTheme(os.path.join(directory, fileName))
+        except (OSError, ThemeError) as error:
+            print("Could not load theme {0}: {1}".format(name, error), file=sys.stderr)
+            if previous is not None and name in previous:
+                themes[name] = previous[name]
+    return themes
+
+
+# Theme of a file of variable definitions ("@name: value;", comments allowed)
+def loadTheme(path):
+    with open(path, "r") as themeFile:
+        text = COMMENT.sub("", themeFile.read())
+    name = os.path.basename(path)[:-len(THEME_SUFFIX)]
+    return makeTheme(name, dict((variable, value.strip()) for variable, value in DEFINITION.findall(text)))
+
+
+def makeTheme(name, variables):
+    variables = dict(DEFAULT_VARIABLES, **variables)
+    return Theme(name, variables, parseColor(variables["start-color"]), parseColor(variables["end-color"]))
+
+
+# rgba tuple of a color name, e.g. "#F5FFCE" (raises ThemeError for an invalid one)
+def parseColor(text):
+    color = QColor(text)
+    if not color.isValid():
+        raise ThemeError("invalid color {0!r}".format(text))
+    return color.getRgb()
+
+
+# Set a dynamic property that style sheet rules select on (e.g. [active="true"]) and re-polish the
+# widget, but only if the value changed
+def setStyleProperty(widget, name, value):
+    if widget.property(name) == value:
+        return False
+
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+    widget.update()
+    return True
+
+
+THEMES = ThemeEngine()                  # Themes of the application (created last, it loads them at once)
@@ -0,0 +1,457 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+controlServer.py: Local HTTP API to start, query and reset infusions programmatically.
+
+The server runs on an asyncio loop in a background thread next to the Qt event loop. Connections,
+HTTP parsing and the fan-out of countdown updates stay on the asyncio side; every command is handed
+to the Qt thread through a queued signal and executed there against the scheduler, so the engine is
+only ever touched by one thread. Commands are JSON objects; all responses but the metrics are JSON.
+
+    GET  /status[?key=K]        State of all stations (or one)
+    POST /start                 {"key": K, "tea": id, "cycle": n, "duration": s} (all but key optional)
+    POST /cycle                 {"key": K, "tea": id} - select a tea / advance its cycle like a click
+                                (409 while the station brews or has finished)
+    POST /reset                 {"key": K}
+    POST /batch                 [{"command": "start", ...}, ...] - executed in one hop, in order
+    GET  /subscribe[?key=K]     Stream of countdown updates, one JSON object per line
+    GET  /metrics               Measurements in the Prometheus text format (see brewMetrics.py)
+    POST /profiling             {"enabled": bool, "reset": bool} - switch measurements on/off, clear them
+
+Usage: python3 teaTimer.py --control-port 8787
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import asyncio
+import json
+import math
+import numbers
+import threading
+import time
+import urllib.parse
+
+# External modules
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+# Project modules
+import teaEngine
+from brewMetrics import METRICS
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+MAX_BODY = 1 << 20                      # Bytes a request body may have
+SUBSCRIBER_BUFFER_LIMIT = 1 << 16       # Bytes of unsent updates after which a subscriber is dropped
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large"}
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Raised for a command that refers to something that does not exist (answered with 404)
+class NotFound(LookupError):
+    pass
+
+
+# Raised for a command the station cannot take in its current state (answered with 409)
+class Conflict(RuntimeError):
+    pass
+
+
+# Embedded control API of the tea timer
+class ControlServer(QObject):
+
+    # Signals
+    # -------------------------------------------------------------------
+    requested = pyqtSignal(object)      # Emitted (from the asyncio thread) with a (command, future) pair
+
+    # A window whose infusion is controlled as well; its key is handled through its own methods
+    # (startInfusion and reset), so the window shows what the API did.
+    def __init__(self, scheduler, catalog, window=None, host="127.0.0.1", port=0, parent=None):
+        super().__init__(parent)
+
+        self.scheduler = scheduler
+        self.catalog = catalog
+        self.window = window
+        self.host = host
+        self.port = port                # The bound port once started (e.g. for port 0)
+
+        self.loop = None
+        self.thread = None
+        self.server = None
+        self.subscribers = {}           # Sets of subscribed StreamWriters by key (None for all keys)
+
+        self.requested.connect(self.handle, Qt.QueuedConnection)
+        self.scheduler.ticked.connect(self.publish)
+        self.scheduler.finished.connect(self.publish)
+
+    # Server lifecycle
+    # -------------------------------------------------------------------
+    # Start the asyncio loop thread and wait until the server listens
+    def start(self):
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self.serve, self.host, self.port, backlog=4096))
+                self.port = self.server.sockets[0].getsockname()[1]
+            except OSError as error:
+                errors.append(error)
+                ready.set()
+                return
+
+            ready.set()
+            self.loop.run_forever()
+
+            self.server.close()
+            for writers in self.subscribers.values():
+                for writer in writers:
+                    writer.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="controlServer", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+        if errors:
+            raise errors[0]
+        return self.port
+
+    # Stop the server and its loop thread
+    def stop(self):
+        if self.thread is None:
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+    # Qt thread
+    # -------------------------------------------------------------------
+    # Execute a command from the asyncio thread and hand the response back
+    def handle(self, request):
+        command, future = request
+
+        try:
+            response = (200, self.execute(command))
+        except NotFound as error:
+            response = (404, {"error": str(error)})
+        except Conflict as error:
+            response = (409, {"error": str(error)})
+        except (ValueError, TypeError, KeyError, IndexError) as error:
+            response = (400, {"error": "{0}: {1}".format(type(error).__name__, error)})
+
+        self.loop.call_soon_threadsafe(resolve, future, response)
+
+    # Execute one command (a dict with a "command" entry) and return its result
+    def execute(self, command):
+        if not isinstance(command, dict):
+            raise ValueError("a command must be a JSON object")
+
+        name = command.get("command")
+        if name == "batch":
+            return [self.executeSafely(entry) for entry in command["commands"]]
+        if name == "status":
+            return self.status(command.get("key"))
+        if name == "profiling":
+            return self.profiling(command.get("enabled"), command.get("reset", False))
+
+        key = str(command["key"])
+        if name == "start":
+            self.startInfusion(key, self.findTea(command.get("tea")), command.get("cycle"), command.get("duration"))
+        elif name == "cycle":
+            self.selectTea(key, self.findTea(command["tea"]))
+        elif name == "reset":
+            if self.window is not None and key == self.window.INFUSION_KEY:
+                self.window.reset()
+            elif key in self.scheduler.queue.stations:
+                self.scheduler.reset(key)
+            else:
+                raise NotFound("no station {0!r}".format(key))
+        else:
+            raise ValueError("unknown command {0!r}".format(name))
+
+        return self.stationStatus(key)
+
+    # Execute one command of a batch; a failing command reports its error in place
+    def executeSafely(self, command):
+        try:
+            return self.execute(command)
+        except (LookupError, ValueError, TypeError, Conflict) as error:
+            return {"error": "{0}: {1}".format(type(error).__name__, error)}
+
+    # Start the infusion of a key like InfusionScheduler.start (a given tea is selected as if its
+    # button was clicked), through the window for its own key
+    def startInfusion(self, key, tea, cycle, duration):
+        cycle = None if cycle is None else parseCycle(cycle)
+        duration = None if duration is None else parseDuration(duration)
+        station = self.scheduler.station(key)
+
+        if tea is None and station.currentTea is None:
+            raise ValueError("no tea selected for station {0!r}".format(key))
+        if cycle is None and tea is None and station.infusionCycle == 0:
+            raise ValueError("no cycle selected for station {0!r}".format(key))
+        if tea is not None and not tea.nextCycles:
+            raise ValueError("{0} has no infusion step longer than 0 seconds".format(tea.displayName))
+        if cycle is not None:
+            times = (tea or station.currentTea).infusion_times
+            if not 1 <= cycle <= len(times) or times[cycle-1] <= 0:
+                raise ValueError("no cycle {0} for this tea".format(cycle))
+
+        if self.window is not None and key == self.window.INFUSION_KEY:
+            if duration is not None:
+                raise ValueError("the duration of the window's infusion follows its tea")
+            self.window.startInfusion(tea, cycle)
+        else:
+            self.scheduler.start(key, tea, cycle, duration)
+
+    # Select a tea (or advance its cycle) like a click on its button, which is only possible while
+    # the tea buttons are shown; through the window for its own key, which arms its prep window
+    def selectTea(self, key, tea):
+        if not tea.nextCycles:
+            raise ValueError("{0} has no infusion step longer than 0 seconds".format(tea.displayName))
+        state = self.scheduler.station(key).state
+        if state not in (teaEngine.IDLE, teaEngine.PREPARING):
+            raise Conflict("station {0!r} is {1}, reset it first".format(key, state))
+
+        if self.window is not None and key == self.window.INFUSION_KEY:
+            self.window.selectTea(tea)
+        else:
+            self.scheduler.select(key, tea)
+
+    # Switch profiling on or off (None keeps it) and optionally clear the measurements
+    def profiling(self, enabled, reset):
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError("enabled must be true or false")
+
+        if reset:
+            METRICS.reset()
+        if enabled is not None:
+            METRICS.setEnabled(enabled)
+        return {"enabled": METRICS.enabled}
+
+    # Return the Tea of a catalog id (None for None)
+    def findTea(self, teaId):
+        if teaId is None:
+            return None
+
+        tea = self.catalog.get(int(teaId))
+        if tea is None:
+            raise NotFound("no tea {0}".format(teaId))
+        return tea
+
+    # Status of every station (or of one)
+    def status(self, key=None):
+        if key is not None:
+            if str(key) not in self.scheduler.queue.stations:
+                raise NotFound("no station {0!r}".format(key))
+            return self.stationStatus(str(key))
+        return [self.stationStatus(key) for key in self.scheduler.queue.stations]
+
+    # Status of one station
+    def stationStatus(self, key):
+        station = self.scheduler.station(key)
+        infusion = self.scheduler.get(key)
+        tea = station.currentTea
+
+        return {"key": key, "state": station.state, "cycle": station.infusionCycle,
+                "tea": tea.teaId if tea is not None else None,
+                "name": tea.displayName if tea is not None else None,
+                "secondsLeft": infusion.secondsLeft if infusion is not None else None}
+
+    # Hand a countdown update over to the subscribers
+    def publish(self, infusion):
+        if self.loop is None or not self.subscribers:
+            return
+
+        # "at" is the monotonic time of the update, e.g. for clients on this host to measure the lag
+        update = {"key": infusion.key, "secondsLeft": infusion.secondsLeft,
+                  "state": self.scheduler.station(infusion.key).state, "at": time.monotonic()}
+        self.loop.call_soon_threadsafe(self.broadcast, update)
+
+    # asyncio thread
+    # -------------------------------------------------------------------
+    # Serve one connection (HTTP/1.1 with keep-alive)
+    async def serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                method, target, headers = parseHead(head)
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    respond(writer, 413, {"error": "request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                path, query = splitTarget(target)
+                if method == "GET" and path == "/subscribe":
+                    await self.subscribe(reader, writer, query.get("key"))
+                    return
+
+                status, result = await self.dispatch(method, path, query, body)
+                close = headers.get("connection", "").lower() == "close"
+                respond(writer, status, result, close)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as error:
+            respond(writer, 400, {"error": str(error)}, close=True)
+        finally:
+            writer.close()
+
+    # Turn a request into a command and wait for the Qt thread to execute it
+    async def dispatch(self, method, path, query, body):
+        names = {"/start": "start", "/cycle": "cycle", "/reset": "reset", "/batch": "batch",
+                 "/profiling": "profiling"}
+
+        # Rendered right here, so the metrics can be read even while the Qt thread is stuck
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, METRICS.render()
+
+        if path == "/status":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            command = {"command": "status", "key": query.get("key")}
+        elif path in names:
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                data = json.loads(body.decode("utf-8")) if body else {}
+            except ValueError as error:
+                return 400, {"error": "invalid JSON: {0}".format(error)}
+            if path == "/batch" and not isinstance(data, list):
+                return 400, {"error": "a batch must be a JSON array"}
+            if path != "/batch" and not isinstance(data, dict):
+                return 400, {"error": "a command must be a JSON object"}
+            command = {"command": "batch", "commands": data} if path == "/batch" else dict(data, command=names[path])
+        else:
+            return 404, {"error": "no endpoint {0}".format(path)}
+
+        future = self.loop.create_future()
+        self.requested.emit((command, future))
+        return await future
+
+    # Keep a connection open for countdown updates until the client goes away
+    async def subscribe(self, reader, writer, key):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        self.subscribers.setdefault(key, set()).add(writer)
+
+        try:
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.unsubscribe(writer, key)
+
+    # Forget a subscriber
+    def unsubscribe(self, writer, key):
+        writers = self.subscribers.get(key)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[key]
+
+    # Send one update (encoded once) to the subscribers of its key and of all keys; subscribers
+    # that stopped reading are dropped
+    def broadcast(self, update):
+        line = (json.dumps(update, separators=(",", ":")) + "\n").encode("utf-8")
+
+        for key in (None, update["key"]):
+            for writer in list(self.subscribers.get(key, ())):
+                transport = writer.transport
+                if transport.is_closing() or transport.get_write_buffer_size() > SUBSCRIBER_BUFFER_LIMIT:
+                    self.unsubscribe(writer, key)
+                    writer.close()
+                else:
+                    transport.write(line)
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Parse the request line and headers of an HTTP request
+def parseHead(head):
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise ValueError("malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+# Split a request target into its path and a dict of query parameters
+def splitTarget(target):
+    parts = urllib.parse.urlsplit(target)
+    return parts.path, dict(urllib.parse.parse_qsl(parts.query))
+
+
+# Cycle number of a command: a whole number; raises ValueError otherwise
+def parseCycle(value):
+    number = not isinstance(value, bool) and isinstance(value, numbers.Real) and math.isfinite(value)
+    if not number or value != int(value):
+        raise ValueError("cycle must be a whole number, not {0!r}".format(value))
+    return int(value)
+
+
+# Duration of a command in seconds: a finite number up to MAX_INFUSION_TIME; raises ValueError otherwise
+def parseDuration(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or not 0 < value <= teaEngine.MAX_INFUSION_TIME:
+        raise ValueError("duration must be a number of seconds above 0 and up to {0}, not {1!r}".format(
+            teaEngine.MAX_INFUSION_TIME, value))
+    return float(value)
+
+
+# Write a JSON response (or a plain text one for a text result)
+def respond(writer, status, result, close=False):
+    if isinstance(result, str):
+        body, contentType = result.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, contentType = json.dumps(result, separators=(",", ":")).encode("utf-8"), "application/json"
+    head = "HTTP/1.1 {0} {1}\r\nContent-Type: {2}\r\nContent-Length: {3}\r\n{4}\r\n".format(
+        status, REASONS.get(status, ""), contentType, len(body), "Connection: close\r\n" if close else "")
+    writer.write(head.encode("latin-1") + body)
+
+
+# Complete a request future, unless its client has gone away
+def resolve(future, response):
+    if not future.done():
+        future.set_result(response)
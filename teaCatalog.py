@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+teaCatalog.py: A catalog of any number of teas, stored in a local SQLite database.
+
+Teas are rows with a name, a category and any number of infusion steps. Names and categories are
+indexed, so lookups, prefix searches and pages stay fast with hundreds of thousands of entries while
+only the requested rows are ever loaded into memory. Loaded teas are kept in an identity map, so
+the same row always yields the same Tea object (the cycle state of a station relies on that).
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import contextlib
+import sqlite3
+import weakref
+
+# Project modules
+from teaEngine import Tea
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS teas (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    steps TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS teas_sort_key ON teas (sort_key);
+CREATE INDEX IF NOT EXISTS teas_category ON teas (category, sort_key);
+"""
+
+INDEXES = ("teas_sort_key", "teas_category")
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Indexed, paged access to the stored teas
+class TeaCatalog(object):
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        # Track whether the database was created just now (a new one has no schema version yet)
+        self.created = self.connection.execute("PRAGMA user_version").fetchone()[0] == 0
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute("PRAGMA user_version={0}".format(SCHEMA_VERSION))
+
+        self.loaded = weakref.WeakValueDictionary()     # Tea objects by row id
+
+    # Number of teas (in a category)
+    def count(self, category=None):
+        if category is None:
+            return self.connection.execute("SELECT count(*) FROM teas").fetchone()[0]
+        return self.connection.execute("SELECT count(*) FROM teas WHERE category = ?", (category,)).fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    # Return the tea with the given id (or None)
+    def get(self, teaId):
+        row = self.connection.execute("SELECT id, name, category, steps FROM teas WHERE id = ?", (teaId,)).fetchone()
+        return self.toTea(row) if row is not None else None
+
+    # Return one page of teas in insertion order (optionally of one category only)
+    def page(self, offset, limit, category=None):
+        if category is None:
+            rows = self.connection.execute(
+                "SELECT id, name, category, steps FROM teas ORDER BY id LIMIT ? OFFSET ?", (limit, offset))
+        else:
+            rows = self.connection.execute(
+                "SELECT id, name, category, steps FROM teas WHERE category = ? ORDER BY sort_key LIMIT ? OFFSET ?",
+                (category, limit, offset))
+        return [self.toTea(row) for row in rows]
+
+    # Return teas whose name starts with the given text (case-insensitive), in name order
+    def search(self, prefix, limit=50, category=None):
+        low = sortKey(prefix)
+        high = low + "\U0010ffff"
+
+        if category is None:
+            rows = self.connection.execute(
+                "SELECT id, name, category, steps FROM teas WHERE sort_key >= ? AND sort_key < ? "
+                "ORDER BY sort_key LIMIT ?", (low, high, limit))
+        else:
+            rows = self.connection.execute(
+                "SELECT id, name, category, steps FROM teas WHERE category = ? AND sort_key >= ? AND sort_key < ? "
+                "ORDER BY sort_key LIMIT ?", (category, low, high, limit))
+        return [self.toTea(row) for row in rows]
+
+    # Return all categories in name order
+    def categories(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT category FROM teas ORDER BY category")]
+
+    # Yield (name, category, infusion times) of every tea (in a category) in insertion order. Rows are
+    # streamed from the database and not loaded as Tea objects, e.g. to export the whole catalog.
+    def entries(self, category=None):
+        if category is None:
+            rows = self.connection.execute("SELECT name, category, steps FROM teas ORDER BY id")
+        else:
+            rows = self.connection.execute(
+                "SELECT name, category, steps FROM teas WHERE category = ? ORDER BY id", (category,))
+        for name, category, steps in rows:
+            yield name, category, decodeSteps(steps)
+
+    # Add teas (any iterable) in one transaction and give each its row id
+    def extend(self, teas):
+        teas = list(teas)
+        checkCycles(teas)
+        with self.connection:
+            for tea in teas:
+                cursor = self.connection.execute(
+                    "INSERT INTO teas (name, sort_key, category, steps) VALUES (?, ?, ?, ?)", toRow(tea))
+                tea.teaId = cursor.lastrowid
+                self.loaded[tea.teaId] = tea
+
+    # Add teas in one transaction without loading them (for bulk imports: no row ids are assigned).
+    # teas may be a generator; each is checked as it is read, and a failed check rolls back all rows.
+    def insert(self, teas):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO teas (name, sort_key, category, steps) VALUES (?, ?, ?, ?)",
+                (toRow(checkCycle(tea)) for tea in teas))
+
+    # Context for adding a large number of teas: the name indexes are dropped and rebuilt once at
+    # the end, which is far faster than updating them row by row. They are rebuilt on errors too
+    # (and by any later opening of the catalog); searches are slow in the meantime.
+    @contextlib.contextmanager
+    def bulkLoad(self):
+        with self.connection:
+            for index in INDEXES:
+                self.connection.execute("DROP INDEX IF EXISTS {0}".format(index))
+        try:
+            yield self
+        finally:
+            self.connection.executescript(SCHEMA)
+
+    # Add a single tea
+    def add(self, tea):
+        self.extend([tea])
+        return tea.teaId
+
+    # Write changed teas back in one transaction; unchanged rows are not touched
+    def save(self, teas):
+        teas = list(teas)
+        checkCycles(teas)
+        with self.connection:
+            for tea in teas:
+                self.connection.execute(
+                    "UPDATE teas SET name = ?, sort_key = ?, category = ?, steps = ? WHERE id = ? "
+                    "AND (name, category, steps) IS NOT (?, ?, ?)",
+                    toRow(tea) + (tea.teaId, tea.name, tea.category, encodeSteps(tea.infusion_times)))
+
+    # Remove a tea
+    def remove(self, tea):
+        with self.connection:
+            self.connection.execute("DELETE FROM teas WHERE id = ?", (tea.teaId,))
+        self.loaded.pop(tea.teaId, None)
+
+    def close(self):
+        self.connection.close()
+
+    # Return the Tea object of a row, reusing an already loaded one
+    def toTea(self, row):
+        tea = self.loaded.get(row[0])
+        if tea is None:
+            tea = Tea(row[1], decodeSteps(row[3]), row[2], row[0])
+            self.loaded[row[0]] = tea
+        return tea
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Case- and whitespace-insensitive key for ordering and prefix search
+def sortKey(name):
+    return " ".join(name.split()).casefold()
+
+
+# Teas are only stored with at least one cycle to brew (see teaEngine.planCycles); raises ValueError
+# before anything is written otherwise
+def checkCycles(teas):
+    for tea in teas:
+        checkCycle(tea)
+
+
+# Return a tea with a cycle to brew; raises ValueError otherwise
+def checkCycle(tea):
+    if not tea.nextCycles:
+        raise ValueError("{0} has no infusion step longer than 0 seconds".format(tea.displayName))
+    return tea
+
+
+# Column values (name, sort_key, category, steps) of a tea
+def toRow(tea):
+    return (tea.name, sortKey(tea.name), tea.category, encodeSteps(tea.infusion_times))
+
+
+# Infusion steps are stored compactly as comma-separated seconds
+def encodeSteps(times):
+    return ",".join(str(int(time)) for time in times)
+
+
+def decodeSteps(text):
+    return [int(time) for time in text.split(",")] if text else []
@@ -0,0 +1,465 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+teaEngine.py: The brewing logic of the tea timer, free of any Qt dependency.
+
+Teas, the per-pot infusion cycle state (Station), running countdowns (Infusion) and the deadline
+queue that drives them are plain Python objects. The Qt front end in teaTimer.py only renders
+their state, so the same logic can be run and profiled headless (see benchmarks/engineSessions.py).
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import functools
+import heapq
+import itertools
+import math
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+STARTCOLOR = (245, 255, 206, 255)       # Background color (rgba) at the start of an infusion
+ENDCOLOR = (201, 246, 33, 255)          # Background color (rgba) at the end of an infusion
+DEADLINE_TOLERANCE = 0.001              # Seconds a wakeup may precede a deadline and still count
+GRADIENT_CACHE_SIZE = 32                # Number of infusion durations whose gradient tables are kept
+PREP_WINDOW = 1.4                       # Seconds after a tea click in which further clicks advance the cycle
+TIMER_PULSE_DURATION = 0.55             # Seconds of one timer label pulse before a countdown
+TIMER_PULSE_LOOPS = 2                   # Number of timer label pulses before a countdown
+LEAVES_PULSE_DURATION = 2.4             # Seconds of one leaves label pulse after a countdown (loops until reset)
+IDLE_PULSE_DELAY = 60                   # Seconds of leaves pulse before it slows down
+IDLE_PULSE_SLOWDOWN = 4                 # Factor by which an idle leaves pulse slows down
+NAME_WIDTH = 12                         # Characters per line of a tea name on its button
+NAME_CACHE_SIZE = 1024                  # Number of tea names whose display forms are kept
+TIME_CACHE_SIZE = 3600                  # Number of second counts whose display strings are kept
+MAX_INFUSION_TIME = 59*60 + 59          # Longest infusion step in seconds (the menu shows mm:ss)
+
+# Sub-second display of the last seconds of a countdown (see frameInterval)
+FINE_WINDOW = 60                        # Seconds before the deadline from which fractions are shown
+FINE_FAST_WINDOW = 10                   # Seconds before the deadline from which every fraction is shown
+FINE_SLOW_INTERVAL = 0.1                # Seconds between two frames before that
+MIN_FRAME_INTERVAL = 1/30               # Seconds between two frames at least (faster digits only blur)
+FRAME_BUDGET = 0.25                     # Share of the time between two frames their painting may take
+FRAME_SLACK = 0.001                     # Seconds a frame waits past the change of the shown fraction
+FINE_TIME_CACHE_SIZE = 6000             # Number of fraction counts whose display strings are kept
+
+# Station states, following the visible stages of the timer window
+IDLE = "idle"                           # Leaves shown, tea buttons active
+PREPARING = "preparing"                 # Tea clicked, waiting for the prep window to pass
+BREWING = "brewing"                     # Countdown running, reset button active
+FINISHED = "finished"                   # Countdown done, leaves pulsing until reset
+
+
+"""
+DATA DEFINITIONS
+===============================================================
+"""
+
+## Tea is Tea(String, List, String, Integer)
+# Any number of infusion steps; teaId is the row id once the tea is stored in the catalog. The name
+# is kept as stored; its display forms are derived from it (and memoized).
+class Tea(object):
+    def __init__(self, name, infusion_times, category="", teaId=None):
+        self.name = name
+        self.setInfusionTimes(infusion_times)
+        self.category = category
+        self.teaId = teaId
+
+    # Set the infusion steps and plan the cycles they allow (see planCycles). Steps are always
+    # replaced through here, not changed in place, so the plan matches them.
+    def setInfusionTimes(self, infusion_times):
+        self.infusion_times = infusion_times
+        self.nextCycles = planCycles(infusion_times)
+
+    # Name on a single line, e.g. for the info label
+    @property
+    def displayName(self):
+        return flattenName(self.name)
+
+    # Name wrapped to the width of a tea button
+    @property
+    def buttonName(self):
+        return wrapName(self.name)
+
+
+## Station is Station()
+# Infusion cycle state of one pot: which tea is brewed and which cycle comes next.
+class Station(object):
+    def __init__(self):
+        self.currentTea = None              # Track current Tea object
+        self.infusionCycle = 0              # Track current infusion cycle
+        self.state = IDLE                   # Track visible stage of the station
+        self.ticking = True                 # Track whether the displayed seconds are needed
+
+    # Change which tea is currently set as active.
+    def setActiveTea(self, tea):
+        # Check if tea has changed and eventually reset cycle count
+        if not tea == self.currentTea:
+            self.currentTea = tea
+            self.infusionCycle = 0
+
+    # Advance to the next cycle with a duration, starting over after the last one. Steps of 0
+    # seconds are skipped by looking the cycle up in the tea's plan. A cycle beyond the plan (e.g.
+    # after the steps were shortened) starts over as well.
+    def setInfusionCycle(self):
+        nextCycles = self.currentTea.nextCycles
+        self.infusionCycle = nextCycles[min(self.infusionCycle, len(nextCycles) - 1)]
+
+    # Register one click on a tea button: select the tea and advance its cycle. Raises ValueError
+    # for a tea without any infusion step longer than 0 seconds.
+    def selectTea(self, tea):
+        if not tea.nextCycles:
+            raise ValueError("{0} has no infusion step longer than 0 seconds".format(tea.displayName))
+
+        self.setActiveTea(tea)
+        self.setInfusionCycle()
+        self.state = PREPARING
+
+    # Duration in seconds of the current infusion cycle
+    def infusionTime(self):
+        return self.currentTea.infusion_times[self.infusionCycle-1]
+
+    # Return to the initial state after a tea has been brewed
+    def reset(self):
+        self.infusionCycle = 0
+        self.state = IDLE
+
+
+## Infusion is Infusion(Hashable, Tea, Integer, Integer, Float)
+# One running countdown. The key identifies the station the infusion belongs to.
+class Infusion(object):
+    def __init__(self, key, tea, cycle, duration, deadline):
+        self.key = key
+        self.tea = tea
+        self.cycle = cycle
+        self.duration = duration
+        self.deadline = deadline
+        self.secondsLeft = duration
+        self.entry = None                   # Current entry in the deadline heap
+
+    # Fraction of the background gradient to show for the currently displayed second. The first
+    # second already shows one step, the last one shows ENDCOLOR.
+    def progress(self):
+        if self.duration <= 0:
+            return 1.0
+        return (self.duration - self.secondsLeft + 1) / self.duration
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Deadline queue for any number of concurrent infusions. Every running infusion has exactly one
+# live entry in a min-heap holding its next wakeup; replaced entries are dropped lazily. Without
+# ticking (for the whole queue, e.g. in simulations, or per station, e.g. while its window is
+# hidden) infusions only wake up on their deadline.
+class InfusionQueue(object):
+
+    COMPACT_THRESHOLD = 64              # Minimum number of stale heap entries before compacting
+
+    def __init__(self, ticking=True):
+        self.ticking = ticking
+        self.stations = {}              # Station objects by key
+        self.infusions = {}             # Running Infusion objects by key
+        self.heap = []                  # Entries of [wakeup, sequence, Infusion]
+        self.sequence = itertools.count()
+        self.staleEntries = 0
+
+    # Return the station of a key, creating it on first use
+    def station(self, key):
+        station = self.stations.get(key)
+        if station is None:
+            station = self.stations[key] = Station()
+        return station
+
+    # Start (or restart) the infusion of a key for its station's current tea and cycle. Returns the
+    # Infusion and whether its deadline has already passed (e.g. for a zero duration). A given
+    # deadline (e.g. of a resumed infusion) replaces the one computed from the duration.
+    def start(self, key, now, duration=None, deadline=None):
+        station = self.station(key)
+        if duration is None:
+            duration = station.infusionTime()
+        if deadline is None:
+            deadline = now + duration
+
+        self.cancel(key)
+
+        infusion = Infusion(key, station.currentTea, station.infusionCycle, duration, deadline)
+        self.infusions[key] = infusion
+
+        if not self.wake(infusion, now):
+            del self.infusions[key]
+            station.state = FINISHED
+            return infusion, True
+
+        station.state = BREWING
+        return infusion, False
+
+    # Stop the running infusion of a key but keep its tea and cycle.
+    def cancel(self, key):
+        infusion = self.infusions.pop(key, None)
+
+        if infusion is not None:
+            self.stations[key].state = IDLE
+            self.invalidate(infusion)
+
+        return infusion
+
+    # Stop the running infusion of a key and return its station to the initial state.
+    def reset(self, key):
+        infusion = self.cancel(key)
+        self.station(key).reset()
+        return infusion
+
+    # Switch the per-second wakeups of a station on or off. Switching them on wakes a running
+    # infusion at once and returns it, so its display can catch up.
+    def setTicking(self, key, ticking, now):
+        self.station(key).ticking = ticking
+        infusion = self.infusions.get(key)
+
+        if infusion is None or not ticking or infusion.deadline - now <= DEADLINE_TOLERANCE:
+            return None
+
+        self.invalidate(infusion)
+        self.wake(infusion, now)
+        return infusion
+
+    # Return the running infusion of a key (or None)
+    def get(self, key):
+        return self.infusions.get(key)
+
+    # Number of running infusions
+    def __len__(self):
+        return len(self.infusions)
+
+    # Recompute the displayed seconds of an infusion and queue its next wakeup. Returns False
+    # once the deadline has passed.
+    def wake(self, infusion, now):
+        remaining = infusion.deadline - now
+
+        if remaining <= DEADLINE_TOLERANCE:
+            infusion.secondsLeft = 0
+            return False
+
+        infusion.secondsLeft = math.ceil(remaining - DEADLINE_TOLERANCE)
+
+        # Wake up again when the displayed second changes (the last one ends on the deadline)
+        if self.ticking and self.stations[infusion.key].ticking:
+            wakeup = now + remaining - (infusion.secondsLeft - 1)
+        else:
+            wakeup = infusion.deadline
+
+        infusion.entry = [wakeup, next(self.sequence), infusion]
+        heapq.heappush(self.heap, infusion.entry)
+        return True
+
+    # Pop every infusion that is due at the given time. Missed ticks are skipped, not replayed.
+    # Returns the lists of ticked infusions (with a new secondsLeft) and of finished ones.
+    def due(self, now):
+        ticked = []
+        finished = []
+
+        while self.heap and self.heap[0][0] <= now + DEADLINE_TOLERANCE:
+            infusion = heapq.heappop(self.heap)[2]
+
+            if infusion is None:
+                self.staleEntries -= 1
+                continue
+
+            infusion.entry = None
+            if self.wake(infusion, now):
+                ticked.append(infusion)
+            else:
+                del self.infusions[infusion.key]
+                self.stations[infusion.key].state = FINISHED
+                finished.append(infusion)
+
+        return ticked, finished
+
+    # Time of the nearest live wakeup (or None if nothing is running)
+    def nextWakeup(self):
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+            self.staleEntries -= 1
+
+        return self.heap[0][0] if self.heap else None
+
+    # Mark the heap entry of an infusion as stale
+    def invalidate(self, infusion):
+        if infusion.entry is None:
+            return
+
+        infusion.entry[2] = None
+        infusion.entry = None
+        self.staleEntries += 1
+        self.compact()
+
+    # Drop stale entries once they make up most of the heap
+    def compact(self):
+        if self.staleEntries < max(InfusionQueue.COMPACT_THRESHOLD, len(self.infusions)):
+            return
+
+        self.heap = [entry for entry in self.heap if entry[2] is not None]
+        heapq.heapify(self.heap)
+        self.staleEntries = 0
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Format a number of seconds to a minute:second string for display. Countdowns show the same
+# strings over and over, so they are built only once.
+@functools.lru_cache(maxsize=TIME_CACHE_SIZE)
+def displayTime(seconds):
+    minutes = seconds // 60
+    seconds = seconds % 60
+
+    # Use python string formatting to format in leading zeros
+    return "{0:02}:{1:02}".format(minutes, seconds)
+
+
+# Remaining time in units of the last shown digit (10**-digits seconds), rounded up like the seconds
+# of the countdown (see InfusionQueue.wake)
+def fineUnits(remaining, digits):
+    return max(0, math.ceil((remaining - DEADLINE_TOLERANCE) * 10**digits))
+
+
+# Format a remaining time in units of 10**-digits seconds as "ss.f" (tenths) or "ss.ff" (hundredths)
+@functools.lru_cache(maxsize=FINE_TIME_CACHE_SIZE)
+def displayFineTime(units, digits):
+    seconds, fraction = divmod(units, 10**digits)
+    return "{0:02}.{1:0{2}}".format(seconds, fraction, digits)
+
+
+# Seconds until the next frame of a sub-second display. A frame is due right after the shown
+# fraction changes: every fraction in the last FINE_FAST_WINDOW seconds, else every FINE_SLOW_INTERVAL.
+# Frames never come faster than MIN_FRAME_INTERVAL or than painting one (paintCost seconds) fits
+# into FRAME_BUDGET of the interval; fractions in between are skipped.
+def frameInterval(remaining, digits, paintCost):
+    unit = 10**-digits
+    interval = unit if remaining <= FINE_FAST_WINDOW else max(unit, FINE_SLOW_INTERVAL)
+    interval = max(interval, MIN_FRAME_INTERVAL, paintCost / FRAME_BUDGET)
+
+    change = (remaining - DEADLINE_TOLERANCE) % unit or unit
+    skipped = max(0, math.ceil(interval / unit - 0.001) - 1)
+    return change + skipped * unit + FRAME_SLACK
+
+
+# Next cycle after every cycle of a tea, as a table indexed by the current cycle (0 before the first
+# click): steps of 0 seconds are skipped and the last valid step is followed by the first one again.
+# Empty if no step is longer than 0 seconds. Planned once per change of the steps, so each click
+# is a single lookup whatever the number of steps.
+def planCycles(infusion_times):
+    valid = [cycle for cycle, time in enumerate(infusion_times, 1) if time > 0]
+    if not valid:
+        return ()
+
+    nextCycles = [0] * (len(infusion_times) + 1)
+    following = valid[0]
+    for cycle in range(len(infusion_times), -1, -1):
+        nextCycles[cycle] = following
+        if cycle > 0 and infusion_times[cycle-1] > 0:
+            following = cycle
+    return tuple(nextCycles)
+
+
+# Tea name on a single line, with line breaks and runs of whitespace collapsed to single spaces
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def flattenName(name):
+    return " ".join(name.split())
+
+
+# Tea name wrapped to lines of at most the given number of characters (where words allow)
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def wrapName(name, width=NAME_WIDTH):
+    import textwrap
+    return "\n".join(textwrap.wrap(flattenName(name), width))
+
+
+# Check a tea definition and return it as (name, infusion times) with the name on one line and the
+# times as integers. Raises ValueError for an empty name, no steps, steps that are not whole seconds
+# between 0 and MAX_INFUSION_TIME, or only zero steps.
+def validateTea(name, infusion_times):
+    name = flattenName(name)
+    if not name:
+        raise ValueError("empty name")
+
+    times = []
+    for time in infusion_times:
+        seconds = time if type(time) is int else wholeSeconds(time)
+        if not 0 <= seconds <= MAX_INFUSION_TIME:
+            raise ValueError("infusion time {0} is not between 0 and {1} seconds".format(time, MAX_INFUSION_TIME))
+        times.append(seconds)
+
+    if not any(times):
+        raise ValueError("no infusion step longer than 0 seconds")
+    return name, times
+
+
+# Whole number of seconds given as text or number (e.g. "15", 15.0); raises ValueError otherwise
+def wholeSeconds(value):
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+
+    try:
+        if not isinstance(value, bool) and float(value).is_integer():
+            return int(float(value))
+    except (TypeError, ValueError):
+        pass
+    raise ValueError("infusion time {0!r} is not a whole number of seconds".format(value))
+
+
+# Converts minutes and seconds into sum of seconds (integer)
+def convertToSeconds(minutes, seconds):
+    return minutes*60 + seconds
+
+
+# Linear blend between two rgba colors; progress 0.0 gives start, 1.0 gives end.
+def blendColor(start, end, progress):
+    return tuple(round(s - (s - e) * progress) for s, e in zip(start, end))
+
+
+# Background colors (rgba) of an infusion of the given duration, indexed by the displayed seconds
+# left, from the start to the end color (of a theme). The gradient is computed once per duration and
+# colors; the least recently used tables are evicted.
+@functools.lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def gradientTable(duration, start=STARTCOLOR, end=ENDCOLOR):
+    duration = math.ceil(duration)
+    if duration <= 0:
+        return (end,)
+
+    return tuple(blendColor(start, end, min(1.0, (duration - secondsLeft + 1) / duration))
+                 for secondsLeft in range(duration + 1))
+
+
+# Number of leaves pulses completed the given seconds after a countdown finished. After
+# IDLE_PULSE_DELAY the pulse slows down, the loop running then included (see Form.slowLeavesPulse).
+def leavesPulses(seconds):
+    if seconds <= IDLE_PULSE_DELAY:
+        return math.floor(seconds / LEAVES_PULSE_DURATION)
+    fast = math.floor(IDLE_PULSE_DELAY / LEAVES_PULSE_DURATION)
+    slow = (seconds - fast * LEAVES_PULSE_DURATION) / (LEAVES_PULSE_DURATION * IDLE_PULSE_SLOWDOWN)
+    return fast + math.floor(slow)
+
+
+# Background color (rgba) of an infusion for its currently displayed second
+def backgroundColor(infusion):
+    return gradientTable(infusion.duration)[infusion.secondsLeft]
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+teaStorage.py: Crash-safe files and the migration of teas stored by earlier versions.
+
+Files are written to a temporary file in the same directory, flushed to disk and renamed over the
+old file, so a crash leaves either the old or the new version behind, never a torn one (see
+atomicWrite, used by the journal and the metrics file). Records start with a small header holding a
+magic number, the schema version, a CRC32 checksum and the payload length; anything that fails these
+checks is rejected on load. Teas live in the SQLite catalog (see teaCatalog.py); the teas.dat and
+the legacy data.pickle of earlier versions are only read, once, to seed it (see seedCatalog).
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import json
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import zlib
+
+# Project modules
+import teaEngine
+from teaEngine import Tea
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+MAGIC = b"TEAT"
+SCHEMA_VERSION = 1
+HEADER = struct.Struct(">4sHII")        # Magic, schema version, CRC32 of payload, payload length
+
+
+"""
+CLASSES
+===============================================================
+"""
+
+# Raised when a stored file is damaged or of an unknown format
+class StorageError(ValueError):
+    pass
+
+
+# Maps the Tea class of legacy pickles (written by teaTimer.py running as __main__) to teaEngine
+class LegacyUnpickler(pickle.Unpickler):
+
+    def find_class(self, module, name):
+        if name == "Tea":
+            return Tea
+        return super().find_class(module, name)
+
+
+# Loads the list of teas stored by an earlier version
+class TeaStore(object):
+
+    def __init__(self, path, legacyPath=None):
+        self.path = path
+        self.legacyPath = legacyPath
+
+    # Return the stored teas, the legacy teas or a copy of the defaults (in this order)
+    def load(self, defaults):
+        try:
+            with open(self.path, "rb") as dataFile:
+                payload = unpackRecord(dataFile.read())
+            return decodeTeas(payload)
+        except FileNotFoundError:
+            pass
+        except (StorageError, ValueError, KeyError, TypeError) as error:
+            print("Ignoring damaged tea data in {0}: {1}".format(self.path, error), file=sys.stderr)
+
+        if self.legacyPath is not None:
+            try:
+                with open(self.legacyPath, "rb") as dataFile:
+                    return [Tea(tea.name, list(tea.infusion_times)) for tea in LegacyUnpickler(dataFile).load()]
+            except FileNotFoundError:
+                pass
+            except Exception as error:
+                print("Ignoring damaged tea data in {0}: {1}".format(self.legacyPath, error), file=sys.stderr)
+
+        return [Tea(tea.name, list(tea.infusion_times)) for tea in defaults]
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Add the stored teas (or a copy of the defaults) to a catalog, all but the dummy tea at index 0 of
+# the stored lists. Names are stored on one line (earlier versions kept the line breaks of the
+# buttons in them). Teas saved without any cycle by an earlier version get the infusion times of
+# the default tea in their place.
+def seedCatalog(catalog, defaults, path, legacyPath=None):
+    teas = TeaStore(path, legacyPath).load(defaults)[1:]
+    for tea, default in zip(teas, defaults[1:]):
+        tea.name = teaEngine.flattenName(tea.name)
+        if not tea.nextCycles:
+            tea.setInfusionTimes(list(default.infusion_times))
+    catalog.extend(teas)
+
+
+# Prefix a payload with the header (magic, schema version, checksum, length)
+def packRecord(payload, version=SCHEMA_VERSION):
+    return HEADER.pack(MAGIC, version, zlib.crc32(payload), len(payload)) + payload
+
+
+# Verify the header of a record and return its payload
+def unpackRecord(data, version=SCHEMA_VERSION):
+    if len(data) < HEADER.size:
+        raise StorageError("file is truncated")
+
+    magic, fileVersion, checksum, length = HEADER.unpack_from(data)
+    payload = data[HEADER.size:]
+
+    if magic != MAGIC:
+        raise StorageError("unknown file format")
+    if fileVersion != version:
+        raise StorageError("unsupported schema version {0}".format(fileVersion))
+    if length != len(payload):
+        raise StorageError("file is truncated")
+    if zlib.crc32(payload) != checksum:
+        raise StorageError("checksum mismatch")
+
+    return payload
+
+
+# Replace a file with new content so that readers only ever see the old or the new version
+def atomicWrite(path, data, sync=True):
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporaryPath = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+
+    try:
+        with os.fdopen(handle, "wb") as temporaryFile:
+            temporaryFile.write(data)
+            if sync:
+                temporaryFile.flush()
+                os.fsync(temporaryFile.fileno())
+        os.replace(temporaryPath, path)
+    except BaseException:
+        os.unlink(temporaryPath)
+        raise
+
+    # Persist the rename itself (not supported on every platform)
+    if sync and hasattr(os, "O_DIRECTORY"):
+        directoryHandle = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directoryHandle)
+        finally:
+            os.close(directoryHandle)
+
+
+# Deserialize teas from the payload of schema version 1
+def decodeTeas(payload):
+    data = json.loads(payload.decode("utf-8"))
+    return [Tea(str(tea["name"]), [int(time) for time in tea["infusion_times"]]) for tea in data["teas"]]
@@ -18,26 +18,42 @@ IMPORTS
 ===============================================================
 """
 
-# Python built-in modules
-import textwrap
-import pickle
+# Python built-in modules (teaStorage is imported where needed, it is rarely used)
+import functools
+import os
+import time
 
 # External modules
-from PyQt5.QtCore import *
-from PyQt5.QtWidgets import *
-from PyQt5.QtGui import *
+from PyQt5.QtCore import (QAbstractAnimation, QCoreApplication, QEasingCurve, QEvent, QObject, QPoint,
+                          QPropertyAnimation, QRect, QSize, Qt, QTime, QTimeLine, QTimer)
+from PyQt5.QtGui import (QColor, QCursor, QFont, QFontDatabase, QFontMetrics, QPainter, QPalette,
+                         QPixmap)
+from PyQt5.QtWidgets import (QApplication, QGraphicsOpacityEffect, QGridLayout, QHBoxLayout, QLabel,
+                             QLineEdit, QPushButton, QSizePolicy, QSpacerItem, QStackedWidget, QStyle,
+                             QTimeEdit, QWidget)
+
+# Project modules
+import teaEngine
+from teaEngine import Tea
+from teaCatalog import TeaCatalog
+from brewHistory import BrewHistory
+import brewHistory
+from brewJournal import BrewJournal
+from brewMetrics import HANDLER, LATENESS, METRICS, AnimationTiming, timed
+import brewMetrics
+from brewScheduler import InfusionScheduler
+from brewThemes import THEMES, setStyleProperty
 
 
 """
-DATA DEFINITIONS
+CONSTANTS
 ===============================================================
 """
 
-## Tea is Tea(String, List)
-class Tea(object):
-    def __init__(self, name, infusion_times):
-        self.name = name
-        self.infusion_times = infusion_times
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))     # Data files live next to this script
+STYLE_FILE = "style.qss"
+FONT_FILES = ("resources/fonts/CaviarDreams.ttf",)
+GLYPH_CACHE_SIZE = 64                   # Number of pre-rendered clock characters kept (per font, color)
 
 
 """
@@ -63,6 +79,82 @@ class ExtendedLabel(QLabel):
         self.Anim = QPropertyAnimation(self.fadeEffect, b"opacity")
 
 
+# Timer label that paints its "mm:ss" text from pre-rendered glyphs instead of laying it out as
+# text. All digits get cells of the same width and the label keeps the size of TEMPLATE, so a new
+# time neither shapes text nor changes the layout: painting it blits one cached pixmap per character.
+# Only the cells of changed characters are repainted, e.g. the last digit of a sub-second display.
+class ClockLabel(ExtendedLabel):
+
+    TEMPLATE = "00:00"                  # Text the label is sized for
+
+    def __init__(self, text="", objectName=""):
+        super().__init__(ClockLabel.TEMPLATE, objectName)
+        self.clockText = text
+
+    def setText(self, text):
+        if text == self.clockText:
+            return
+
+        if not self.isVisible():
+            self.clockText = text
+            return
+
+        # Repaint the old and new cells of every character that changed (or moved)
+        oldGlyphs = self.placeGlyphs(self.clockText)
+        newGlyphs = self.placeGlyphs(text)
+        self.clockText = text
+        dirty = QRect()
+        for position in range(max(len(oldGlyphs), len(newGlyphs))):
+            old = oldGlyphs[position] if position < len(oldGlyphs) else None
+            new = newGlyphs[position] if position < len(newGlyphs) else None
+            if old is None or new is None or old[0] is not new[0] or old[1] != new[1]:
+                for glyph in (old, new):
+                    if glyph is not None:
+                        dirty = dirty.united(QRect(glyph[1], glyph[0].size() / glyph[0].devicePixelRatio()))
+        self.update(dirty)
+
+    def text(self):
+        return self.clockText
+
+    # Area the text is aligned in, indented like QLabel does for a framed (or padded) label
+    def textRect(self):
+        rect = self.contentsRect().adjusted(self.margin(), self.margin(), -self.margin(), -self.margin())
+        indent = self.indent()
+        if indent < 0 and self.frameWidth():
+            indent = QFontMetrics(self.font()).horizontalAdvance("x") // 2
+        if indent <= 0:
+            return rect
+
+        alignment = QStyle.visualAlignment(self.layoutDirection(), self.alignment())
+        return rect.adjusted(indent if alignment & Qt.AlignLeft else 0, indent if alignment & Qt.AlignTop else 0,
+                             -indent if alignment & Qt.AlignRight else 0, -indent if alignment & Qt.AlignBottom else 0)
+
+    # Glyph pixmaps of a text with the positions they are drawn at, as [(pixmap, QPoint)]
+    def placeGlyphs(self, text):
+        if not text:
+            return []
+
+        font = self.font().toString()
+        color = self.palette().color(self.foregroundRole()).rgba()
+        ratio = self.devicePixelRatioF()
+        glyphs = [clockGlyph(char, font, color, ratio) for char in text]
+
+        size = QSize(sum(advance for pixmap, advance, overhang in glyphs), round(glyphs[0][0].height() / ratio))
+        rect = QStyle.alignedRect(self.layoutDirection(), self.alignment(), size, self.textRect())
+
+        placed = []
+        x = rect.x()
+        for pixmap, advance, overhang in glyphs:
+            placed.append((pixmap, QPoint(x - overhang, rect.y())))
+            x += advance
+        return placed
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        for pixmap, position in self.placeGlyphs(self.clockText):
+            painter.drawPixmap(position, pixmap)
+
+
 # Custom QPushButton that doesn't allow to move main window while mouse is on top of the button
 class ExtendedButton(QPushButton):
 
@@ -100,40 +192,98 @@ class ExtendedTimeEdit(QTimeEdit):
         self.setAlignment(Qt.AlignCenter)
         self.setAttribute(Qt.WA_MacShowFocusRect, False)    # Remove blue focus rectangle
         self.setWrapping(True)
-        self.setTime(QTime(0, time/60, time%60, 0))
+        self.setSeconds(time)
+
+    # Show a number of seconds as minutes and seconds
+    def setSeconds(self, time):
+        self.setTime(QTime(0, time//60, time%60, 0))
 
 
-# Customized QStackedWidget that allows transparency animations in stack changes
+# Customized QStackedWidget that allows transparency animations in stack changes. Each page keeps
+# one snapshot pixmap that is re-rendered only after the page content or the background color
+# changed, and one fader overlay is reused for every transition of the stack.
 class ExtendedStackedWidget(QStackedWidget):
 
     def __init__(self, parent = None):
         QStackedWidget.__init__(self, parent)
 
+        self.snapshots = {}             # Snapshot pixmap of every page
+        self.snapshotColors = {}        # Background color (rgba) each valid snapshot was rendered on
+        self.faderWidget = FaderWidget(self)
+
     def setCurrentIndex(self, index):
-        self.faderWidget = FaderWidget(self.currentWidget(), self.widget(index))
+        old_widget = self.currentWidget()
+        new_widget = self.widget(index)
+
+        if (old_widget is not None and new_widget is not None and old_widget is not new_widget
+                and self.isVisible()):
+            self.faderWidget.fade(self.snapshot(old_widget), new_widget.geometry())
+
         QStackedWidget.setCurrentIndex(self, index)
 
+    # Return the snapshot of a page, rendering it only if it is stale
+    def snapshot(self, page):
+        pixmap = self.snapshots.get(page)
+        background = self.backgroundColor()
+        color = background.rgba()
+
+        if pixmap is None or pixmap.size() != self.size():
+            pixmap = self.snapshots[page] = QPixmap(self.size())
+        elif self.snapshotColors.get(page) == color:
+            return pixmap
+
+        pixmap.fill(background)
+        page.render(pixmap, flags=QWidget.DrawChildren)
+        self.snapshotColors[page] = color
+        return pixmap
+
+    # Mark the snapshot of a page as stale after its content changed
+    def invalidateSnapshot(self, page):
+        self.snapshotColors.pop(page, None)
+
+    # Background color the stack is shown on: that of the nearest window or panel painting one
+    def backgroundColor(self):
+        widget = self.parentWidget()
+        while widget is not None and not hasattr(widget, "currentBackgroundColor"):
+            widget = widget.parentWidget()
+        return widget.currentBackgroundColor if widget is not None else QColor(*THEMES.theme.start)
 
-# Customized QWidget that gives widgets a transparency fade feature
+    # Mark all snapshots as stale, e.g. after the theme changed
+    def invalidateSnapshots(self):
+        self.snapshotColors.clear()
+
+
+# Customized QWidget that gives widgets a transparency fade feature. It overlays the new page of a
+# stack with a snapshot of the old one and fades the snapshot out.
 class FaderWidget(QWidget):
 
-    def __init__(self, old_widget, new_widget):
-        QWidget.__init__(self, new_widget)
+    def __init__(self, parent):
+        QWidget.__init__(self, parent)
 
-        self.old_pixmap = QPixmap(new_widget.size())
-        self.old_pixmap.fill(Form.currentBackgroundColor)
-        old_widget.render(self.old_pixmap, flags=QWidget.DrawChildren)
         self.pixmap_opacity = 1.0
+        self.old_pixmap = None
 
         self.timeline = QTimeLine()
         self.timeline.valueChanged.connect(self.animate)
-        self.timeline.finished.connect(self.close)
+        self.timeline.finished.connect(self.hide)
         self.timeline.setDuration(200)
-        self.timeline.start()
+        AnimationTiming(self.timeline, "fader")
+
+        self.hide()
 
-        self.resize(new_widget.size())
+    # Start fading out the given snapshot over the given area
+    def fade(self, old_pixmap, geometry):
+        self.timeline.stop()
+
+        self.old_pixmap = old_pixmap
+        self.pixmap_opacity = 1.0
+        self.setGeometry(geometry)
+        self.raise_()
         self.show()
 
+        self.timeline.start()
+
+    @timed("fader.paint")
     def paintEvent(self, event):
         painter = QPainter()
         painter.begin(self)
@@ -141,9 +291,45 @@ class FaderWidget(QWidget):
         painter.drawPixmap(0, 0, self.old_pixmap)
         painter.end()
 
+    # Schedule (not force) a repaint, so fade steps share the frame of other changes
+    @timed("fader.animate")
     def animate(self, value):
         self.pixmap_opacity = 1.0 - value
-        self.repaint()
+        self.update()
+
+
+# Counts ticks, frames (paint passes of a window) and their paint time, e.g. to check that a
+# countdown tick costs one frame. An optional callback receives the report after every frame.
+class RenderStats(object):
+
+    def __init__(self, onFrame=None):
+        self.onFrame = onFrame
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.frames = 0
+        self.paintTime = 0.0
+        self.maxPaintTime = 0.0
+
+    # Count one painted frame that took the given seconds
+    def frame(self, elapsed):
+        self.frames += 1
+        self.paintTime += elapsed
+        self.maxPaintTime = max(self.maxPaintTime, elapsed)
+
+        if self.onFrame is not None:
+            self.onFrame(self.report())
+
+    # Frames per tick and paint time (in milliseconds) so far
+    def report(self):
+        return {
+            "ticks": self.ticks,
+            "frames": self.frames,
+            "framesPerTick": self.frames / self.ticks if self.ticks else None,
+            "meanPaintMs": self.paintTime / self.frames * 1000 if self.frames else None,
+            "maxPaintMs": self.maxPaintTime * 1000,
+        }
 
 
 # Main widget
@@ -153,13 +339,22 @@ class Form(QWidget):
     # -------------------------------------------------------------------
     WINDOW_WIDTH = 690
     WINDOW_HEIGHT = 435
-    STARTCOLOR = QColor(245, 255, 206, 255)
-    ENDCOLOR = QColor(201, 246, 33, 255)
+    INFUSION_KEY = "form"               # Scheduler key of the infusion shown in this window
+    LOW_POWER_IDLE = True               # Pause animations and countdown repaints while not visible
+    SAVE_DELAY = 500                    # Milliseconds of quiet before edited teas are written
+    TEAS_PER_PAGE = 2                   # Number of tea buttons, i.e. catalog teas shown at a time
+    SUBSECOND_DIGITS = 0                # Digits after the seconds in the last minute of a countdown (0-2)
+    PAINT_COST_WEIGHT = 0.2             # Weight of the latest paint pass in the measured paint cost
+    CATALOG_FILE = os.path.join(BASE_DIR, "teas.db")
+    DATA_FILE = os.path.join(BASE_DIR, "teas.dat")
+    LEGACY_DATA_FILE = os.path.join(BASE_DIR, "data.pickle")
+    HISTORY_FILE = os.path.join(BASE_DIR, "history.dat")
+    JOURNAL_FILE = os.path.join(BASE_DIR, "infusion.journal")
     DEFAULT_TEAS = [Tea("Dummy Tea", [0,0,0]),
-                    Tea("Premium\nSencha", [3, 15, 60]),
-                    Tea("Premium\nBancha", [120, 180, 240])]
+                    Tea("Premium Sencha", [3, 15, 60]),
+                    Tea("Premium Bancha", [120, 180, 240])]
 
-    currentBackgroundColor = STARTCOLOR
+    renderStats = None                  # Optional RenderStats (see setRenderStats)
 
     def __init__(self, parent=None):
         super().__init__()
@@ -168,41 +363,77 @@ class Form(QWidget):
     def initUI(self):
         # Process variables
         # -------------------------------------------------------------------
-        self.infusionCycle = 0              # Track current infusion cycle
-        self.currentTea = None              # Track current Tea object
-        self.countdownTimerValue = 0        # Track remaining seconds in timer
+        # Add deadline scheduler for infusion countdowns. It runs every infusion (this window's and
+        # any started programmatically) on a single timer re-armed against absolute deadlines.
+        self.scheduler = InfusionScheduler(self)
+        self.scheduler.setObjectName("countdown")      # Names its lateness in the metrics
+        self.scheduler.ticked.connect(self.countdown)
+        self.scheduler.finished.connect(self.infusionFinished)
 
-        # Load tea data (by deserializing or defaulting)
-        try:
-            with open("data.pickle", "rb") as dataFile:
-                self.teas = pickle.load(dataFile)
-        except FileNotFoundError:
-            self.teas = Form.DEFAULT_TEAS
-
-        # TODO: Simplify this
-        self.redChannelDelta = Form.STARTCOLOR.red() - Form.ENDCOLOR.red()
-        self.greenChannelDelta = Form.STARTCOLOR.green() - Form.ENDCOLOR.green()
-        self.blueChannelDelta = Form.STARTCOLOR.blue() - Form.ENDCOLOR.blue()
-
-        # Necessary in order to store precise rgb values - Could also check out QRgba64 objects
-        self.realCurrentBackgroundColor = [245.0, 255.0, 206.0, 255]
-        self.mainPalette = QPalette()
-        self.mainPalette.setColor(QPalette.Background,Form.currentBackgroundColor)
-        self.changeValue = 1.0
+        # Track current tea and infusion cycle of this window's station
+        self.station = self.scheduler.station(Form.INFUSION_KEY)
+
+        # Track whether the window is visible, i.e. whether countdown and animations are drawn
+        self.rendering = True
+
+        # Log of ended infusions; the current one is recorded when it is reset (or on quit)
+        self.history = BrewHistory(Form.HISTORY_FILE)
+        self.brewing = None                 # Track Infusion started in this window until its reset
+
+        # Journal of the running infusion, resumed after a restart (see resumeInfusion)
+        self.journal = BrewJournal(Form.JOURNAL_FILE)
 
-        # Add continous timer for infusion countdown
-        self.countdownTimer = QTimer(self)
-        self.countdownTimer.timeout.connect(self.countdown)
+        # Load tea data from the catalog, seeded once from the stored (or default) teas
+        self.catalog = openCatalog()
+
+        self.teaPage = 0                    # Track catalog position of the first tea on the buttons
+        self.teas = []                      # Track teas on the buttons (index 0 is a dummy)
+
+        # Add single-shot timer that coalesces bursts of tea edits into one write
+        self.saveTimer = QTimer(self)
+        self.saveTimer.setSingleShot(True)
+        self.saveTimer.timeout.connect(self.saveTeas)
+        QCoreApplication.instance().aboutToQuit.connect(self.flushTeas)
+        QCoreApplication.instance().aboutToQuit.connect(self.closeHistory)
+        QCoreApplication.instance().aboutToQuit.connect(self.closeJournal)
+
+        # Gradient endpoints of the theme, which restyles the window on its own (see applyTheme)
+        self.theme = THEMES.theme
+        self.startColor = self.currentBackgroundColor = QColor(*self.theme.start)
+        self.endColor = QColor(*self.theme.end)
+
+        self.mainPalette = QPalette()
+        self.mainPalette.setColor(QPalette.Background,self.currentBackgroundColor)
 
         # Add single-shot timer for infusion cycle collection (preparation of infusion)
         # TODO Check if I really need this timer here in the code
         self.prepTimer = QTimer(self)
         self.prepTimer.setSingleShot(True)
         self.prepTimer.timeout.connect(self.infusion)
+        self.prepDeadline = None            # Track when the prep window is due to end (for the metrics)
+
+        # Add single-shot timer that slows down the leaves pulse once nobody reacted for a while
+        self.idleTimer = QTimer(self)
+        self.idleTimer.setSingleShot(True)
+        self.idleTimer.timeout.connect(self.slowLeavesPulse)
+
+        # Add zero-delay single-shot timer that applies the visual changes of a tick in one frame
+        self.frameTimer = QTimer(self)
+        self.frameTimer.setSingleShot(True)
+        self.frameTimer.timeout.connect(self.renderFrame)
+        self.pendingInfusion = None         # Track infusion whose latest tick awaits its frame
+        self.frameRequested = 0.0           # Track when the pending frame was requested (for the metrics)
+
+        # Add single-shot timer for the frames of a sub-second display, re-armed at an adaptive rate
+        self.fineTimer = QTimer(self)
+        self.fineTimer.setSingleShot(True)
+        self.fineTimer.setTimerType(Qt.PreciseTimer)
+        self.fineTimer.timeout.connect(self.fineFrame)
+        self.paintCost = 0.0                # Track seconds a paint pass takes while it runs (moving average)
 
         # UI elements
         # -------------------------------------------------------------------
-        self.timerLabel = ExtendedLabel("00:00", "timerLabel")
+        self.timerLabel = ClockLabel("00:00", "timerLabel")
         self.infoLabel = ExtendedLabel("Select your tea", "infoLabel")
 
         # Load tea leaves image that are to be shown before and after infusion
@@ -210,10 +441,10 @@ class Form(QWidget):
         self.leavesLabel.setPixmap(QPixmap('resources/imgs/leaves.png'))
 
         # Instantiate buttons on the bottom of the app
-        self.teaOneButton = ExtendedButton(self.teas[1].name, "teaOneButton")
+        self.teaOneButton = ExtendedButton("", "teaOneButton")
         self.teaOneButton.clicked.connect(self.prepareInfusion)
 
-        self.teaTwoButton = ExtendedButton(self.teas[2].name, "teaTwoButton")
+        self.teaTwoButton = ExtendedButton("", "teaTwoButton")
         self.teaTwoButton.clicked.connect(self.prepareInfusion)
 
         self.resetButton = ExtendedButton("Reset", "resetButton")
@@ -229,28 +460,8 @@ class Form(QWidget):
         self.exitButton = ExtendedButton("", "exitButton")
         self.exitButton.clicked.connect(QCoreApplication.instance().quit)
 
-        # Tea change menu widgets
-        self.teaOneNameLabel = QLabel("Tea name")
-        self.teaOneName = ExtendedLineEdit(self.teas[1].name)
-
-        self.teaOneCycleLabel = QLabel("Cycle times")
-        self.t1CycleOne = ExtendedTimeEdit(self.teas[1].infusion_times[0])
-        self.t1CycleTwo = ExtendedTimeEdit(self.teas[1].infusion_times[1])
-        self.t1CycleThree = ExtendedTimeEdit(self.teas[1].infusion_times[2])
-
-        self.teaTwoNameLabel = QLabel("Tea name")
-        self.teaTwoName = ExtendedLineEdit(self.teas[2].name)
-
-        self.teaTwoCycleLabel = QLabel("Cycle times")
-        self.t2CycleOne = ExtendedTimeEdit(self.teas[2].infusion_times[0])
-        self.t2CycleTwo = ExtendedTimeEdit(self.teas[2].infusion_times[1])
-        self.t2CycleThree = ExtendedTimeEdit(self.teas[2].infusion_times[2])
-
-        # Mapping buttons to tea data
-        self.teaMap = {
-            self.teaOneButton : self.teas[1],
-            self.teaTwoButton : self.teas[2]
-        }
+        # Mapping buttons to tea data (see showTeaPage)
+        self.teaMap = {}
 
         # Layouts
         # -------------------------------------------------------------------
@@ -270,64 +481,18 @@ class Form(QWidget):
         self.teaButtons = QWidget()
         self.teaButtons.setLayout(self.teaButtonsBox)
 
-        # Container widgets and layouts for tea menus on bottom
-        self.teaOneMenuBox = QGridLayout()
-        self.teaOneMenuBox.setSpacing(4)
-        self.teaOneMenuBox.setContentsMargins(16, 0, 16, 0)
-        self.teaOneMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 0, 0)
-        self.teaOneMenuBox.addWidget(self.teaOneNameLabel, 1, 0, 1, -1, Qt.AlignHCenter)
-        self.teaOneMenuBox.addWidget(self.teaOneName, 2, 0, 1, -1)
-        self.teaOneMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 3, 0)
-        self.teaOneMenuBox.addWidget(self.teaOneCycleLabel, 4, 0, 1, -1, Qt.AlignHCenter)
-        self.teaOneMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 0)
-        self.teaOneMenuBox.addWidget(self.t1CycleOne, 5, 1)
-        self.teaOneMenuBox.addWidget(self.t1CycleTwo, 5, 2)
-        self.teaOneMenuBox.addWidget(self.t1CycleThree, 5, 3)
-        self.teaOneMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 4)
-        self.teaOneMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 6, 0)
-
-        self.teaOneMenu = QWidget()
-        self.teaOneMenu.setObjectName("teaOneMenu")
-        self.teaOneMenu.setLayout(self.teaOneMenuBox)
-
-        self.teaTwoMenuBox = QGridLayout()
-        self.teaTwoMenuBox.setSpacing(4)
-        self.teaTwoMenuBox.setContentsMargins(16, 0, 16, 0)
-        self.teaTwoMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 0, 0)
-        self.teaTwoMenuBox.addWidget(self.teaTwoNameLabel, 1, 0, 1, -1, Qt.AlignHCenter)
-        self.teaTwoMenuBox.addWidget(self.teaTwoName, 2, 0, 1, -1)
-        self.teaTwoMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 3, 0)
-        self.teaTwoMenuBox.addWidget(self.teaTwoCycleLabel, 4, 0, 1, -1, Qt.AlignHCenter)
-        self.teaTwoMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 0)
-        self.teaTwoMenuBox.addWidget(self.t2CycleOne, 5, 1)
-        self.teaTwoMenuBox.addWidget(self.t2CycleTwo, 5, 2)
-        self.teaTwoMenuBox.addWidget(self.t2CycleThree, 5, 3)
-        self.teaTwoMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 4)
-        self.teaTwoMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 6, 0)
-
-        self.teaTwoMenu = QWidget()
-        self.teaTwoMenu.setObjectName("teaTwoMenu")
-        self.teaTwoMenu.setLayout(self.teaTwoMenuBox)
-
-        self.teaMenusBox = QHBoxLayout()
-        self.teaMenusBox.setSpacing(4)
-        self.teaMenusBox.setContentsMargins(0, 0, 0, 0)
-        self.teaMenusBox.addWidget(self.teaOneMenu)
-        self.teaMenusBox.addWidget(self.teaTwoMenu)
-
-        self.teaMenus = QWidget()
-        self.teaMenus.setLayout(self.teaMenusBox)
-
         # Stacked widget for leaf/timer display
         self.middleStack = ExtendedStackedWidget()
+        self.middleStack.setObjectName("middleStack")
         self.middleStack.addWidget(self.leavesLabel)
         self.middleStack.addWidget(self.timerLabel)
 
         # Stacked widget for bottom bar buttons
         self.bottomStack = ExtendedStackedWidget()
+        self.bottomStack.setObjectName("bottomStack")
         self.bottomStack.addWidget(self.teaButtons)
         self.bottomStack.addWidget(self.resetButton)
-        self.bottomStack.addWidget(self.teaMenus)
+        self.teaMenus = None                # Built on first use (see buildTeaMenu)
 
         # Final arrangement of UI elements in a grid layout
         grid = QGridLayout()
@@ -339,8 +504,12 @@ class Form(QWidget):
         grid.addWidget(self.bottomStack, 3 , 0, 1, -1)
         self.setLayout(grid)        # Set the QGridLayout as the window's main layout
 
+        self.setupAnimations()
+        self.showTeaPage(0)
+        self.resumeInfusion()
+
         self.setPalette(self.mainPalette)
-        self.setStyleSheet(open("style.qss", "r").read())
+        THEMES.apply(self, STYLE_FILE)
         self.resize(Form.WINDOW_WIDTH, Form.WINDOW_HEIGHT)
 
     # Window Manipulation
@@ -353,6 +522,18 @@ class Form(QWidget):
         frameGeom.moveCenter(centerPoint)
         self.move(frameGeom.topLeft())
 
+        self.setRendering(True)
+
+    # Stop drawing while the window is hidden
+    def hideEvent(self, QHideEvent):
+        self.setRendering(False)
+
+    # Stop drawing while the window is minimized (e.g. via minButton)
+    def changeEvent(self, QEvent):
+        if QEvent.type() == QEvent.WindowStateChange:
+            self.setRendering(self.isVisible() and not self.isMinimized())
+        super().changeEvent(QEvent)
+
     # Overload mouseEvent handlers to make window moveable
     def mousePressEvent(self, QMouseEvent):
         self.windowPos = QMouseEvent.pos()
@@ -369,28 +550,59 @@ class Form(QWidget):
 
     # Animations
     # -------------------------------------------------------------------
-    # Animate leaf label to "pulse" - after countdown is finished
-    def leavesLabelAnimation(self):
-        self.leavesLabel.Anim.setDuration(2400)
+    # Configure both label animations once; running them again only restarts them, so their
+    # finished signals stay connected exactly once.
+    def setupAnimations(self):
+        self.leavesLabel.Anim.setDuration(int(teaEngine.LEAVES_PULSE_DURATION*1000))
         self.leavesLabel.Anim.setEasingCurve(QEasingCurve.InCubic)      # InBounce looks interesting as well
         self.leavesLabel.Anim.setStartValue(1.0)
         self.leavesLabel.Anim.setKeyValueAt(0.5, 0.3)
         self.leavesLabel.Anim.setEndValue(1.0)
-        self.leavesLabel.Anim.setLoopCount(-1)
-        self.leavesLabel.Anim.start(QAbstractAnimation.KeepWhenStopped)
         self.leavesLabel.Anim.finished.connect(self.switchMiddleToLeaves)
 
-    # Animate timer label to "pulse" - before countdown starts
-    def timerLabelAnimation(self):
-        self.timerLabel.Anim.setDuration(550)
+        self.timerLabel.Anim.setDuration(int(teaEngine.TIMER_PULSE_DURATION*1000))
         self.timerLabel.Anim.setEasingCurve(QEasingCurve.InQuart)
         self.timerLabel.Anim.setStartValue(1.0)
         self.timerLabel.Anim.setKeyValueAt(0.5, 0.3)
         self.timerLabel.Anim.setEndValue(1.0)
-        self.timerLabel.Anim.setLoopCount(2)
+        self.timerLabel.Anim.setLoopCount(teaEngine.TIMER_PULSE_LOOPS)
+        self.timerLabel.Anim.finished.connect(self.switchMiddleToTimer)
+        AnimationTiming(self.timerLabel.Anim, "timerPulse")
+
+    # Animate leaf label to "pulse" - after countdown is finished
+    def leavesLabelAnimation(self):
+        self.leavesLabel.Anim.setDuration(int(teaEngine.LEAVES_PULSE_DURATION*1000))
+        self.leavesLabel.Anim.setLoopCount(-1)      # reset() shortens it to end the current loop
+        self.leavesLabel.Anim.start(QAbstractAnimation.KeepWhenStopped)
+        self.idleTimer.start(int(teaEngine.IDLE_PULSE_DELAY*1000))
+
+        if not self.rendering:
+            self.leavesLabel.Anim.pause()
+
+    # Slow down the leaves pulse when the finished tea has not been collected for a while
+    def slowLeavesPulse(self):
+        duration = int(teaEngine.LEAVES_PULSE_DURATION*1000) * teaEngine.IDLE_PULSE_SLOWDOWN
+        self.leavesLabel.Anim.setDuration(duration)
+
+    # Animate timer label to "pulse" - before countdown starts
+    def timerLabelAnimation(self):
         self.timerLabel.Anim.stop()     # stop in case it was running
         self.timerLabel.Anim.start(QAbstractAnimation.KeepWhenStopped)
-        self.timerLabel.Anim.finished.connect(self.switchMiddleToTimer)
+
+    # Pause or resume countdown repaints and animations depending on window visibility. Resuming
+    # catches up at once: the scheduler emits a tick for the running infusion right away.
+    def setRendering(self, rendering):
+        if not Form.LOW_POWER_IDLE or rendering == self.rendering:
+            return
+
+        self.rendering = rendering
+        self.scheduler.setTicking(Form.INFUSION_KEY, rendering)
+
+        for animation in (self.leavesLabel.Anim, self.timerLabel.Anim):
+            if rendering and animation.state() == QAbstractAnimation.Paused:
+                animation.resume()
+            elif not rendering and animation.state() == QAbstractAnimation.Running:
+                animation.pause()
 
     # Simple method to increase readability for middle stacked widget changes
     def switchMiddleToLeaves(self):
@@ -413,113 +625,261 @@ class Form(QWidget):
         self.bottomStack.setCurrentIndex(2)
         self.teaOneName.setFocus()
 
+    # Time every paint pass of the window while render statistics are collected, profiling is on or
+    # a sub-second display adapts its frame rate to it
+    def event(self, event):
+        if event.type() != QEvent.UpdateRequest or (self.renderStats is None and not METRICS.enabled
+                                                    and not self.fineTimer.isActive()):
+            return super().event(event)
+
+        start = time.perf_counter()
+        result = super().event(event)
+        elapsed = time.perf_counter() - start
+
+        self.paintCost += (elapsed - self.paintCost) * Form.PAINT_COST_WEIGHT
+        METRICS.observe(HANDLER, "paint", elapsed)
+        if self.renderStats is not None:
+            self.renderStats.frame(elapsed)
+        return result
+
+    # Start collecting render statistics into a RenderStats object (None stops collecting)
+    def setRenderStats(self, renderStats):
+        self.renderStats = renderStats
+
+    # Program Logic - Tea catalog
+    # -------------------------------------------------------------------
+    # Show the catalog teas starting at the given position on the tea buttons. Only the buttons'
+    # teas are loaded; the last page is aligned so that both buttons are filled. A catalog with fewer
+    # teas than buttons fills them up with blank teas, which are added to it once named in the menu.
+    def showTeaPage(self, position):
+        position = max(0, min(position, self.catalog.count() - Form.TEAS_PER_PAGE))
+        teas = self.catalog.page(position, Form.TEAS_PER_PAGE)
+        teas += [Tea("", [0, 0, 0]) for missing in range(Form.TEAS_PER_PAGE - len(teas))]
+
+        self.teaPage = position
+        self.teas = [Form.DEFAULT_TEAS[0]] + teas
+        self.teaMap = {
+            self.teaOneButton : self.teas[1],
+            self.teaTwoButton : self.teas[2]
+        }
+        self.showTeaButtons()
+
+    # Label the tea buttons with the names of their teas; buttons of blank teas are hidden
+    def showTeaButtons(self):
+        for button, tea in self.teaMap.items():
+            button.setText(tea.buttonName)
+            button.setVisible(bool(tea.name))
+        self.bottomStack.invalidateSnapshot(self.teaButtons)
+
+    # Page through the tea catalog with the mouse wheel while the tea buttons are shown
+    def wheelEvent(self, QWheelEvent):
+        if self.bottomStack.currentIndex() == 0 and QWheelEvent.angleDelta().y() != 0:
+            step = -Form.TEAS_PER_PAGE if QWheelEvent.angleDelta().y() > 0 else Form.TEAS_PER_PAGE
+            self.showTeaPage(self.teaPage + step)
+
+    # Page through the tea catalog with the page keys while the tea buttons are shown; switch to the
+    # next theme with T
+    def keyPressEvent(self, QKeyEvent):
+        if self.bottomStack.currentIndex() == 0 and QKeyEvent.key() == Qt.Key_PageUp:
+            self.showTeaPage(self.teaPage - Form.TEAS_PER_PAGE)
+        elif self.bottomStack.currentIndex() == 0 and QKeyEvent.key() == Qt.Key_PageDown:
+            self.showTeaPage(self.teaPage + Form.TEAS_PER_PAGE)
+        elif QKeyEvent.key() == Qt.Key_T:
+            THEMES.cycleTheme()
+        else:
+            super().keyPressEvent(QKeyEvent)
+
     # Program Logic - Before countdown
     # -------------------------------------------------------------------
     # Pre-infusion stage where time is allowed to pass for another button click specifying a
     # different infusion cycle. After time has passed, this function proceeds to call the
     # infusion stage.
     def prepareInfusion(self):
-        # TODO: Here I need an early check and set for the infusion cycle.
-        # In case there are no durations set for all 3 cycles of a tea,
-        # there should be no advancement to the next stage
+        self.selectTea(self.teaMap[self.sender()])
 
-        self.setActiveTea(self.sender())
-        self.setInfusionCycle()
+    # Select a tea (or its next cycle) as if its button was clicked, e.g. through the control API
+    def selectTea(self, tea):
+        if not tea.nextCycles:      # No step longer than 0 seconds (e.g. stored by an older version)
+            self.infoLabel.setText("No time set for this tea")
+            return
 
-        self.prepTimer.start(1400)
+        self.scheduler.select(Form.INFUSION_KEY, tea)
 
-        self.countdownTimerValue = self.currentTea.infusion_times[self.infusionCycle-1]
-        self.changeValue = 1.0/self.countdownTimerValue
+        self.prepTimer.start(int(teaEngine.PREP_WINDOW*1000))
+        self.prepDeadline = time.monotonic() + teaEngine.PREP_WINDOW
 
         # Adjust GUI items
-        self.timerLabel.setText(self.displayTime())
-        self.infoLabel.setText(self.currentTea.name.replace("\n", " ") + " - Cycle " + str(self.infusionCycle))
+        self.timerLabel.setText(teaEngine.displayTime(self.station.infusionTime()))
+        self.middleStack.invalidateSnapshot(self.timerLabel)
+        self.bottomStack.invalidateSnapshot(self.teaButtons)     # Clicked button is shown hovered
+        self.infoLabel.setText(self.station.currentTea.displayName + " - Cycle " + str(self.station.infusionCycle))
         self.switchMiddleToTimer()
         self.timerLabelAnimation()
 
-    # Change which tea is currently set as active.
-    def setActiveTea(self, sender):
-        sentTea = self.teaMap[sender]   # Return Tea object mapped to sender button
-
-        # Check if tea has changed and eventually reset cycle count
-        if not sentTea == self.currentTea:
-            self.currentTea = sentTea
-            self.infusionCycle = 0
-
-    # Update the current infusion cycle to be executed.
-    def setInfusionCycle(self):
-
-        if self.infusionCycle < 3:
-            self.infusionCycle += 1
-
-        else:   # Reset the cycle if the button is clicked a fourth time
-            self.infusionCycle = 1
-
-        # TODO: Figure out how to check here if next infusion cycle duration is 0
-        """
-            Use itertools module to cycle through infusion_times
-            from itertools import cycle
-
-            # In Tea object instantiate infusionCycle = cycle(infusion_times)
-
-            # Go through cycle until you find next valid infusion time (i.e. >0); Then set the current cycle to this
-            while True:
-                self.infusionCycle = cycle.next()
-                if self.infusionCycle > 0:
-                    break
-
-            # TODO: This might still be simplified a bit (e.g. specifying the while condition so that I don't need the if check later)
-            # TODO: Also, the cycle variables seem rather redundant here. I should reduce this.
-        """
-
     # Start the infusion process (i.e. the countdown)
+    @timed("infusion")
     def infusion(self):
+        if self.prepDeadline is not None:      # Not when started right away (see startInfusion)
+            METRICS.observe(LATENESS, "prepTimer", time.monotonic() - self.prepDeadline)
+            self.prepDeadline = None
         self.switchBottomToReset()
 
-        self.countdown()
-        self.countdownTimer.start(1000)
+        # Journal before starting: a zero duration finishes (and clears the journal) right away
+        duration = self.station.infusionTime()
+        self.journal.record(self.station.currentTea.teaId, self.station.infusionCycle, duration,
+                            time.time() + duration)
+        self.brewing = self.scheduler.start(Form.INFUSION_KEY)
+
+    # Start an infusion right away (e.g. requested through the control API), skipping the prep
+    # window. A given tea is selected as if its button was clicked; a given cycle overrides it.
+    def startInfusion(self, tea=None, cycle=None):
+        self.recordBrew()                   # A running or finished infusion is replaced
+        self.prepTimer.stop()
+        self.prepDeadline = None
+        self.idleTimer.stop()
+        self.leavesLabel.Anim.stop()
+
+        if tea is not None:
+            self.station.selectTea(tea)
+        if cycle is not None:
+            self.station.infusionCycle = cycle
+
+        self.timerLabel.setText(teaEngine.displayTime(self.station.infusionTime()))
+        self.infoLabel.setText(self.station.currentTea.displayName + " - Cycle " + str(self.station.infusionCycle))
+        self.switchMiddleToTimer()
+        self.infusion()
+
+    # Continue the infusion of the journal, e.g. after the timer was killed mid-brew. The countdown
+    # goes on from the remaining time (with its background color); a deadline that passed while the
+    # timer was not running finishes the infusion at once.
+    def resumeInfusion(self):
+        entry = self.journal.load()
+        tea = self.catalog.get(entry["tea"]) if entry is not None else None
+        if tea is None:
+            if entry is not None:
+                self.journal.clear()
+            return
+
+        self.station.setActiveTea(tea)
+        self.station.infusionCycle = entry["cycle"]
+        self.station.state = teaEngine.PREPARING
+
+        self.timerLabel.setText(teaEngine.displayTime(entry["duration"]))
+        self.infoLabel.setText(tea.displayName + " - Cycle " + str(entry["cycle"]))
+        self.switchMiddleToTimer()
+        self.switchBottomToReset()
+
+        deadline = self.scheduler.clock() + entry["deadline"] - time.time()
+        self.brewing = self.scheduler.start(Form.INFUSION_KEY, duration=entry["duration"], deadline=deadline)
+        if self.station.state == teaEngine.FINISHED:
+            self.setBackgroundColor(self.endColor)
 
     # Program Logic - During countdown
     # -------------------------------------------------------------------
-    # Update the countdown display in the main window during infusion.
-    def countdown(self):
-        if self.countdownTimerValue != 0:
-
-            output_string = self.displayTime()
-
-            self.timerLabel.setText(output_string)
-            self.countdownTimerValue -= 1
-
-            self.adaptBackgroundColor()
+    # Update the countdown display in the main window during infusion. The scheduler derives the
+    # remaining time from the deadline on every wakeup, so missed ticks are skipped instead of replayed.
+    # Several ticks before the next frame (e.g. a catch-up after the window was hidden) are drawn once.
+    @timed("countdown")
+    def countdown(self, infusion):
+        if infusion.key != Form.INFUSION_KEY or not self.rendering:
+            return
+
+        if self.renderStats is not None:
+            self.renderStats.ticks += 1
+
+        self.pendingInfusion = infusion
+        if not self.frameTimer.isActive():
+            self.frameTimer.start(0)
+            self.frameRequested = time.perf_counter()
+
+    # Apply all visual changes of the latest tick (timer text and background color) at once; they
+    # are painted together in the next paint pass of the window
+    @timed("renderFrame")
+    def renderFrame(self):
+        METRICS.observe(LATENESS, "frameTimer", time.perf_counter() - self.frameRequested)
+        infusion, self.pendingInfusion = self.pendingInfusion, None
+        if infusion is None or self.scheduler.get(Form.INFUSION_KEY) is not infusion:
+            return      # Reset or replaced in the meantime
+
+        if Form.SUBSECOND_DIGITS and infusion.secondsLeft <= teaEngine.FINE_WINDOW:
+            self.fineFrame()
         else:
-            self.finish()
-
-    # Format the countdown value to a minute:second string for display.
-    def displayTime(self):
-        minutes = self.countdownTimerValue // 60
-        seconds = self.countdownTimerValue % 60
-
-        # Use python string formatting to format in leading zeros
-        output_string = "{0:02}:{1:02}".format(minutes, seconds)
-        return output_string
-
-    # Compute the new background color value each second
-    def adaptBackgroundColor(self):
-        newRed = self.realCurrentBackgroundColor[0] - (self.redChannelDelta * self.changeValue)
-        newGreen = self.realCurrentBackgroundColor[1] - (self.greenChannelDelta * self.changeValue)
-        newBlue = self.realCurrentBackgroundColor[2] - (self.blueChannelDelta * self.changeValue)
-
-        self.realCurrentBackgroundColor = [newRed, newGreen, newBlue, 255]
-        Form.currentBackgroundColor = QColor(newRed, newGreen, newBlue, 255)
+            self.timerLabel.setText(teaEngine.displayTime(infusion.secondsLeft))
+            self.middleStack.invalidateSnapshot(self.timerLabel)
+        self.adaptBackgroundColor(infusion)
+
+    # Show the remaining time of this window's infusion with fractions of a second (see
+    # SUBSECOND_DIGITS) and schedule the next frame: at the next change of the shown fraction, as
+    # far as the measured paint cost allows (see teaEngine.frameInterval). Stops with the infusion.
+    @timed("fineFrame")
+    def fineFrame(self):
+        infusion = self.scheduler.get(Form.INFUSION_KEY)
+        if infusion is None or not self.rendering:
+            self.fineTimer.stop()
+            return
+
+        digits = Form.SUBSECOND_DIGITS
+        remaining = infusion.deadline - self.scheduler.clock()
+        self.timerLabel.setText(teaEngine.displayFineTime(teaEngine.fineUnits(remaining, digits), digits))
+        self.middleStack.invalidateSnapshot(self.timerLabel)
+
+        self.fineTimer.start(round(teaEngine.frameInterval(remaining, digits, self.paintCost) * 1000))
+
+    # Hand over to the finish stage once the deadline of this window's infusion has passed
+    @timed("infusionFinished")
+    def infusionFinished(self, infusion):
+        if infusion.key != Form.INFUSION_KEY:
+            return
+
+        self.finish()
+
+    # Show the background color of an infusion's currently displayed second, looked up from the
+    # gradient table of its duration
+    @timed("adaptBackgroundColor")
+    def adaptBackgroundColor(self, infusion):
+        colors = backgroundColors(infusion.duration, self.theme.start, self.theme.end)
+        self.setBackgroundColor(colors[infusion.secondsLeft])
+
+    # Change the window background, without propagating a new palette through the whole widget tree.
+    # The background shows behind every child, so a new color repaints the whole window as a new
+    # palette did; only the update itself is cheaper. An unchanged color repaints nothing.
+    def setBackgroundColor(self, color):
+        if color == self.currentBackgroundColor:
+            return
+
+        self.currentBackgroundColor = color
+        self.update()
+
+    # Paint the current background color behind all child widgets
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.currentBackgroundColor)
+        painter.end()
 
-        self.mainPalette.setColor(QPalette.Background,Form.currentBackgroundColor)
-        self.setPalette(self.mainPalette)
+    # Take over the gradient of a new theme; its style sheet rules were already set by the theme
+    # engine on the widgets they changed. The pages of the stacks look different now.
+    def applyTheme(self, theme):
+        self.theme = theme
+        self.startColor = QColor(*theme.start)
+        self.endColor = QColor(*theme.end)
+        self.middleStack.invalidateSnapshots()
+        self.bottomStack.invalidateSnapshots()
+
+        infusion = self.scheduler.get(Form.INFUSION_KEY)
+        if infusion is not None:
+            self.adaptBackgroundColor(infusion)
+        elif self.station.state == teaEngine.FINISHED:
+            self.setBackgroundColor(self.endColor)
+        else:
+            self.setBackgroundColor(self.startColor)
 
     # Program Logic - After countdown
     # -------------------------------------------------------------------
-    # Alert the user when the tea is finished
+    # Alert the user when the tea is finished. Further alerts (sounds, notifications, webhooks) are
+    # queued for worker threads by the scheduler's finished signal (see brewAlerts.py).
     def finish(self):
-        self.countdownTimer.stop()          # Stop the countdown timer
+        self.fineTimer.stop()
+        self.journal.clear()
         self.raise_()                       # Bring window to the foreground
         self.switchMiddleToLeaves()
         self.infoLabel.setText("Get your tea on!")
@@ -527,14 +887,15 @@ class Form(QWidget):
 
     # Reset the timer to it's initial state after a tea has been brewed
     def reset(self):
-        self.infusionCycle = 0
-        self.countdownTimer.stop()
+        self.journal.clear()
+        self.recordBrew()
+        self.scheduler.reset(Form.INFUSION_KEY)
+        self.prepTimer.stop()               # Reset during the prep window (e.g. through the control API)
+        self.prepDeadline = None
+        self.idleTimer.stop()
+        self.fineTimer.stop()
 
-        # TODO Maybe I could simplify this code here
-        Form.currentBackgroundColor = Form.STARTCOLOR
-        self.realCurrentBackgroundColor = [245.0, 255.0, 206.0, 255]
-        self.mainPalette.setColor(QPalette.Background,Form.currentBackgroundColor)
-        self.setPalette(self.mainPalette)
+        self.setBackgroundColor(self.startColor)
 
         # If infusion in progress
         if self.middleStack.currentIndex() != 0:
@@ -546,6 +907,27 @@ class Form(QWidget):
         self.infoLabel.setText("No tea selected")
         self.switchBottomToInfusion()
 
+    # Append the infusion of this window to the brew history: completed if its countdown finished,
+    # reset otherwise. Its actual duration lasts from the start until now.
+    def recordBrew(self):
+        if self.brewing is None:
+            return
+
+        infusion, self.brewing = self.brewing, None
+        outcome = brewHistory.COMPLETED if self.station.state == teaEngine.FINISHED else brewHistory.RESET
+        actual = self.scheduler.clock() - (infusion.deadline - infusion.duration)
+        self.history.append(infusion.tea.teaId, infusion.cycle, outcome, infusion.duration, actual)
+
+    # Record a pending infusion and close the brew history, e.g. before the application quits
+    def closeHistory(self):
+        self.recordBrew()
+        self.history.close()
+
+    # Forget the running infusion and wait for the journal writes, e.g. before the application quits
+    def closeJournal(self):
+        self.journal.clear()
+        self.journal.flush()
+
     # Program Logic - Tea menu
     # -------------------------------------------------------------------
     # User interaction with the tea menu where the names and cycle durations can be set.
@@ -555,74 +937,223 @@ class Form(QWidget):
 
         # Switch bottom stack state only when initial state is active
         if bottomStackIndex == 0 and middleStackIndex == 0:
+            if self.teaMenus is None:
+                self.buildTeaMenu()
+            self.loadTeaMenu()
+            self.menuInfoText = self.infoLabel.text()      # Restored when the menu is left
             self.switchBottomToTeaMenu()
-            self.menuButton.setProperty("active", True)
-            self.style().polish(self.menuButton)    # Update for style change
+            setStyleProperty(self.menuButton, "active", True)
 
         # Enter if tea menu is visible
         elif bottomStackIndex == 2:
 
-            # Set new values
-            self.teas[1].name = self.convertToLines(self.teaOneName.text())
-            self.teas[1].infusion_times[0] = self.convertToSeconds(self.t1CycleOne.time())
-            self.teas[1].infusion_times[1] = self.convertToSeconds(self.t1CycleTwo.time())
-            self.teas[1].infusion_times[2] = self.convertToSeconds(self.t1CycleThree.time())
+            # Check both teas before changing either (the menu edits the first three steps, further
+            # steps are kept). A tea without a name or without any cycle keeps the menu open.
+            edits = []
+            for number, (tea, nameEdit, timeEdits) in enumerate(self.teaMenuInputs(), 1):
+                times = [self.convertToSeconds(timeEdit.time()) for timeEdit in timeEdits] + tea.infusion_times[3:]
+                try:
+                    edits.append((tea,) + teaEngine.validateTea(nameEdit.text(), times))
+                except ValueError:
+                    missing = "name" if not teaEngine.flattenName(nameEdit.text()) else "time"
+                    self.infoLabel.setText("Tea {0} needs a {1}".format(number, missing))
+                    nameEdit.setFocus()
+                    return
 
-            self.teas[2].name = self.convertToLines(self.teaTwoName.text())
-            self.teas[2].infusion_times[0] = self.convertToSeconds(self.t2CycleOne.time())
-            self.teas[2].infusion_times[1] = self.convertToSeconds(self.t2CycleTwo.time())
-            self.teas[2].infusion_times[2] = self.convertToSeconds(self.t2CycleThree.time())
+            # Set new values
+            for tea, name, times in edits:
+                tea.name = name
+                tea.setInfusionTimes(times)
+            self.infoLabel.setText(self.menuInfoText)
 
             # Update tea buttons
-            self.teaOneButton.setText(self.teas[1].name)
-            self.teaTwoButton.setText(self.teas[2].name)
+            self.showTeaButtons()
+            self.bottomStack.invalidateSnapshot(self.teaMenus)      # Menu inputs were edited
 
-            # Serialize updated tea objects
-            with open("data.pickle", "wb") as dataFile:
-                pickle.dump(self.teas, dataFile)
+            # Serialize updated tea objects once the edits have settled
+            self.saveTimer.start(Form.SAVE_DELAY)
 
             # Switch back to initial state
             self.switchBottomToInfusion()
-            self.menuButton.setProperty("active", False)
-            self.style().polish(self.menuButton)    # Update for style change
-
-            # TODO: Figure out logic for input validation and efficient updating
-
-            """
-            # Pseudo-Code for tea changes through input
-            if change
-                (not necessary to run update functions if no changes were made)
-                (here it might come in handy that QLineEdit objects have a "modified" property)
-                update data
-                    if not valid input
-                        (here masks and validators can be set for the QLineEdit features)
-                        error prompt
-                    else
-                        update values in data structure (every value)
-                        update button captions?
-            """
-
-            # Get all the values from the input fields
-            # params = dict(teaOneName = self.teaOneName.text(),
-            #               t1CycleOneMin = int(self.t1CycleOneMin.text()))
-
-    # Stub apply user changes to tea data
-    def applyTeaChanges(self):
-        pass
+            setStyleProperty(self.menuButton, "active", False)
+
+    # Write the teas on the buttons to the catalog (unchanged rows are not touched, blank teas named
+    # in the menu are added)
+    def saveTeas(self):
+        self.catalog.save([tea for tea in self.teas[1:] if tea.teaId is not None])
+        self.catalog.extend(tea for tea in self.teas[1:] if tea.teaId is None and tea.nextCycles)
+
+    # Write pending tea edits right away, e.g. before the application quits
+    def flushTeas(self):
+        if self.saveTimer.isActive():
+            self.saveTimer.stop()
+            self.saveTeas()
+
+    # Build the tea menu page of the bottom stack. Most sessions never open the menu, so this only
+    # happens when it is opened for the first time.
+    def buildTeaMenu(self):
+        # Tea change menu widgets
+        self.teaOneNameLabel = QLabel("Tea name")
+        self.teaOneName = ExtendedLineEdit()
 
-    # Stub check if a tea name was adequately specified.
-    def checkTeaName(self, input):
-        pass
+        self.teaOneCycleLabel = QLabel("Cycle times")
+        self.t1CycleOne = ExtendedTimeEdit()
+        self.t1CycleTwo = ExtendedTimeEdit()
+        self.t1CycleThree = ExtendedTimeEdit()
+
+        self.teaTwoNameLabel = QLabel("Tea name")
+        self.teaTwoName = ExtendedLineEdit()
+
+        self.teaTwoCycleLabel = QLabel("Cycle times")
+        self.t2CycleOne = ExtendedTimeEdit()
+        self.t2CycleTwo = ExtendedTimeEdit()
+        self.t2CycleThree = ExtendedTimeEdit()
+
+        # Container widgets and layouts for tea menus on bottom
+        self.teaOneMenuBox = QGridLayout()
+        self.teaOneMenuBox.setSpacing(4)
+        self.teaOneMenuBox.setContentsMargins(16, 0, 16, 0)
+        self.teaOneMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 0, 0)
+        self.teaOneMenuBox.addWidget(self.teaOneNameLabel, 1, 0, 1, -1, Qt.AlignHCenter)
+        self.teaOneMenuBox.addWidget(self.teaOneName, 2, 0, 1, -1)
+        self.teaOneMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 3, 0)
+        self.teaOneMenuBox.addWidget(self.teaOneCycleLabel, 4, 0, 1, -1, Qt.AlignHCenter)
+        self.teaOneMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 0)
+        self.teaOneMenuBox.addWidget(self.t1CycleOne, 5, 1)
+        self.teaOneMenuBox.addWidget(self.t1CycleTwo, 5, 2)
+        self.teaOneMenuBox.addWidget(self.t1CycleThree, 5, 3)
+        self.teaOneMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 4)
+        self.teaOneMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 6, 0)
+
+        self.teaOneMenu = QWidget()
+        self.teaOneMenu.setObjectName("teaOneMenu")
+        self.teaOneMenu.setLayout(self.teaOneMenuBox)
+
+        self.teaTwoMenuBox = QGridLayout()
+        self.teaTwoMenuBox.setSpacing(4)
+        self.teaTwoMenuBox.setContentsMargins(16, 0, 16, 0)
+        self.teaTwoMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 0, 0)
+        self.teaTwoMenuBox.addWidget(self.teaTwoNameLabel, 1, 0, 1, -1, Qt.AlignHCenter)
+        self.teaTwoMenuBox.addWidget(self.teaTwoName, 2, 0, 1, -1)
+        self.teaTwoMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 3, 0)
+        self.teaTwoMenuBox.addWidget(self.teaTwoCycleLabel, 4, 0, 1, -1, Qt.AlignHCenter)
+        self.teaTwoMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 0)
+        self.teaTwoMenuBox.addWidget(self.t2CycleOne, 5, 1)
+        self.teaTwoMenuBox.addWidget(self.t2CycleTwo, 5, 2)
+        self.teaTwoMenuBox.addWidget(self.t2CycleThree, 5, 3)
+        self.teaTwoMenuBox.addItem(QSpacerItem(15, 1, QSizePolicy.Minimum, QSizePolicy.Minimum), 5, 4)
+        self.teaTwoMenuBox.addItem(QSpacerItem(10, 15, QSizePolicy.Minimum, QSizePolicy.Minimum), 6, 0)
+
+        self.teaTwoMenu = QWidget()
+        self.teaTwoMenu.setObjectName("teaTwoMenu")
+        self.teaTwoMenu.setLayout(self.teaTwoMenuBox)
+
+        self.teaMenusBox = QHBoxLayout()
+        self.teaMenusBox.setSpacing(4)
+        self.teaMenusBox.setContentsMargins(0, 0, 0, 0)
+        self.teaMenusBox.addWidget(self.teaOneMenu)
+        self.teaMenusBox.addWidget(self.teaTwoMenu)
+
+        self.teaMenus = QWidget()
+        self.teaMenus.setLayout(self.teaMenusBox)
+        self.bottomStack.addWidget(self.teaMenus)
+        THEMES.refresh(self)                # Theme rules for the new widgets
+
+    # Tea, name input and cycle inputs of both halves of the tea menu
+    def teaMenuInputs(self):
+        return ((self.teas[1], self.teaOneName, (self.t1CycleOne, self.t1CycleTwo, self.t1CycleThree)),
+                (self.teas[2], self.teaTwoName, (self.t2CycleOne, self.t2CycleTwo, self.t2CycleThree)))
+
+    # Fill the tea menu inputs with the teas currently shown on the buttons
+    def loadTeaMenu(self):
+        for tea, nameEdit, timeEdits in self.teaMenuInputs():
+            nameEdit.setText(tea.displayName)
+            for step, timeEdit in enumerate(timeEdits):
+                timeEdit.setSeconds(tea.infusion_times[step] if step < len(tea.infusion_times) else 0)
 
     # Converts QTime data into sum of seconds (integer)
     def convertToSeconds(self, time):
-        seconds = time.minute()*60 + time.second()
-        return seconds
+        return teaEngine.convertToSeconds(time.minute(), time.second())
+
+    # Debugging
+    # -------------------------------------------------------------------
+    # Report live signal connections, QObject count and fader overlays, e.g. to spot handlers that
+    # are connected again on every brew.
+    def debugStats(self):
+        connections = {
+            "timerLabel.Anim.finished": self.timerLabel.Anim.receivers(self.timerLabel.Anim.finished),
+            "leavesLabel.Anim.finished": self.leavesLabel.Anim.receivers(self.leavesLabel.Anim.finished),
+            "prepTimer.timeout": self.prepTimer.receivers(self.prepTimer.timeout),
+            "scheduler.ticked": self.scheduler.receivers(self.scheduler.ticked),
+            "scheduler.finished": self.scheduler.receivers(self.scheduler.finished),
+        }
 
-    # Split tea name text to multiple lines if it is too long
-    def convertToLines(self, oldTeaName):
-        newTeaName = "\n".join(textwrap.wrap(oldTeaName, 12))
-        return newTeaName
+        for stack in (self.middleStack, self.bottomStack):
+            timeline = stack.faderWidget.timeline
+            connections[stack.objectName() + ".timeline"] = (timeline.receivers(timeline.valueChanged)
+                                                             + timeline.receivers(timeline.finished))
+
+        return {
+            "connections": connections,
+            "qobjects": len(self.findChildren(QObject)) + 1,
+            "faders": len(self.findChildren(FaderWidget)),
+        }
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# QColor version of the engine's gradient table for an infusion duration and the gradient endpoints
+# of a theme (cached alike)
+@functools.lru_cache(maxsize=teaEngine.GRADIENT_CACHE_SIZE)
+def backgroundColors(duration, start=teaEngine.STARTCOLOR, end=teaEngine.ENDCOLOR):
+    return tuple(QColor(*color) for color in teaEngine.gradientTable(duration, start, end))
+
+
+# Open the tea catalog, seeded from the teas of earlier versions (or the defaults) when it was just
+# created or holds no teas at all. A catalog the user reduced to fewer teas than the tea buttons
+# show keeps them (see Form.showTeaPage).
+def openCatalog():
+    catalog = TeaCatalog(Form.CATALOG_FILE)
+    if catalog.created or not catalog.count():
+        from teaStorage import seedCatalog
+        seedCatalog(catalog, Form.DEFAULT_TEAS, Form.DATA_FILE, Form.LEGACY_DATA_FILE)
+    return catalog
+
+
+# Pre-rendered glyph of one clock character for a font (as QFont.toString), a color (rgba) and a
+# device pixel ratio, as (pixmap, advance, overhang). Digits share the advance of the widest digit;
+# the pixmap extends by the overhang on both sides, for glyph parts outside the advance.
+@functools.lru_cache(maxsize=GLYPH_CACHE_SIZE)
+def clockGlyph(char, font, color, ratio):
+    qfont = QFont()
+    qfont.fromString(font)
+    metrics = QFontMetrics(qfont)
+
+    if char.isdigit():
+        advance = max(metrics.horizontalAdvance(digit) for digit in "0123456789")
+    else:
+        advance = metrics.horizontalAdvance(char)
+    overhang = metrics.height() // 4
+
+    pixmap = QPixmap(round((advance + 2 * overhang) * ratio), round(metrics.height() * ratio))
+    pixmap.setDevicePixelRatio(ratio)
+    pixmap.fill(Qt.transparent)
+
+    painter = QPainter(pixmap)
+    painter.setFont(qfont)
+    painter.setPen(QColor.fromRgba(color))
+    painter.drawText(overhang + (advance - metrics.horizontalAdvance(char)) // 2, metrics.ascent(), char)
+    painter.end()
+    return pixmap, advance, overhang
+
+
+# Register the application fonts (once per application)
+@functools.lru_cache(maxsize=None)
+def loadFonts():
+    return tuple(QFontDatabase.addApplicationFont(path) for path in FONT_FILES)
 
 
 """
@@ -632,14 +1163,85 @@ MAIN LOOP
 
 if __name__ == '__main__':
 
+    import argparse
     import sys
 
-    app = QApplication(sys.argv)
-    QFontDatabase.addApplicationFont('resources/fonts/CaviarDreams.ttf')
+    parser = argparse.ArgumentParser(description="A delightful tea timer.")
+    parser.add_argument("--control-port", type=int, help="serve the control API on this localhost port")
+    parser.add_argument("--stations", type=int, help="show a dashboard of this many timer panels instead")
+    parser.add_argument("--profile", action="store_true", help="take measurements from the start (SIGUSR1 toggles)")
+    parser.add_argument("--metrics-file", help="write the measurements to this file while profiling")
+    parser.add_argument("--subseconds", type=int, choices=(1, 2),
+                        help="show tenths (1) or hundredths (2) of a second in the last minute of a countdown")
+    parser.add_argument("--status-board", nargs="?", const="", metavar="PATH",
+                        help="publish all stations to a shared-memory status board (see brewBoard.py)")
+    parser.add_argument("--alert", action="append", default=[], metavar="SINK",
+                        help="send completion alerts to command:CMD, webhook:URL or log:PATH (repeatable)")
+    parser.add_argument("--alert-timeout", type=float, default=2.0, help="seconds an alert delivery may take")
+    parser.add_argument("--theme", help="color theme, a file of the themes directory (see brewThemes.py)")
+    args, qtArguments = parser.parse_known_args()
+
+    # Completion alerts (see brewAlerts.py), delivered on worker threads
+    alerts = None
+    if args.alert:
+        import brewAlerts
+        try:
+            sinks = [brewAlerts.parseSink(spec, args.alert_timeout) for spec in args.alert]
+        except ValueError as error:
+            parser.error(str(error))
+        alerts = brewAlerts.AlertDispatcher(sinks)
+
+    app = QApplication(sys.argv[:1] + qtArguments)
+    loadFonts()
+    Form.SUBSECOND_DIGITS = args.subseconds or 0
+    if args.theme:
+        try:
+            THEMES.setTheme(args.theme)
+        except ValueError as error:
+            parser.error(str(error))
+
+    # Profiling (see brewMetrics.py), switched on and off by SIGUSR1 without a restart
+    brewMetrics.installToggleSignal(app)
+    METRICS.setEnabled(args.profile)
+    if args.metrics_file:
+        metricsFile = brewMetrics.MetricsFile(args.metrics_file, parent=app)
+
+    # Dashboard of many stations (see brewDashboard.py), sharing the teas shown on the tea buttons
+    if args.stations:
+        from brewDashboard import Dashboard
+        screen = Dashboard(args.stations, openCatalog().page(0, Form.TEAS_PER_PAGE))
+        screen.show()
+        if args.status_board is not None:
+            from brewBoard import StatusBoard
+            board = StatusBoard(args.status_board or None)
+            board.attach(screen.scheduler)
+            app.aboutToQuit.connect(board.close)
+        if alerts is not None:
+            alerts.attach(screen.scheduler)
+            app.aboutToQuit.connect(alerts.close)
+        sys.exit(app.exec_())
 
     screen = Form()
 
     screen.setWindowFlags(Qt.FramelessWindowHint)       # Removes the title bar
     screen.show()
 
+    # Control API (see controlServer.py)
+    if args.control_port is not None:
+        from controlServer import ControlServer
+        server = ControlServer(screen.scheduler, screen.catalog, screen, port=args.control_port, parent=screen)
+        server.start()
+        app.aboutToQuit.connect(server.stop)
+
+    # Status board for local readers (see brewBoard.py)
+    if args.status_board is not None:
+        from brewBoard import StatusBoard
+        board = StatusBoard(args.status_board or None)
+        board.attach(screen.scheduler)
+        app.aboutToQuit.connect(board.close)
+
+    if alerts is not None:
+        alerts.attach(screen.scheduler)
+        app.aboutToQuit.connect(alerts.close)
+
     sys.exit(app.exec_())       # sys.exit() ensures a clean exit, releasing memory resources
\ No newline at end of file
@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+teaTransfer.py: Streaming import and export of the tea catalog as CSV or JSON Lines.
+
+Rows are read, validated and inserted one at a time (committed in batches of BATCH_SIZE) and
+exported straight from a database cursor, so files of millions of teas pass through in constant
+memory. A row that fails validation (empty name, no step, a step that is not a whole number of
+seconds, only zero steps, see teaEngine.validateTea) is reported with its line number and skipped;
+the rest of the file is still imported.
+
+CSV files start with a header row naming the columns name, category (optional) and infusion_times,
+whose steps are seconds separated by spaces (e.g. "3 15 60"). JSON Lines files hold one object per
+line with the same keys, the steps as a list. The format follows the file extension; "-" reads
+stdin or writes stdout.
+
+Usage: python3 teaTransfer.py import teas.csv [--catalog teas.db]
+       python3 teaTransfer.py export teas.jsonl [--catalog teas.db] [--category Green]
+"""
+
+__author__ = "Michael T. Knierim"
+__email__ = "contact@michaelknierim.info"
+__license__ = "MIT"
+
+
+"""
+IMPORTS
+===============================================================
+"""
+
+# Python built-in modules
+import contextlib
+import csv
+import json
+import os
+import sys
+
+# Project modules
+import teaEngine
+from teaEngine import Tea
+
+
+"""
+CONSTANTS
+===============================================================
+"""
+
+BATCH_SIZE = 5000                       # Teas inserted per transaction of an import
+FIELDS = ("name", "category", "infusion_times")
+
+# File formats by extension
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+"""
+FUNCTIONS
+===============================================================
+"""
+
+# Import the teas of a file into a catalog. Every rejected row is handed to onError as (line,
+# message); by default it is printed to stderr. Returns the numbers of imported and rejected rows.
+# Once an import has added as many teas as the catalog held before, the rest is bulk loaded (see
+# TeaCatalog.bulkLoad): rebuilding the indexes then costs at most about as much as the import.
+def importTeas(catalog, path, fileFormat=None, onError=None):
+    if onError is None:
+        onError = lambda line, message: print("line {0}: {1}".format(line, message), file=sys.stderr)
+
+    imported = rejected = 0
+    batch = []
+    existing = catalog.count()
+    bulk = None                         # Catalog in bulk load mode
+
+    with contextlib.ExitStack() as stack:
+        teaFile = stack.enter_context(openFile(path, "r"))
+        for line, tea, error in readTeas(teaFile, fileFormat or formatOf(path)):
+            if error is not None:
+                rejected += 1
+                onError(line, error)
+                continue
+
+            batch.append(tea)
+            if len(batch) == BATCH_SIZE:
+                if not bulk and imported >= existing:
+                    bulk = stack.enter_context(catalog.bulkLoad())
+                catalog.insert(batch)
+                imported += len(batch)
+                batch = []
+
+        catalog.insert(batch)
+    return imported + len(batch), rejected
+
+
+# Export the teas of a catalog (or of one of its categories) to a file. Returns the number of teas.
+def exportTeas(catalog, path, fileFormat=None, category=None):
+    fileFormat = fileFormat or formatOf(path)
+    count = 0
+
+    with openFile(path, "w") as teaFile:
+        if fileFormat == "csv":
+            writer = csv.writer(teaFile, lineterminator="\n")
+            writer.writerow(FIELDS)
+            for name, teaCategory, times in catalog.entries(category):
+                writer.writerow((name, teaCategory, " ".join(str(time) for time in times)))
+                count += 1
+        else:
+            for name, teaCategory, times in catalog.entries(category):
+                teaFile.write(json.dumps({"name": name, "category": teaCategory, "infusion_times": times},
+                                         ensure_ascii=False) + "\n")
+                count += 1
+
+    return count
+
+
+# Yield (line, Tea, None) for every valid row of an open file and (line, None, message) for every
+# rejected one
+def readTeas(teaFile, fileFormat):
+    rows = readCsv(teaFile) if fileFormat == "csv" else readJsonLines(teaFile)
+
+    for line, fields in rows:
+        try:
+            if isinstance(fields, str):
+                raise ValueError(fields)
+            name, category, times = fields
+            if name is None:
+                raise ValueError("no name")
+            if times is None:
+                raise ValueError("no infusion_times")
+            name, times = teaEngine.validateTea(name, times)
+        except ValueError as error:
+            yield line, None, str(error)
+        else:
+            yield line, Tea(name, times, category), None
+
+
+# Yield (line, (name, category, infusion times)) for the rows of a CSV file, or (line, message) for
+# a row the CSV reader rejects. Missing fields are None, the steps are passed on as text for validation.
+def readCsv(teaFile):
+    reader = csv.reader(teaFile)
+    try:
+        header = next(reader, None)
+    except csv.Error as error:
+        raise ValueError("invalid CSV header ({0})".format(error))
+    if header is None:
+        return
+
+    columns = [column.strip().lower() for column in header]
+    if "name" not in columns or "infusion_times" not in columns:
+        raise ValueError("CSV header must name the columns name and infusion_times")
+    nameColumn = columns.index("name")
+    timesColumn = columns.index("infusion_times")
+    categoryColumn = columns.index("category") if "category" in columns else None
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:      # E.g. a field over the size limit; the reader goes on after it
+            yield reader.line_num, "invalid CSV ({0})".format(error)
+            continue
+        if not row or (len(row) == 1 and not row[0].strip()):
+            continue
+
+        name = row[nameColumn] if nameColumn < len(row) else None
+        times = row[timesColumn].replace(",", " ").split() if timesColumn < len(row) else None
+        category = row[categoryColumn].strip() if categoryColumn is not None and categoryColumn < len(row) else ""
+        yield reader.line_num, (name, category, times)
+
+
+# Yield (line, (name, category, infusion times)) for the objects of a JSON Lines file, or (line,
+# message) for a line that is not a JSON object
+def readJsonLines(teaFile):
+    for line, text in enumerate(teaFile, 1):
+        if not text.strip():
+            continue
+
+        try:
+            entry = json.loads(text)
+        except ValueError as error:
+            yield line, "invalid JSON ({0})".format(error)
+            continue
+        if not isinstance(entry, dict):
+            yield line, "not a JSON object"
+            continue
+
+        name = entry.get("name")
+        times = entry.get("infusion_times")
+        yield line, (str(name) if name is not None else None, str(entry.get("category") or ""),
+                     times if isinstance(times, list) else None)
+
+
+# File format ("csv" or "jsonl") of a path, from its extension
+def formatOf(path):
+    fileFormat = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fileFormat is None:
+        raise ValueError("unknown file format of {0} (use .csv or .jsonl)".format(path))
+    return fileFormat
+
+
+# Open a text file for CSV/JSON Lines, "-" being stdin or stdout (which is left open)
+def openFile(path, mode):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+"""
+MAIN LOOP
+===============================================================
+"""
+
+if __name__ == '__main__':
+
+    import argparse
+    import time
+
+    from teaCatalog import TeaCatalog
+
+    parser = argparse.ArgumentParser(description="Import or export the tea catalog as CSV or JSON Lines.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help="CSV (.csv) or JSON Lines (.jsonl) file, - for stdin/stdout")
+    parser.add_argument("--catalog", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "teas.db"),
+                        help="catalog database (default: teas.db next to this script)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="file format (default: from the extension)")
+    parser.add_argument("--category", help="export only the teas of this category")
+    args = parser.parse_args()
+
+    if args.file == "-" and args.format is None:
+        parser.error("--format is required for stdin/stdout")
+
+    catalog = TeaCatalog(args.catalog)
+    start = time.perf_counter()
+    try:
+        if args.command == "import":
+            imported, rejected = importTeas(catalog, args.file, args.format)
+            summary = "imported {0} teas, rejected {1} rows".format(imported, rejected)
+        else:
+            summary = "exported {0} teas".format(exportTeas(catalog, args.file, args.format, args.category))
+    except (OSError, ValueError, csv.Error) as error:
+        sys.exit("{0}: {1}".format(args.file, error))
+    finally:
+        catalog.close()
+
+    print("{0} in {1:.2f} s".format(summary, time.perf_counter() - start), file=sys.stderr)
+    if args.command == "import" and rejected:
+        sys.exit(1)